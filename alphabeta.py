@@ -2,172 +2,344 @@ import math
 from copy import deepcopy
 import threading
 import time
-from skakPieces import Piece
+from types import MappingProxyType
+from skakPieces import Piece, Queen
+from evalcache import EvalCache, EVAL_CACHE_SIZE, EVAL_CACHE_BYTES_PER_SLOT
+from openingbook import OpeningBook
+from tablebase import Tablebase, DRAW, WIN, LOSS
+from persistcache import PersistentCache, PERSISTENT_CACHE_SLOTS
+from zobrist import polyglot_key
+from matesearch import MateSearch, rules_covered
+from searchstats import SearchStats
+from searchinfo import DEFAULT_INFO_INTERVAL
+from profiling import SearchProfile, DEFAULT_SAMPLE_INTERVAL
+from tracer import Tracer, DEFAULT_CAPACITY
+from memoryreport import (MEMORY_SHARES, DEFAULT_ENTRY_BYTES, AllocationTracker, deep_sizeof,
+                          entry_bytes, table_bytes, trim_table)
+
+# Score for a tablebase win; the distance to mate is subtracted so faster wins score higher
+TABLEBASE_WIN_SCORE = 15000
+
+# Score for a mate proven by the helper search: a sure win, but its length is not known, so it
+# stays below the exact mate scores of the normal search
+HELPER_MATE_SCORE = TABLEBASE_WIN_SCORE
+
+# Mate and tablebase scores count plies from the root of one search, so they are not
+# written to the persistent cache (every score at or beyond this is one of them)
+ROOT_RELATIVE_SCORE = TABLEBASE_WIN_SCORE - 1000
+
+# Plies of captures and checks searched past the horizon
+QUIESCENCE_DEPTH = 4
+
+# Precomputed per-square tables. Squares are indexed as row * 8 + col.
+ROOK_DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+BISHOP_DIRECTIONS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+KNIGHT_OFFSETS = ((-2, -1), (-1, -2), (1, -2), (2, -1), (2, 1), (1, 2), (-1, 2), (-2, 1))
+KING_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+
+
+def _build_step_targets(offsets):
+    #Target squares reachable in one step from every square
+    targets = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        targets.append(tuple((r + dr) * 8 + c + dc for dr, dc in offsets
+                             if 0 <= r + dr < 8 and 0 <= c + dc < 8))
+    return tuple(targets)
+
+
+def _build_rays(directions):
+    #Squares along each sliding direction from every square, nearest first
+    rays = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        square_rays = []
+        for dr, dc in directions:
+            ray = []
+            nr, nc = r + dr, c + dc
+            while 0 <= nr < 8 and 0 <= nc < 8:
+                ray.append(nr * 8 + nc)
+                nr += dr
+                nc += dc
+            square_rays.append(tuple(ray))
+        rays.append(tuple(square_rays))
+    return tuple(rays)
+
+
+def _build_neighbourhood_masks():
+    #Bitmask of the squares within Manhattan distance 2 of every square (the square itself excluded)
+    masks = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        mask = 0
+        for r2 in range(8):
+            for c2 in range(8):
+                if 0 < abs(r - r2) + abs(c - c2) <= 2:
+                    mask |= 1 << (r2 * 8 + c2)
+        masks.append(mask)
+    return tuple(masks)
+
+
+KNIGHT_TARGETS = _build_step_targets(KNIGHT_OFFSETS)
+KING_TARGETS = _build_step_targets(KING_OFFSETS)
+ROOK_RAYS = _build_rays(ROOK_DIRECTIONS)
+BISHOP_RAYS = _build_rays(BISHOP_DIRECTIONS)
+QUEEN_RAYS = tuple(ROOK_RAYS[sq] + BISHOP_RAYS[sq] for sq in range(64))
+NEIGHBOURHOOD_MASKS = _build_neighbourhood_masks()
+
+CENTER_SQUARES = (3 * 8 + 3, 3 * 8 + 4, 4 * 8 + 3, 4 * 8 + 4)
+EXTENDED_CENTER_SQUARES = (2 * 8 + 2, 2 * 8 + 3, 2 * 8 + 4, 2 * 8 + 5,
+                           3 * 8 + 2, 3 * 8 + 5,
+                           4 * 8 + 2, 4 * 8 + 5,
+                           5 * 8 + 2, 5 * 8 + 3, 5 * 8 + 4, 5 * 8 + 5)
+
+
+# Evaluation constants, built once at import and shared read-only by every ChessAI
+# (and by forked worker processes). Square tables are flat tuples indexed by row * 8 + col
+# from white's side; black pieces read the row mirrored.
+
+# Enhanced center control values with more nuanced weighting
+CENTER_CONTROL_BONUS = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    0, 5, 10, 10, 10, 10, 5, 0,
+    0, 10, 20, 25, 25, 20, 10, 0,
+    0, 10, 25, 30, 30, 25, 10, 0,
+    0, 10, 25, 30, 30, 25, 10, 0,
+    0, 10, 20, 25, 25, 20, 10, 0,
+    0, 5, 10, 10, 10, 10, 5, 0,
+    0, 0, 0, 0, 0, 0, 0, 0,
+)
+
+# Improved positional values for pieces
+PAWN_POSITION = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+    5, 5, 10, 27, 27, 10, 5, 5,
+    0, 0, 0, 25, 25, 0, 0, 0,
+    5, -5, -10, 0, 0, -10, -5, 5,
+    5, 10, 10, -20, -20, 10, 10, 5,
+    0, 0, 0, 0, 0, 0, 0, 0,
+)
+
+KNIGHT_POSITION = (
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20, 0, 5, 5, 0, -20, -40,
+    -30, 5, 15, 20, 20, 15, 5, -30,
+    -30, 0, 15, 25, 25, 15, 0, -30,
+    -30, 5, 15, 25, 25, 15, 5, -30,
+    -30, 10, 15, 20, 20, 15, 10, -30,
+    -40, -20, 5, 10, 10, 5, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+)
+
+BISHOP_POSITION = (
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10, 5, 0, 0, 0, 0, 5, -10,
+    -10, 10, 10, 10, 10, 10, 10, -10,
+    -10, 0, 10, 15, 15, 10, 0, -10,
+    -10, 5, 5, 15, 15, 5, 5, -10,
+    -10, 0, 5, 10, 10, 5, 0, -10,
+    -10, 5, 0, 0, 0, 0, 5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+)
+
+ROOK_POSITION = (
+    0, 0, 0, 5, 5, 0, 0, 0,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 5, 5, 5, 5, 0, -5,
+    5, 10, 10, 10, 10, 10, 10, 5,
+    0, 0, 0, 0, 0, 0, 0, 0,
+)
+
+QUEEN_POSITION = (
+    -20, -10, -10, -5, -5, -10, -10, -20,
+    -10, 0, 5, 0, 0, 0, 0, -10,
+    -10, 5, 5, 5, 5, 5, 0, -10,
+    -5, 0, 5, 5, 5, 5, 0, -5,
+    0, 0, 5, 5, 5, 5, 0, -5,
+    -10, 0, 5, 5, 5, 5, 0, -10,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -20, -10, -10, -5, -5, -10, -10, -20,
+)
+
+# Enhanced king position tables
+KING_MIDDLEGAME_POSITION = (
+    30, 40, 10, 0, 0, 10, 40, 30,
+    20, 20, 0, 0, 0, 0, 20, 20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+)
+
+KING_ENDGAME_POSITION = (
+    -50, -30, -30, -30, -30, -30, -30, -50,
+    -30, -20, 0, 0, 0, 0, -20, -30,
+    -30, 0, 20, 30, 30, 20, 0, -30,
+    -30, 0, 30, 40, 40, 30, 0, -30,
+    -30, 0, 30, 40, 40, 30, 0, -30,
+    -30, 0, 20, 30, 30, 20, 0, -30,
+    -30, -20, 0, 0, 0, 0, -20, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+)
+
+
+def _mirrored(table):
+    #The same square table seen from black's side (rows flipped)
+    return tuple(table[(7 - sq // 8) * 8 + sq % 8] for sq in range(64))
+
+
+def _frozen(mapping):
+    #Read-only view of a (nested) dict constant
+    return MappingProxyType({key: _frozen(value) if isinstance(value, dict) else value
+                             for key, value in mapping.items()})
+
+
+# Square table per (color, is_endgame) and piece name
+PIECE_SQUARE_TABLES = _frozen({
+    (color, is_endgame): {
+        name: table if color == 'w' else _mirrored(table)
+        for name, table in (('P', PAWN_POSITION), ('N', KNIGHT_POSITION), ('B', BISHOP_POSITION),
+                            ('R', ROOK_POSITION), ('Q', QUEEN_POSITION),
+                            ('K', KING_ENDGAME_POSITION if is_endgame else KING_MIDDLEGAME_POSITION))
+    }
+    for color in ('w', 'b') for is_endgame in (False, True)
+})
+
+# King safety bonuses (castling and safe corner), the same for both colors
+KING_SAFETY_BONUS = _frozen({
+    'castled': 150,        # Bonus for castling
+    'pawn_shield': 50,     # Bonus for each pawn in front of the king
+    'open_lines': -30      # Penalty for open lines in front of the king
+})
+
+# Dynamic piece values based on game phase
+PIECE_VALUES = _frozen({
+    'P': {'opening': 100, 'middlegame': 100, 'endgame': 150},
+    'N': {'opening': 320, 'middlegame': 320, 'endgame': 300},
+    'B': {'opening': 330, 'middlegame': 340, 'endgame': 350},
+    'R': {'opening': 500, 'middlegame': 510, 'endgame': 550},
+    'Q': {'opening': 900, 'middlegame': 920, 'endgame': 950},
+    'K': {'opening': 2000, 'middlegame': 2000, 'endgame': 2000}
+})
+
+# Mobility bonus (more legal moves = better position)
+MOBILITY_BONUS = _frozen({
+    'P': 1,
+    'N': 4,
+    'B': 3,
+    'R': 2,
+    'Q': 1,
+    'K': 0.5
+})
+
+# Bonuses for specific structures and positions
+PAWN_STRUCTURE_BONUS = _frozen({
+    'doubled': -20,         # Penalty for doubled pawns
+    'isolated': -15,        # Penalty for isolated pawns
+    'connected': 10,        # Bonus for connected pawns
+    'passed': 30,           # Bonus for passed pawns
+    'backward': -10,        # Penalty for backward pawns
+    'chain': 8,             # Bonus for pawn chains
+    'protected': 12         # Bonus for protected pawns
+})
+
+
+# Evaluation terms in the order evaluate_board computes them. The last three need
+# move generation and are the ones skipped by the lazy exit.
+EVAL_TERMS = ('material', 'position', 'pawn_structure', 'king_safety', 'development',
+              'endgame', 'mobility', 'center_control', 'coordination')
+LAZY_EVAL_TERMS = ('mobility', 'center_control', 'coordination')
+
+
+class PositionSummary:
+    #Compact per-position summary built in one pass over the board; every evaluation term reads from it
+    __slots__ = ('board', 'pieces', 'pawns', 'pawns_by_file', 'king_pos', 'occupancy', 'total_pieces',
+                 'game_phase', 'material', 'endgame_material', 'attack_counts')
+
+    def __init__(self, board):
+        self.board = board
+        self.pieces = {'w': [], 'b': []}            # (row, col, piece) per color
+        self.pawns = {'w': [], 'b': []}             # (row, col) per color
+        self.pawns_by_file = {'w': [0] * 8, 'b': [0] * 8}
+        self.king_pos = {'w': None, 'b': None}
+        self.occupancy = {'w': 0, 'b': 0}           # Bitmask of occupied squares (row * 8 + col)
+        self.total_pieces = 0
+        self.game_phase = None
+        self.material = {'w': 0, 'b': 0}            # Phase-dependent piece values
+        self.endgame_material = {'w': 0, 'b': 0}    # Endgame piece values (used for king activity)
+        self.attack_counts = None                   # Filled by the mobility term
+
+
+class EvalProfile:
+    #Cumulative time and call counts per evaluation term
+    def __init__(self):
+        self.times = {term: 0.0 for term in EVAL_TERMS}
+        self.calls = {term: 0 for term in EVAL_TERMS}
+        self.evaluations = 0
+
+    def record(self, term, elapsed):
+        self.times[term] += elapsed
+        self.calls[term] += 1
+
+    def report(self):
+        #Rows of (term, calls, total seconds, microseconds per call), most expensive first
+        rows = []
+        for term in EVAL_TERMS:
+            calls = self.calls[term]
+            per_call = self.times[term] / calls * 1e6 if calls else 0.0
+            rows.append((term, calls, self.times[term], per_call))
+        rows.sort(key=lambda row: row[2], reverse=True)
+        return rows
+
+    def print_report(self):
+        print(f"\n=== Evaluation profile ({self.evaluations} evaluations) ===")
+        print(f"{'term':<16}{'calls':>10}{'total s':>10}{'us/call':>10}")
+        for term, calls, total, per_call in self.report():
+            print(f"{term:<16}{calls:>10}{total:>10.3f}{per_call:>10.1f}")
+
 
 class ChessAI:
-    def __init__(self, depth=4):
-        self.cache = {}
+    def __init__(self, depth=4, eval_cache_size=EVAL_CACHE_SIZE):
         self.depth = depth
         self.transposition_table = {}  # For more efficient alpha-beta search
         self.killer_moves = [[None, None] for _ in range(20)]  # Store killer moves per depth
         self.history_table = {}  # History heuristic
         
-        # Stats tracking for alpha-beta pruning
-        self.stats = {
-            'nodes_evaluated': 0,
-            'alpha_cutoffs': 0,
-            'beta_cutoffs': 0,
-            'transposition_hits': 0,
-            'killer_move_cutoffs': 0,
-            'null_move_cutoffs': 0,
-            'late_move_reductions': 0
-        }
-        
-        # Enhanced center control values with more nuanced weighting
-        self.CENTER_CONTROL_BONUS = [
-            [0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 5, 10, 10, 10, 10, 5, 0],
-            [0, 10, 20, 25, 25, 20, 10, 0],
-            [0, 10, 25, 30, 30, 25, 10, 0],
-            [0, 10, 25, 30, 30, 25, 10, 0],
-            [0, 10, 20, 25, 25, 20, 10, 0],
-            [0, 5, 10, 10, 10, 10, 5, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0],
-        ]
-        
-        # Improved positional values for pieces
-        self.PAWN_POSITION = [
-            [0, 0, 0, 0, 0, 0, 0, 0],
-            [50, 50, 50, 50, 50, 50, 50, 50],
-            [10, 10, 20, 30, 30, 20, 10, 10],
-            [5, 5, 10, 27, 27, 10, 5, 5],
-            [0, 0, 0, 25, 25, 0, 0, 0],
-            [5, -5, -10, 0, 0, -10, -5, 5],
-            [5, 10, 10, -20, -20, 10, 10, 5],
-            [0, 0, 0, 0, 0, 0, 0, 0]
-        ]
-        
-        self.KNIGHT_POSITION = [
-            [-50, -40, -30, -30, -30, -30, -40, -50],
-            [-40, -20, 0, 5, 5, 0, -20, -40],
-            [-30, 5, 15, 20, 20, 15, 5, -30],
-            [-30, 0, 15, 25, 25, 15, 0, -30],
-            [-30, 5, 15, 25, 25, 15, 5, -30],
-            [-30, 10, 15, 20, 20, 15, 10, -30],
-            [-40, -20, 5, 10, 10, 5, -20, -40],
-            [-50, -40, -30, -30, -30, -30, -40, -50]
-        ]
-        
-        self.BISHOP_POSITION = [
-            [-20, -10, -10, -10, -10, -10, -10, -20],
-            [-10, 5, 0, 0, 0, 0, 5, -10],
-            [-10, 10, 10, 10, 10, 10, 10, -10],
-            [-10, 0, 10, 15, 15, 10, 0, -10],
-            [-10, 5, 5, 15, 15, 5, 5, -10],
-            [-10, 0, 5, 10, 10, 5, 0, -10],
-            [-10, 5, 0, 0, 0, 0, 5, -10],
-            [-20, -10, -10, -10, -10, -10, -10, -20]
-        ]
-        
-        self.ROOK_POSITION = [
-            [0, 0, 0, 5, 5, 0, 0, 0],
-            [-5, 0, 0, 0, 0, 0, 0, -5],
-            [-5, 0, 0, 0, 0, 0, 0, -5],
-            [-5, 0, 0, 0, 0, 0, 0, -5],
-            [-5, 0, 0, 0, 0, 0, 0, -5],
-            [-5, 0, 5, 5, 5, 5, 0, -5],
-            [5, 10, 10, 10, 10, 10, 10, 5],
-            [0, 0, 0, 0, 0, 0, 0, 0]
-        ]
-        
-        self.QUEEN_POSITION = [
-            [-20, -10, -10, -5, -5, -10, -10, -20],
-            [-10, 0, 5, 0, 0, 0, 0, -10],
-            [-10, 5, 5, 5, 5, 5, 0, -10],
-            [-5, 0, 5, 5, 5, 5, 0, -5],
-            [0, 0, 5, 5, 5, 5, 0, -5],
-            [-10, 0, 5, 5, 5, 5, 0, -10],
-            [-10, 0, 0, 0, 0, 0, 0, -10],
-            [-20, -10, -10, -5, -5, -10, -10, -20]
-        ]
-        
-        # Enhanced king position tables
-        self.KING_MIDDLEGAME_POSITION = [
-            [30, 40, 10, 0, 0, 10, 40, 30],
-            [20, 20, 0, 0, 0, 0, 20, 20],
-            [-10, -20, -20, -20, -20, -20, -20, -10],
-            [-20, -30, -30, -40, -40, -30, -30, -20],
-            [-30, -40, -40, -50, -50, -40, -40, -30],
-            [-30, -40, -40, -50, -50, -40, -40, -30],
-            [-30, -40, -40, -50, -50, -40, -40, -30],
-            [-30, -40, -40, -50, -50, -40, -40, -30]
-        ]
-        
-        self.KING_ENDGAME_POSITION = [
-            [-50, -30, -30, -30, -30, -30, -30, -50],
-            [-30, -20, 0, 0, 0, 0, -20, -30],
-            [-30, 0, 20, 30, 30, 20, 0, -30],
-            [-30, 0, 30, 40, 40, 30, 0, -30],
-            [-30, 0, 30, 40, 40, 30, 0, -30],
-            [-30, 0, 20, 30, 30, 20, 0, -30],
-            [-30, -20, 0, 0, 0, 0, -20, -30],
-            [-50, -30, -30, -30, -30, -30, -30, -50]
-        ]
-        
-        # King safety bonuses (castling and safe corner)
-        self.KING_SAFETY_BONUS = {
-            'w': {
-                'castled': 150,        # Bonus for castling
-                'pawn_shield': 50,     # Bonus for each pawn in front of the king
-                'open_lines': -30      # Penalty for open lines in front of the king
-            },
-            'b': {
-                'castled': 150,
-                'pawn_shield': 50,
-                'open_lines': -30
-            }
-        }
+        # Search statistics per iteration (see searchstats.py). With collect_stats off only
+        # nodes_searched is counted; `counters` is the running iteration's IterationStats or None
+        self.collect_stats = True
+        self.counters = None
         
         # Cache for storing king positions
         self.king_positions_cache = {}
         
-        # Dynamic piece values based on game phase
-        self.PIECE_VALUES = {
-            'P': {'opening': 100, 'middlegame': 100, 'endgame': 150},
-            'N': {'opening': 320, 'middlegame': 320, 'endgame': 300},
-            'B': {'opening': 330, 'middlegame': 340, 'endgame': 350},
-            'R': {'opening': 500, 'middlegame': 510, 'endgame': 550},
-            'Q': {'opening': 900, 'middlegame': 920, 'endgame': 950},
-            'K': {'opening': 2000, 'middlegame': 2000, 'endgame': 2000}
-        }
-        
-        # Mobility bonus (more legal moves = better position)
-        self.MOBILITY_BONUS = {
-            'P': 1,
-            'N': 4,
-            'B': 3,
-            'R': 2,
-            'Q': 1,
-            'K': 0.5
-        }
-        
-        # Bonuses for specific structures and positions
-        self.PAWN_STRUCTURE_BONUS = {
-            'doubled': -20,         # Penalty for doubled pawns
-            'isolated': -15,        # Penalty for isolated pawns
-            'connected': 10,        # Bonus for connected pawns
-            'passed': 30,           # Bonus for passed pawns
-            'backward': -10,        # Penalty for backward pawns
-            'chain': 8,             # Bonus for pawn chains
-            'protected': 12         # Bonus for protected pawns
-        }
-        
         self.max_time = 14  # Maximum time in seconds for a move
         self.start_time = None
         self.nodes_searched = 0
+        self.max_nodes = None  # Optional node limit per move
+        self.stop_event = threading.Event()  # Set from another thread to end the current search
+        
+        # Outcome of the last get_best_move: move, score (white-positive), completed depth, seldepth, nodes, seconds
+        # and the SearchStats (None when collect_stats is off)
+        self.last_search = None
+        
+        # Live search info (see searchinfo.py): called with a record after every iteration and
+        # every info_interval seconds in between (None = off)
+        self.info_callback = None
+        self.info_interval = DEFAULT_INFO_INTERVAL
+        self.info_due = math.inf
+        self.last_info = None
+        self.iteration_depth = 0
+        self.seldepth = 0
 
-        self.position_cache = {}  # Cache for evaluated positions
-        self.cache_hits = 0
+        self.position_cache = EvalCache(eval_cache_size)  # Bounded cache for evaluated positions
         
         # Aspiration window settings
         self.aspiration_window = 50
@@ -179,52 +351,220 @@ class ChessAI:
         # Null move pruning settings
         self.null_move_depth_threshold = 3
         self.null_move_reduction = 2
+        
+        # Polyglot opening book consulted before searching in the opening (None = no book)
+        self.opening_book = None
+        
+        # Endgame tablebases probed at the root and inside the search (None = no tablebases)
+        self.tablebase = None
+        
+        # On-disk cache of search results shared across sessions (None = off);
+        # results found during a search are collected here and written after the move
+        self.persistent_cache = None
+        self.persistent_pending = {}
+        
+        # Proof-number mate search, used on request and optionally as a helper thread
+        # running next to the normal search (node budget per move, 0 = no helper)
+        self.mate_search = MateSearch()
+        self.mate_helper_nodes = 0
+        self.helper_mate = None
+        
+        # Per-term evaluation profile (None = profiling off)
+        self.eval_profile = None
+        
+        # Phase timers / stack sampler around each search (None = profiling off)
+        self.search_profile = None
+        
+        # Search tree trace recorder (None = off)
+        self.tracer = None
+        
+        # Memory budget in bytes shared by the large tables (None = unlimited), the resulting
+        # entry limit for the transposition table, and per-move tracemalloc snapshots (None = off)
+        self.memory_budget = None
+        self.transposition_limit = None
+        self.allocation_tracker = None
+        
+        # Lazy evaluation: upper bound on what mobility, center control and
+        # coordination can add to the cheap part of the score
+        self.lazy_eval_margin = 200
 
     def reset_stats(self):
-        #Reset the alpha-beta pruning statistics
-        self.stats = {
-            'nodes_evaluated': 0,
-            'alpha_cutoffs': 0,
-            'beta_cutoffs': 0,
-            'transposition_hits': 0,
-            'killer_move_cutoffs': 0,
-            'null_move_cutoffs': 0,
-            'late_move_reductions': 0
-        }
+        #Reset the node count, statistics and move ordering tables before a search
+        self.nodes_searched = 0
+        self.seldepth = 0
+        self.counters = None
         self.killer_moves = [[None, None] for _ in range(20)]
         self.history_table = {}
         
+    def new_game(self):
+        #Forget everything learned about earlier positions (search tables and caches)
+        self.transposition_table = {}
+        self.position_cache.clear()
+        self.mate_search.clear()
+        self.king_positions_cache = {}
+        self.reset_stats()
+        
     def print_stats(self):
-        #Print comprehensive statistics
+        #Print the statistics of the last search
+        stats = self.last_search and self.last_search['stats']
         print("\n=== Enhanced Alpha-Beta Statistics ===")
-        print(f"Total nodes evaluated: {self.stats['nodes_evaluated']}")
-        print(f"Alpha cutoffs: {self.stats['alpha_cutoffs']}")
-        print(f"Beta cutoffs: {self.stats['beta_cutoffs']}")
-        print(f"Killer move cutoffs: {self.stats['killer_move_cutoffs']}")
-        print(f"Null move cutoffs: {self.stats['null_move_cutoffs']}")
-        print(f"Late move reductions: {self.stats['late_move_reductions']}")
-        print(f"Transposition hits: {self.stats['transposition_hits']}")
-        
-        total_cutoffs = (self.stats['alpha_cutoffs'] + self.stats['beta_cutoffs'] + 
-                        self.stats['killer_move_cutoffs'] + self.stats['null_move_cutoffs'])
-        
-        if self.stats['nodes_evaluated'] > 0:
-            pruning_efficiency = total_cutoffs / self.stats['nodes_evaluated'] * 100
-            print(f"Total pruning efficiency: {pruning_efficiency:.2f}%")
+        print(f"Total nodes evaluated: {self.nodes_searched}")
+        if stats is not None:
+            print(stats.format())
+        print(f"Eval cache: {self.position_cache.hits} hits, {self.position_cache.misses} misses, "
+              f"{self.position_cache.evictions} evictions ({len(self.position_cache)}/{self.position_cache.size} slots)")
         print("=====================================\n")
 
     def is_time_up(self):
-        #Check if we've exceeded our time limit
+        #Check if we've exceeded our time limit (a mate found by the helper also ends the search)
+        if self.helper_mate is not None or self.stop_event.is_set():
+            return True
+        if self.max_nodes is not None and self.nodes_searched >= self.max_nodes:
+            return True
+        if self.transposition_limit is not None and len(self.transposition_table) > self.transposition_limit:
+            self.enforce_memory_budget()  # Keeps the budget an upper bound during a long iteration
         if self.start_time is None:
             return False
-        return time.time() - self.start_time > self.max_time
+        now = time.time()
+        if now >= self.info_due:
+            self.report_progress(now)
+        return now - self.start_time > self.max_time
+
+    def load_opening_book(self, path, selection='weighted'):
+        #Open a Polyglot book; selection is 'weighted' (random by weight) or 'best' (highest weight)
+        if self.opening_book is not None:
+            self.opening_book.close()
+        self.opening_book = OpeningBook(path, selection)
+        return self.opening_book
+
+    def get_book_move(self, board, color):
+        #Return a legal book move for the position, or None when out of book
+        if self.opening_book is None or not self.is_opening(board):
+            return None
+        return self.opening_book.choose(board, color, self.get_all_moves(board, color))
+
+    def load_tablebases(self, directory):
+        #Use the tablebase files in a directory; returns the number of tables found
+        tablebase = Tablebase(directory)
+        self.tablebase = tablebase if len(tablebase) else None
+        return len(tablebase)
+
+    def get_tablebase_move(self, board, color):
+        #
+        # Return the best move according to the tablebases, or None when the position is not covered.
+        #
+        # Moves are ranked from the mover's point of view: a win (fastest mate first),
+        # then a draw, then a loss (slowest mate first).
+        #
+        if self.tablebase is None or self.tablebase.probe(board, color) is None:
+            return None
+
+        opponent = 'b' if color == 'w' else 'w'
+        best_move = None
+        best_rank = None
+        for move in self.get_all_moves(board, color):
+            r1, c1, r2, c2 = move
+            piece = board[r1][c1]
+            if piece.name == 'K' and abs(c2 - c1) == 2:
+                continue  # Castling is not part of tablebase positions
+            new_board = self.make_move_fast(board, move)
+            if piece.name == 'P' and r2 in (0, 7):
+                new_board[r2][c2] = Queen(color)
+
+            probe = self.tablebase.probe(new_board, opponent)
+            if probe is None:
+                continue
+            result, plies = probe
+            if result == LOSS:
+                rank = (2, -plies)
+            elif result == DRAW:
+                rank = (1, 0)
+            elif result == WIN:
+                rank = (0, plies)
+            else:
+                continue
+            if best_rank is None or rank > best_rank:
+                best_rank = rank
+                best_move = move
+        return best_move
+
+    def probe_tablebase_score(self, board, color, ply):
+        #Exact score (white-positive) from the tablebases for `color` to move, or None when not covered
+        probe = self.tablebase.probe(board, color)
+        if probe is None:
+            return None
+        result, plies = probe
+        if result == DRAW:
+            score = 0
+        elif result == WIN:
+            score = TABLEBASE_WIN_SCORE - ply - plies
+        elif result == LOSS:
+            score = -(TABLEBASE_WIN_SCORE - ply - plies)
+        else:
+            return None  # e.g. an unpromoted pawn on the last rank
+        if self.counters is not None:
+            self.counters.tablebase_hits += 1
+        return score if color == 'w' else -score
+
+    def load_persistent_cache(self, path, slots=PERSISTENT_CACHE_SLOTS):
+        #Open (or create) an on-disk search cache; results from earlier sessions are used right away
+        self.close_persistent_cache()
+        self.persistent_cache = PersistentCache(path, slots)
+        return self.persistent_cache
+
+    def save_persistent_cache(self):
+        #Hand the results collected since the last save to the cache's writer thread
+        if self.persistent_cache is not None and self.persistent_pending:
+            self.persistent_cache.write_async(self.persistent_pending)
+            self.persistent_pending = {}
+
+    def close_persistent_cache(self):
+        #Write outstanding results and close the cache file
+        if self.persistent_cache is not None:
+            self.save_persistent_cache()
+            self.persistent_cache.close()
+            self.persistent_cache = None
+
+    def find_mate(self, board, color, max_nodes=100000):
+        #Forced mate for `color` as a list of moves (first move first), or None if none was proven
+        return self.mate_search.find_mate(board, color, max_nodes)
+
+    def start_mate_helper(self, board, color):
+        #Run the mate search in a background thread while the main search works on the same position
+        self.helper_mate = None
+        stop_event = threading.Event()
+        board = [row[:] for row in board]
+
+        def worker():
+            line = self.mate_search.find_mate(board, color, self.mate_helper_nodes, stop_event)
+            if line:
+                self.helper_mate = line
+
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        return thread, stop_event
 
     def get_best_move(self, board, color):
         #Calculate and return the best move with time management
         self.start_time = time.time()
-        self.nodes_searched = 0
-
         self.reset_stats()
+        stats = SearchStats() if self.collect_stats else None
+
+        self.last_search = {'move': None, 'score': 0, 'depth': 0, 'seldepth': 0, 'nodes': 0, 'time': 0.0,
+                            'stats': stats}
+        profile = self.search_profile
+        if profile is not None:
+            profile.begin(self)
+        
+        # Book moves are played instantly without searching
+        book_move = self.get_book_move(board, color)
+        if book_move:
+            return self.finish_search(book_move, 0, profile)
+
+        # Covered endgames are played straight from the tablebases
+        tablebase_move = self.get_tablebase_move(board, color)
+        if tablebase_move:
+            return self.finish_search(tablebase_move, 0, profile)
 
         best_move = None
         best_score = 0
@@ -233,11 +573,24 @@ class ChessAI:
         best_move = None
         current_depth = 1
         
+        self.enforce_memory_budget()
+        self.helper_mate = None
+        helper = None
+        if self.mate_helper_nodes and rules_covered(board, color):
+            helper = self.start_mate_helper(board, color)
+        self.last_info = None
+        if self.info_callback is not None:
+            self.info_due = self.start_time + self.info_interval
+        
         # Iterative deepening with aspiration windows
         for depth in range(1, self.depth + 1):
             if self.is_time_up():
                 break
-                
+            
+            counters = stats.begin_iteration(depth) if stats is not None else None
+            self.counters = counters
+            self.iteration_depth = depth
+            iteration_start = time.time()
             try:
                 if depth == 1:
                     # First iteration uses full window
@@ -250,18 +603,99 @@ class ChessAI:
                     
                     # If aspiration window fails, re-search with full window
                     if score <= alpha or score >= beta:
+                        if counters is not None:
+                            counters.aspiration_researches += 1
                         score, move = self.search_with_aspiration(board, color, depth, -math.inf, math.inf)
                 
                 if move:
                     best_move = move
                     best_score = score
+                    self.last_search['depth'] = depth
+                    if self.info_callback is not None:
+                        self.report_iteration(board, color, depth, score)
+                if counters is not None:
+                    counters.completed = True
+                self.enforce_memory_budget()
                     
             except TimeoutError:
                 break
-        
-        self.print_stats()
-        return best_move
+            finally:
+                if counters is not None:
+                    counters.time = time.time() - iteration_start
+        self.counters = None
+        self.info_due = math.inf
+        
+        if helper is not None:
+            thread, stop_event = helper
+            stop_event.set()
+            thread.join()
+            # The line is a proof, not the shortest mate, so it only replaces a search that saw no
+            # win of its own and its score does not claim a distance
+            sign = 1 if color == 'w' else -1
+            if self.helper_mate and best_score * sign < HELPER_MATE_SCORE:
+                best_move = self.helper_mate[0]
+                best_score = HELPER_MATE_SCORE * sign
+            self.helper_mate = None
+        
+        self.save_persistent_cache()
+        return self.finish_search(best_move, best_score, profile)
+    
+    def finish_search(self, move, score, profile):
+        #Complete last_search and the profile for a move from the search, the book or the tablebases
+        if profile is not None:
+            profile.end(self)
+        self.last_search.update(move=move, score=score, nodes=self.nodes_searched, seldepth=self.seldepth,
+                                time=time.time() - self.start_time, memory=self.memory_report())
+        if self.allocation_tracker is not None:
+            self.last_search['allocations'] = self.allocation_tracker.snapshot()
+        return move
     
+    def principal_variation(self, board, color, max_length):
+        #Best line from the transposition table: follow the stored move of each position
+        pv = []
+        seen = set()
+        while len(pv) < max_length:
+            board_key = (self.board_to_key(board), color)
+            entry = self.transposition_table.get(board_key)
+            if entry is None or entry['move'] is None or board_key in seen:
+                break
+            r1, c1, _, _ = entry['move']
+            piece = board[r1][c1]
+            if piece is None or piece.color != color:
+                break
+            seen.add(board_key)
+            pv.append(entry['move'])
+            board = self.make_move_fast(board, entry['move'])
+            color = 'b' if color == 'w' else 'w'
+        return pv
+
+    def _info_record(self, kind, now):
+        #Info record with the current counts; depth, score and PV filled in by the caller
+        elapsed = now - self.start_time
+        limit = self.transposition_limit
+        return {'kind': kind, 'depth': 0, 'seldepth': self.seldepth, 'score': None, 'pv': [],
+                'nodes': self.nodes_searched, 'nps': int(self.nodes_searched / elapsed) if elapsed > 0 else 0,
+                'hashfull': min(1000, len(self.transposition_table) * 1000 // limit) if limit else None,
+                'time': elapsed}
+
+    def report_iteration(self, board, color, depth, score):
+        #Send the result of a completed iteration to info_callback
+        now = time.time()
+        info = self._info_record('iteration', now)
+        info.update(depth=depth, seldepth=max(depth, self.seldepth), score=score,
+                    pv=self.principal_variation(board, color, depth))
+        self.last_info = info
+        self.info_due = now + self.info_interval
+        self.info_callback(info)
+
+    def report_progress(self, now):
+        #Send the counts so far, with the line of the last completed iteration, to info_callback
+        self.info_due = now + self.info_interval
+        info = self._info_record('progress', now)
+        if self.last_info is not None:
+            info.update(depth=self.last_info['depth'], score=self.last_info['score'], pv=self.last_info['pv'])
+        self.info_callback(info)
+
     def search_with_aspiration(self, board, color, depth, alpha, beta):
         #Search with aspiration window
         moves = self.get_all_moves(board, color)
@@ -269,6 +703,11 @@ class ChessAI:
             return 0, None
         
         moves = self.sort_moves_advanced(board, moves, color, depth)
+        board_key = (self.board_to_key(board), color)
+        entry = self.transposition_table.get(board_key)
+        if entry is not None and entry['move'] in moves:
+            moves.remove(entry['move'])
+            moves.insert(0, entry['move'])
         
         best_move = moves[0] if moves else None
         best_score = -math.inf if color == 'w' else math.inf
@@ -291,28 +730,58 @@ class ChessAI:
                 
             if beta <= alpha:
                 break
+        
+        # The root is stored too, so a later search from an earlier position of the same game can reuse it
+        if self.counters is not None:
+            self.counters.tt_stores += 1
+            self.counters.tt_overwrites += entry is not None
+        self.transposition_table[board_key] = {'value': best_score, 'depth': depth, 'move': best_move}
                 
         return best_score, best_move
 
     def alphabeta_enhanced(self, board, depth, alpha, beta, maximizing, original_depth, null_move_allowed=True):
         #Enhanced alpha-beta with multiple pruning techniques
-        self.stats['nodes_evaluated'] += 1
+        self.nodes_searched += 1
+        counters = self.counters
+        if counters is not None:
+            counters.nodes += 1
+            counters.tt_probes += 1
         
         # Check time limit
         if self.is_time_up():
             raise TimeoutError
             
-        # Transposition table lookup
-        board_key = self.board_to_key(board)
-        if board_key in self.transposition_table:
-            entry = self.transposition_table[board_key]
+        # Transposition table lookup; the side to move is part of the key (null moves keep the board)
+        color = 'w' if maximizing else 'b'
+        board_key = (self.board_to_key(board), color)
+        hash_move = None
+        entry = self.transposition_table.get(board_key)
+        if entry is not None:
+            hash_move = entry['move']
             if entry['depth'] >= depth:
-                self.stats['transposition_hits'] += 1
+                if counters is not None:
+                    counters.tt_hits += 1
                 return entry['value']
         
+        # Result from an earlier session (keyed on the full position, side to move included)
+        persistent_key = None
+        if self.persistent_cache is not None:
+            persistent_key = polyglot_key(board, color)
+            value = self.persistent_cache.probe(persistent_key, depth)
+            if value is not None:
+                if counters is not None:
+                    counters.persistent_hits += 1
+                return value
+        
+        # Exact result for small material
+        if self.tablebase is not None and depth < original_depth:
+            score = self.probe_tablebase_score(board, 'w' if maximizing else 'b', original_depth - depth)
+            if score is not None:
+                return score
+        
         # Terminal node check
         if depth == 0:
-            return self.quiescence_search(board, alpha, beta, maximizing, 4)
+            return self.quiescence_search(board, alpha, beta, maximizing, QUIESCENCE_DEPTH)
         
         # Check for game over
         if self.is_game_over(board):
@@ -329,23 +798,24 @@ class ChessAI:
             null_score = self.alphabeta_enhanced(board, depth - self.null_move_reduction - 1, 
                                               -beta, -beta + 1, not maximizing, 
                                               original_depth, False)
-            if maximizing and null_score >= beta:
-                self.stats['null_move_cutoffs'] += 1
-                return beta
-            elif not maximizing and null_score <= alpha:
-                self.stats['null_move_cutoffs'] += 1
-                return alpha
+            if (null_score >= beta) if maximizing else (null_score <= alpha):
+                if counters is not None:
+                    counters.null_move_cutoffs += 1
+                return beta if maximizing else alpha
         
-        # Generate and sort moves
-        color = 'w' if maximizing else 'b'
+        # Generate and sort moves (the best move stored for this position goes first)
         moves = self.get_all_moves(board, color)
         
         if not moves:
             return 0  # Stalemate
             
         moves = self.sort_moves_advanced(board, moves, color, depth)
+        if hash_move in moves:
+            moves.remove(hash_move)
+            moves.insert(0, hash_move)
         
         best_score = -math.inf if maximizing else math.inf
+        best_move = moves[0]
         moves_searched = 0
         
         for i, move in enumerate(moves):
@@ -359,12 +829,15 @@ class ChessAI:
                 reduction = 1 if i < 8 else 2
                 score = self.alphabeta_enhanced(new_board, depth - reduction - 1, alpha, beta, 
                                              not maximizing, original_depth)
+                if counters is not None:
+                    counters.lmr_reductions += 1
                 
                 # If the reduced search suggests this move is good, re-search with full depth
                 if ((maximizing and score > alpha) or (not maximizing and score < beta)):
+                    if counters is not None:
+                        counters.lmr_researches += 1
                     score = self.alphabeta_enhanced(new_board, depth - 1, alpha, beta, 
                                                  not maximizing, original_depth)
-                    self.stats['late_move_reductions'] += 1
             else:
                 # Principal variation search for first move
                 if i == 0:
@@ -376,12 +849,16 @@ class ChessAI:
                         score = self.alphabeta_enhanced(new_board, depth - 1, alpha, alpha + 1, 
                                                      not maximizing, original_depth)
                         if alpha < score < beta:
+                            if counters is not None:
+                                counters.pvs_researches += 1
                             score = self.alphabeta_enhanced(new_board, depth - 1, score, beta, 
                                                          not maximizing, original_depth)
                     else:
                         score = self.alphabeta_enhanced(new_board, depth - 1, beta - 1, beta, 
                                                      not maximizing, original_depth)
                         if alpha < score < beta:
+                            if counters is not None:
+                                counters.pvs_researches += 1
                             score = self.alphabeta_enhanced(new_board, depth - 1, alpha, score, 
                                                          not maximizing, original_depth)
             
@@ -390,8 +867,11 @@ class ChessAI:
             if maximizing:
                 if score > best_score:
                     best_score = score
+                    best_move = move
                 alpha = max(alpha, score)
                 if beta <= alpha:
+                    if counters is not None:
+                        self._count_cutoff(counters, i, move, depth)
                     # Store killer move
                     if depth < len(self.killer_moves):
                         if self.killer_moves[depth][0] != move:
@@ -401,14 +881,15 @@ class ChessAI:
                     # Update history table
                     move_key = self.move_to_key(move)
                     self.history_table[move_key] = self.history_table.get(move_key, 0) + depth * depth
-                    
-                    self.stats['beta_cutoffs'] += 1
                     break
             else:
                 if score < best_score:
                     best_score = score
+                    best_move = move
                 beta = min(beta, score)
                 if beta <= alpha:
+                    if counters is not None:
+                        self._count_cutoff(counters, i, move, depth)
                     # Store killer move
                     if depth < len(self.killer_moves):
                         if self.killer_moves[depth][0] != move:
@@ -418,21 +899,38 @@ class ChessAI:
                     # Update history table
                     move_key = self.move_to_key(move)
                     self.history_table[move_key] = self.history_table.get(move_key, 0) + depth * depth
-                    
-                    self.stats['alpha_cutoffs'] += 1
                     break
         
-        # Store in transposition table
-        self.transposition_table[board_key] = {'value': best_score, 'depth': depth}
+        # Store in transposition table along with the best move for move ordering
+        if counters is not None:
+            counters.tt_stores += 1
+            counters.tt_overwrites += entry is not None
+        self.transposition_table[board_key] = {'value': best_score, 'depth': depth, 'move': best_move}
+        if persistent_key is not None and abs(best_score) < ROOT_RELATIVE_SCORE:
+            self.persistent_pending[persistent_key] = (best_score, depth)
         
         return best_score
     
+    def _count_cutoff(self, counters, index, move, depth):
+        #Record a cutoff by the index-th move searched (called before the move becomes a killer)
+        counters.cutoffs += 1
+        if index == 0:
+            counters.first_move_cutoffs += 1
+        if depth < len(self.killer_moves) and move in self.killer_moves[depth]:
+            counters.killer_cutoffs += 1
+    
     def quiescence_search(self, board, alpha, beta, maximizing, depth):
         #Quiescence search to avoid horizon effect
+        if self.counters is not None:
+            self.counters.qnodes += 1
+        # Plies counted from the nominal horizon of the iteration (reduced lines reach it earlier)
+        ply = self.iteration_depth + QUIESCENCE_DEPTH - depth
+        if ply > self.seldepth:
+            self.seldepth = ply
         if depth == 0:
-            return self.evaluate_board(board)
+            return self.evaluate_board(board, alpha, beta)
             
-        stand_pat = self.evaluate_board(board)
+        stand_pat = self.evaluate_board(board, alpha, beta)
         
         if maximizing:
             if stand_pat >= beta:
@@ -509,10 +1007,8 @@ class ChessAI:
             if depth < len(self.killer_moves):
                 if move == self.killer_moves[depth][0]:
                     score += 9000
-                    self.stats['killer_move_cutoffs'] += 1
                 elif move == self.killer_moves[depth][1]:
                     score += 8000
-                    self.stats['killer_move_cutoffs'] += 1
             
             # 4. History heuristic
             move_key = self.move_to_key(move)
@@ -527,7 +1023,7 @@ class ChessAI:
                 score += 500
             
             # 7. Central squares
-            center_bonus = self.CENTER_CONTROL_BONUS[r2][c2]
+            center_bonus = CENTER_CONTROL_BONUS[r2 * 8 + c2]
             score += center_bonus
             
             # 8. Piece development
@@ -587,58 +1083,6 @@ class ChessAI:
         #Convert move to hashable key
         return tuple(move)
 
-    # Keep all the original evaluation functions
-    def evaluate_board(self, board):
-        #Cached board evaluation (same as original but with fast lookup)
-        board_key = self.board_to_key(board)
-        if board_key in self.position_cache:
-            self.cache_hits += 1
-            return self.position_cache[board_key]
-        
-        # Use original evaluation logic
-        value = self._evaluate_board_internal(board)
-        self.position_cache[board_key] = value
-        return value
-
-    def _evaluate_board_internal(self, board):
-        #Internal evaluation function (same as original)
-        value = 0
-        white_piece_count = 0
-        black_piece_count = 0
-        
-        white_material = 0
-        black_material = 0
-        
-        white_pawns_by_file = [0] * 8
-        black_pawns_by_file = [0] * 8
-        
-        # Phase determination
-        total_pieces = sum(1 for row in board for p in row if p is not None)
-        game_phase = self.determine_game_phase(total_pieces)
-        
-        # Count pieces and calculate material
-        for r, row in enumerate(board):
-            for c, p in enumerate(row):
-                if p:
-                    if p.color == 'w':
-                        white_piece_count += 1
-                        white_material += self.piece_value(p, game_phase)
-                        if p.name == 'P':
-                            white_pawns_by_file[c] += 1
-                    else:
-                        black_piece_count += 1
-                        black_material += self.piece_value(p, game_phase)
-                        if p.name == 'P':
-                            black_pawns_by_file[c] += 1
-        
-        # Material balance
-        value = white_material - black_material
-        
-        # Add position evaluations, mobility, pawn structure, etc.
-        # (Keep all the original evaluation logic here)
-        
-        return value
-
     def _get_move_at_depth(self, board, color, depth):
         best_eval = -math.inf if color == 'w' else math.inf
         best_move = None
@@ -718,12 +1162,17 @@ class ChessAI:
 
     def alphabeta(self, board, depth, alpha, beta, maximizing):
         #Enhanced alpha-beta pruning with better check handling
-        self.stats['nodes_evaluated'] += 1
+        self.nodes_searched += 1
+        counters = self.counters
+        if counters is not None:
+            counters.nodes += 1
+            counters.tt_probes += 1
         board_key = self.board_to_key(board)
 
         # Check transposition table
         if board_key in self.transposition_table and self.transposition_table[board_key]['depth'] >= depth:
-            self.stats['transposition_hits'] += 1
+            if counters is not None:
+                counters.tt_hits += 1
             return self.transposition_table[board_key]['value']
 
         if depth == 0 or self.is_game_over(board):
@@ -763,8 +1212,8 @@ class ChessAI:
                 alpha = max(alpha, eval_value)
                 
                 if beta <= alpha:
-                    if not prune_occurred:  # Count cutoff only once per node
-                        self.stats['beta_cutoffs'] += 1
+                    if not prune_occurred and counters is not None:  # Count cutoff only once per node
+                        counters.cutoffs += 1
                         prune_occurred = True
                     break  # Beta cutoff
                     
@@ -785,8 +1234,8 @@ class ChessAI:
                 beta = min(beta, eval_value)
                 
                 if beta <= alpha:
-                    if not prune_occurred:  # Count cutoff only once per node
-                        self.stats['alpha_cutoffs'] += 1
+                    if not prune_occurred and counters is not None:  # Count cutoff only once per node
+                        counters.cutoffs += 1
                         prune_occurred = True
                     break  # Alpha cutoff
                     
@@ -822,128 +1271,282 @@ class ChessAI:
         #Convert board to a hashable key for the transposition table
         return tuple(tuple((p.name, p.color) if p else None for p in row) for row in board)
 
-    def evaluate_board(self, board):
-        #Cached board evaluation
-        board_key = self.board_to_key(board)
-        if board_key in self.position_cache:
-            self.cache_hits += 1
-            return self.position_cache[board_key]
-        
+    def evaluate_board(self, board, alpha=-math.inf, beta=math.inf):
+        #Cached board evaluation with lazy exit when the cheap terms fall outside the alpha-beta window
+        board_hash = hash(self.board_to_key(board))
+        cached = self.position_cache.lookup(board_hash)
+        if cached is not None:
+            return cached
+        
+        summary = self.summarize_position(board)
+        if self.eval_profile is not None:
+            return self._evaluate_profiled(board_hash, summary, alpha, beta)
+        
+        # Cheap terms (no move generation)
+        white, black = self._eval_material(summary)
+        value = white - black
+        white, black = self._eval_position(summary)
+        value += white - black
+        white, black = self._eval_pawn_structure(summary)
+        value += white - black
+        white, black = self._eval_king_safety(summary)
+        value += white - black
+        white, black = self._eval_development(summary)
+        value += white - black
+        white, black = self._eval_endgame(summary)
+        value += white - black
+        
+        # Lazy exit: mobility, center control and coordination together cannot move
+        # the score more than lazy_eval_margin, so skip them when the window is out of reach.
+        # The partial score is a bound only and is never cached.
+        if value + self.lazy_eval_margin <= alpha or value - self.lazy_eval_margin >= beta:
+            if self.counters is not None:
+                self.counters.lazy_evaluations += 1
+            return value
+        
+        white, black = self._eval_mobility(summary)
+        value += white - black
+        white, black = self._eval_center_control(summary)
+        value += white - black
+        white, black = self._eval_coordination(summary)
+        value += white - black
+        
+        self.position_cache.store(board_hash, value)
+        return value
+    
+    def _evaluate_profiled(self, board_hash, summary, alpha, beta):
+        #Same as evaluate_board, but every term is timed into self.eval_profile
+        profile = self.eval_profile
+        profile.evaluations += 1
         value = 0
-        white_piece_count = 0
-        black_piece_count = 0
-        
-        white_material = 0
-        black_material = 0
-        
-        white_pawns_by_file = [0] * 8
-        black_pawns_by_file = [0] * 8
-        
-        # Phase determination
-        total_pieces = sum(1 for row in board for p in row if p is not None)
-        game_phase = self.determine_game_phase(total_pieces)
+        for term in EVAL_TERMS:
+            if term == LAZY_EVAL_TERMS[0] and (value + self.lazy_eval_margin <= alpha or value - self.lazy_eval_margin >= beta):
+                if self.counters is not None:
+                    self.counters.lazy_evaluations += 1
+                return value
+            term_function = getattr(self, '_eval_' + term)
+            start = time.perf_counter()
+            white, black = term_function(summary)
+            profile.record(term, time.perf_counter() - start)
+            value += white - black
+        
+        self.position_cache.store(board_hash, value)
+        return value
+    
+    def explain_eval(self, board):
+        #Per-term breakdown of the evaluation for each color. Always computes every term and bypasses the cache.
+        summary = self.summarize_position(board)
+        terms = {}
+        total = 0
+        for term in EVAL_TERMS:
+            white, black = getattr(self, '_eval_' + term)(summary)
+            terms[term] = {'w': white, 'b': black}
+            total += white - black
+        return {'phase': summary.game_phase, 'terms': terms, 'total': total}
+    
+    def enable_eval_profiling(self):
+        #Start recording time and call counts per evaluation term (resets any earlier profile)
+        self.eval_profile = EvalProfile()
+        return self.eval_profile
+    
+    def disable_eval_profiling(self):
+        #Stop profiling and return the collected profile
+        profile = self.eval_profile
+        self.eval_profile = None
+        return profile
+    
+    def enable_search_profiling(self, sample=False, interval=DEFAULT_SAMPLE_INTERVAL):
+        #Start timing search phases (and sampling stacks when `sample`) in every get_best_move
+        self.search_profile = SearchProfile(sample, interval)
+        return self.search_profile
+    
+    def disable_search_profiling(self):
+        #Stop profiling searches and return the collected profile
+        profile = self.search_profile
+        self.search_profile = None
+        return profile
+    
+    def set_memory_budget(self, budget):
+        #Share `budget` bytes between the transposition table, evaluation cache and mate table (None = unlimited)
+        self.memory_budget = budget
+        if budget is None:
+            self.transposition_limit = None
+            return
+        self.position_cache.resize(max(1, int(budget * MEMORY_SHARES['position_cache']) // EVAL_CACHE_BYTES_PER_SLOT))
+        self.transposition_limit = max(1, int(budget * MEMORY_SHARES['transposition_table'] //
+                                              entry_bytes(self.transposition_table, DEFAULT_ENTRY_BYTES['transposition_table'])))
+        self.mate_search.table_limit = max(1, int(budget * MEMORY_SHARES['mate_table'] //
+                                                  entry_bytes(self.mate_search.table, DEFAULT_ENTRY_BYTES['mate_table'])))
+        self.enforce_memory_budget()
+    
+    def enforce_memory_budget(self):
+        #Cut the transposition table back when it is over its limit (oldest entries go first).
+        #The mate table is trimmed by the mate search itself, which may be running in the helper thread.
+        trim_table(self.transposition_table, self.transposition_limit)
+    
+    def memory_report(self):
+        #Entry counts, entry limits and estimated bytes of the engine's tables and caches
+        structures = {
+            'transposition_table': {'entries': len(self.transposition_table), 'limit': self.transposition_limit,
+                                    'bytes': table_bytes(self.transposition_table)},
+            'position_cache': {'entries': len(self.position_cache), 'limit': self.position_cache.size,
+                               'bytes': self.position_cache.estimated_bytes()},
+            'mate_table': {'entries': len(self.mate_search.table), 'limit': self.mate_search.table_limit,
+                           'bytes': table_bytes(self.mate_search.table)},
+            'history_table': {'entries': len(self.history_table), 'limit': None,
+                              'bytes': deep_sizeof(self.history_table)},
+            'king_positions_cache': {'entries': len(self.king_positions_cache), 'limit': None,
+                                     'bytes': deep_sizeof(self.king_positions_cache)},
+            'killer_moves': {'entries': sum(move is not None for pair in self.killer_moves for move in pair),
+                             'limit': 2 * len(self.killer_moves), 'bytes': deep_sizeof(self.killer_moves)},
+            'persistent_pending': {'entries': len(self.persistent_pending), 'limit': None,
+                                   'bytes': deep_sizeof(self.persistent_pending)},
+        }
+        return {'structures': structures, 'total': sum(info['bytes'] for info in structures.values()),
+                'budget': self.memory_budget}
+    
+    def enable_allocation_tracking(self):
+        #Take a tracemalloc snapshot after every move, reported in last_search['allocations']
+        if self.allocation_tracker is None:
+            self.allocation_tracker = AllocationTracker()
+        return self.allocation_tracker
+    
+    def disable_allocation_tracking(self):
+        if self.allocation_tracker is not None:
+            self.allocation_tracker.stop()
+            self.allocation_tracker = None
+    
+    def enable_tracing(self, path, capacity=DEFAULT_CAPACITY):
+        #Record every node of the following searches into a ring buffer file (see tracer.py)
+        self.disable_tracing()
+        self.tracer = Tracer(path, capacity)
+        self.tracer.attach(self)
+        return self.tracer
+    
+    def disable_tracing(self):
+        #Stop tracing and close the trace file
+        if self.tracer is not None:
+            self.tracer.close()
+            self.tracer = None
+    
+    def summarize_position(self, board):
+        #Single pass over the board collecting piece lists, king squares, pawn files, occupancy and material
+        summary = PositionSummary(board)
+        pieces = summary.pieces
+        piece_counts = {'w': dict.fromkeys('PNBRQK', 0), 'b': dict.fromkeys('PNBRQK', 0)}
         
-        # Count pieces and calculate material
         for r, row in enumerate(board):
             for c, p in enumerate(row):
                 if p:
-                    if p.color == 'w':
-                        white_piece_count += 1
-                        white_material += self.piece_value(p, game_phase)
-                        if p.name == 'P':
-                            white_pawns_by_file[c] += 1
-                    else:
-                        black_piece_count += 1
-                        black_material += self.piece_value(p, game_phase)
-                        if p.name == 'P':
-                            black_pawns_by_file[c] += 1
-        
-        # Material balance
-        value = white_material - black_material
-        
-        # Board position value for all pieces
-        white_position_value = 0
-        black_position_value = 0
-        
-        # Mobility
-        white_mobility = 0
-        black_mobility = 0
-        
-        # Pawn structure
-        white_pawn_structure = 0
-        black_pawn_structure = 0
-        
-        # King safety
-        white_king_safety = 0
-        black_king_safety = 0
-        
-        # Find king positions
-        white_king_pos = self.find_king(board, 'w')
-        black_king_pos = self.find_king(board, 'b')
-        
-        # Evaluate all pieces on the board
-        for r, row in enumerate(board):
-            for c, p in enumerate(row):
-                if not p:
-                    continue
-                    
-                # Position evaluation based on piece type
-                position_value = self.get_position_value(p.name, r, c, game_phase == 'endgame', p.color)
-                
-                # Mobility (number of legal moves)
-                possible_moves = p.get_possible_moves(board, r, c)
-                mobility_value = len(possible_moves) * self.MOBILITY_BONUS.get(p.name, 0)
-                
-                if p.color == 'w':
-                    white_position_value += position_value
-                    white_mobility += mobility_value
-                    
-                    # Pawn structure evaluation for white
-                    if p.name == 'P':
-                        white_pawn_structure += self.evaluate_pawn_structure(board, r, c, 'w', white_pawns_by_file)
-                else:
-                    black_position_value += position_value
-                    black_mobility += mobility_value
-                    
-                    # Pawn structure evaluation for black
-                    if p.name == 'P':
-                        black_pawn_structure += self.evaluate_pawn_structure(board, r, c, 'b', black_pawns_by_file)
-        
-        # Evaluate king safety if kings are on the board
+                    color = p.color
+                    name = p.name
+                    pieces[color].append((r, c, p))
+                    summary.occupancy[color] |= 1 << (r * 8 + c)
+                    piece_counts[color][name] += 1
+                    if name == 'P':
+                        summary.pawns[color].append((r, c))
+                        summary.pawns_by_file[color][c] += 1
+                    elif name == 'K':
+                        summary.king_pos[color] = (r, c)
+        
+        summary.total_pieces = len(pieces['w']) + len(pieces['b'])
+        game_phase = self.determine_game_phase(summary.total_pieces)
+        summary.game_phase = game_phase
+        
+        # Material from the piece counts
+        for color in ('w', 'b'):
+            for name, count in piece_counts[color].items():
+                if count:
+                    values = PIECE_VALUES[name]
+                    summary.material[color] += count * values[game_phase]
+                    summary.endgame_material[color] += count * values['endgame']
+        
+        return summary
+    
+    def _eval_material(self, summary):
+        #Material for each side using phase-dependent piece values
+        return summary.material['w'], summary.material['b']
+    
+    def _eval_position(self, summary):
+        #Piece-square table values
+        is_endgame = summary.game_phase == 'endgame'
+        white = 0
+        for r, c, p in summary.pieces['w']:
+            white += self.get_position_value(p.name, r, c, is_endgame, 'w')
+        black = 0
+        for r, c, p in summary.pieces['b']:
+            black += self.get_position_value(p.name, r, c, is_endgame, 'b')
+        return white, black
+    
+    def _eval_pawn_structure(self, summary):
+        #Doubled, isolated, passed and protected pawns
+        board = summary.board
+        white_files = summary.pawns_by_file['w']
+        black_files = summary.pawns_by_file['b']
+        white_pawns = summary.pawns['w']
+        black_pawns = summary.pawns['b']
+        white = 0
+        for r, c in white_pawns:
+            white += self.evaluate_pawn_structure(board, r, c, 'w', white_files, black_pawns)
+        black = 0
+        for r, c in black_pawns:
+            black += self.evaluate_pawn_structure(board, r, c, 'b', black_files, white_pawns)
+        return white, black
+    
+    def _eval_king_safety(self, summary):
+        #Castling position, pawn shield and open lines in front of each king
+        white = black = 0
+        white_king_pos = summary.king_pos['w']
+        black_king_pos = summary.king_pos['b']
         if white_king_pos:
-            white_king_safety = self.evaluate_king_safety(board, white_king_pos, 'w', game_phase)
-        
+            white = self.evaluate_king_safety(summary.board, white_king_pos, 'w', summary.game_phase)
         if black_king_pos:
-            black_king_safety = self.evaluate_king_safety(board, black_king_pos, 'b', game_phase)
-        
-        # Add all components to the final evaluation
-        value += (white_position_value - black_position_value)
-        value += (white_mobility - black_mobility)
-        value += (white_pawn_structure - black_pawn_structure)
-        value += (white_king_safety - black_king_safety)
-        
-        # Add bonus for development in the opening
-        if game_phase == 'opening':
-            white_development = self.calculate_development(board, 'w')
-            black_development = self.calculate_development(board, 'b')
-            value += (white_development - black_development) * 10
-        
-        # Add bonuses for center control
-        value += self.evaluate_center_control(board)
-        
-        # Add bonuses for piece coordination
-        value += self.evaluate_piece_coordination(board)
-        
-        # Endgame-specific evaluations
-        if game_phase == 'endgame':
-            value += self.evaluate_endgame(board, white_king_pos, black_king_pos)
-            
-        self.position_cache[board_key] = value
-        return value
+            black = self.evaluate_king_safety(summary.board, black_king_pos, 'b', summary.game_phase)
+        return white, black
+    
+    def _eval_development(self, summary):
+        #Bonus for developed minor pieces in the opening
+        if summary.game_phase != 'opening':
+            return 0, 0
+        return (self.calculate_development(summary.pieces['w'], 'w') * 10,
+                self.calculate_development(summary.pieces['b'], 'b') * 10)
+    
+    def _eval_endgame(self, summary):
+        #King activity in the endgame
+        if summary.game_phase != 'endgame':
+            return 0, 0
+        return self.evaluate_endgame(summary)
+    
+    def _eval_mobility(self, summary):
+        #Mobility (number of moves), counted without building move lists.
+        #The same pass fills the per-square attack counts used for center control.
+        board = summary.board
+        mobility_bonus = MOBILITY_BONUS
+        attack_counts = {'w': [0] * 64, 'b': [0] * 64}
+        totals = {'w': 0, 'b': 0}
+        for color in ('w', 'b'):
+            counts = attack_counts[color]
+            total = 0
+            for r, c, p in summary.pieces[color]:
+                total += self.count_mobility(board, r, c, p, counts) * mobility_bonus.get(p.name, 0)
+            totals[color] = total
+        summary.attack_counts = attack_counts
+        return totals['w'], totals['b']
+    
+    def _eval_center_control(self, summary):
+        #Occupation of and attacks on the center
+        return self.evaluate_center_control(summary.board, summary.attack_counts)
+    
+    def _eval_coordination(self, summary):
+        #Pairs of same-colored pieces close enough to support each other
+        return self.evaluate_piece_coordination(summary)
 
-    def evaluate_endgame(self, board, white_king_pos, black_king_pos):
-        #Evaluate endgame-specific factors
-        value = 0
+    def evaluate_endgame(self, summary):
+        #Evaluate endgame-specific factors, returned as (white, black) bonuses
+        white = 0
+        black = 0
+        white_king_pos = summary.king_pos['w']
+        black_king_pos = summary.king_pos['b']
         
         # If we have kings
         if white_king_pos and black_king_pos:
@@ -955,22 +1558,23 @@ class ChessAI:
             white_king_center_dist = max(abs(white_king_r - 3.5), abs(white_king_c - 3.5))
             black_king_center_dist = max(abs(black_king_r - 3.5), abs(black_king_c - 3.5))
             
-            # King centralization bonus (white wants smaller distance, black wants larger)
-            value += (black_king_center_dist - white_king_center_dist) * 10
+            # King centralization bonus (smaller distance is better for both sides)
+            white -= white_king_center_dist * 10
+            black -= black_king_center_dist * 10
             
             # If one side has a material advantage, encourage moving kings closer to opponent king
-            material_diff = self.count_material(board, 'w') - self.count_material(board, 'b')
+            material_diff = summary.endgame_material['w'] - summary.endgame_material['b']
             
             if material_diff > 300:  # White advantage
                 # Kings distance - white wants to get closer
                 king_distance = abs(white_king_r - black_king_r) + abs(white_king_c - black_king_c)
-                value -= king_distance * 10
+                white -= king_distance * 10
             elif material_diff < -300:  # Black advantage
                 # Kings distance - black wants to get closer
                 king_distance = abs(white_king_r - black_king_r) + abs(white_king_c - black_king_c)
-                value += king_distance * 10
+                black -= king_distance * 10
         
-        return value
+        return white, black
         
     def count_material(self, board, color):
         #Count total material value for a given color
@@ -978,158 +1582,39 @@ class ChessAI:
         for row in board:
             for piece in row:
                 if piece and piece.color == color:
-                    total += self.PIECE_VALUES[piece.name]['endgame']
+                    total += PIECE_VALUES[piece.name]['endgame']
         return total
 
-    def determine_game_phase(self, total_pieces):
-        #Determine the current game phase based on number of pieces
-        if total_pieces >= 28:  # 32 - 4 pieces
-            return 'opening'
-        elif total_pieces >= 15:
-            return 'middlegame'
-        else:
-            return 'endgame'
-    
-    def evaluate_pawn_structure(self, board, row, col, color, pawns_by_file):
-        #Evaluate pawn structure for a given pawn
-        value = 0
-        
-        # Doubled pawns (penalty)
-        if pawns_by_file[col] > 1:
-            value += self.PAWN_STRUCTURE_BONUS['doubled']
-            
-        # Isolated pawns (penalty)
-        is_isolated = True
-        for adj_file in [col-1, col+1]:
-            if 0 <= adj_file < 8 and pawns_by_file[adj_file] > 0:
-                is_isolated = False
-                break
-        if is_isolated:
-            value += self.PAWN_STRUCTURE_BONUS['isolated']
-            
-        # Connected pawns (bonus)
-        is_connected = False
-        for adj_col in [col-1, col+1]:
-            if 0 <= adj_col < 8:
-                for adj_row in [row-1, row, row+1]:
-                    if 0 <= adj_row < 8 and board[adj_row][adj_col] and board[adj_row][adj_col].name == 'P' and board[adj_row][adj_col].color == color:
-                        is_connected = True
-                        break
-        if is_connected:
-            value += self.PAWN_STRUCTURE_BONUS['connected']
-            
-        # Passed pawns (bonus - no opponent pawns in front or to the sides)
-        is_passed = True
-        forward_range = range(row-1, -1, -1) if color == 'w' else range(row+1, 8)
-        for r in forward_range:
-            for c in [col-1, col, col+1]:
-                if 0 <= c < 8 and 0 <= r < 8 and board[r][c] and board[r][c].name == 'P' and board[r][c].color != color:
-                    is_passed = False
-                    break
-        if is_passed:
-            value += self.PAWN_STRUCTURE_BONUS['passed']
-            
-        # Protected pawns (bonus)
-        is_protected = False
-        protect_row = row + 1 if color == 'w' else row - 1
-        for protect_col in [col-1, col+1]:
-            if 0 <= protect_row < 8 and 0 <= protect_col < 8:
-                protector = board[protect_row][protect_col]
-                if protector and protector.name == 'P' and protector.color == color:
-                    is_protected = True
-                    break
-        if is_protected:
-            value += self.PAWN_STRUCTURE_BONUS['protected']
-            
-        return value
-          
-    def evaluate_piece_coordination(self, board):
-        #Evaluate how well pieces coordinate with each other
-        coordination_score = 0
-        piece_positions = {'w': [], 'b': []}
-
-        # Find all pieces
-        for r in range(8):
-            for c in range(8):
-                piece = board[r][c]
-                if piece:
-                    piece_positions[piece.color].append((r, c))
-
-        # Evaluate coordination between pieces
-        for color in ['w', 'b']:
-            for i, (r1, c1) in enumerate(piece_positions[color]):
-                for j in range(i + 1, len(piece_positions[color])):
-                    r2, c2 = piece_positions[color][j]
-                    # Manhattan distance between pieces
-                    distance = abs(r1 - r2) + abs(c1 - c2)
-                    if distance <= 2:  # Pieces are close enough to support each other
-                        coordination_score += 1 if color == 'w' else -1
-
-        return coordination_score
-            
-    def evaluate_king_safety(self, board, king_pos, color, game_phase):
-        #Evaluate king safety based on position, pawn protection, and open lines
-        if game_phase == 'endgame':
-            return 0  # In endgame, king safety is less important
-        king_row, king_col = king_pos
-        value = 0
+    def evaluate_piece_coordination(self, summary):
+        #Evaluate how well pieces coordinate with each other: (white, black) counts of same-colored pairs within Manhattan distance 2
+        white_occupancy = summary.occupancy['w']
+        black_occupancy = summary.occupancy['b']
         
-        # Check for castling (based on king position)
-        if color == 'w' and king_row == 7:
-            if king_col in [1, 2]:  # King is in queenside castle position
-                value += self.KING_SAFETY_BONUS[color]['castled']
-            elif king_col in [6, 7]:  # King is in kingside castle position
-                value += self.KING_SAFETY_BONUS[color]['castled']
-        elif color == 'b' and king_row == 0:
-            if king_col in [1, 2]:  # King is in queenside castle position
-                value += self.KING_SAFETY_BONUS[color]['castled']
-            elif king_col in [6, 7]:  # King is in kingside castle position
-                value += self.KING_SAFETY_BONUS[color]['castled']
-                
-        # Check for pawn shield in front of king
-        pawn_shield_count = 0
-        front_row = king_row - 1 if color == 'w' else king_row + 1
-        if 0 <= front_row < 8:
-            for c in [king_col-1, king_col, king_col+1]:
-                if 0 <= c < 8 and board[front_row][c] and board[front_row][c].name == 'P' and board[front_row][c].color == color:
-                    pawn_shield_count += 1
-                    
-        value += pawn_shield_count * self.KING_SAFETY_BONUS[color]['pawn_shield']
-        
-        # Check for open lines in front of king
-        open_lines_count = 0
-        for c in [king_col-1, king_col, king_col+1]:
-            if 0 <= c < 8:
-                has_pawn = False
-                for r in range(8):
-                    if board[r][c] and board[r][c].name == 'P':
-                        has_pawn = True
-                        break
-                if not has_pawn:
-                    open_lines_count += 1
-                    
-        value += open_lines_count * self.KING_SAFETY_BONUS[color]['open_lines']
+        # Every close pair is seen once from each end
+        white_pairs = sum((NEIGHBOURHOOD_MASKS[r * 8 + c] & white_occupancy).bit_count() for r, c, _ in summary.pieces['w']) // 2
+        black_pairs = sum((NEIGHBOURHOOD_MASKS[r * 8 + c] & black_occupancy).bit_count() for r, c, _ in summary.pieces['b']) // 2
         
-        return value
-    
-    def evaluate_center_control(self, board):
-        #Evaluate control over the center
-        value = 0
-        
-        # Define central squares
-        center_squares = [(3, 3), (3, 4), (4, 3), (4, 4)]
-        extended_center = [(2, 2), (2, 3), (2, 4), (2, 5), 
-                          (3, 2), (3, 5), 
-                          (4, 2), (4, 5), 
-                          (5, 2), (5, 3), (5, 4), (5, 5)]
+        return white_pairs, black_pairs
+            
+    def evaluate_center_control(self, board, attack_counts=None):
+        #Evaluate control over the center, returned as (white, black) scores
+        if attack_counts is None:
+            attack_counts = {'w': [0] * 64, 'b': [0] * 64}
+            for r, row in enumerate(board):
+                for c, p in enumerate(row):
+                    if p:
+                        self.count_mobility(board, r, c, p, attack_counts[p.color])
+        
+        white_attacks = attack_counts['w']
+        black_attacks = attack_counts['b']
         
         # Tæl antallet af centrale felter der er kontrolleret af hver spiller
         white_center_control = 0
         black_center_control = 0
         
-        for r, c in center_squares:
+        for sq in CENTER_SQUARES:
             # Centrumskontrol med brikker
-            piece = board[r][c]
+            piece = board[sq >> 3][sq & 7]
             if piece:
                 if piece.color == 'w':
                     white_center_control += 3
@@ -1137,16 +1622,13 @@ class ChessAI:
                     black_center_control += 3
             
             # Centrumskontrol med angreb
-            white_attacks = self.count_attacks_on_square(board, r, c, 'w')
-            black_attacks = self.count_attacks_on_square(board, r, c, 'b')
-            
-            white_center_control += white_attacks * 2
-            black_center_control += black_attacks * 2
+            white_center_control += white_attacks[sq] * 2
+            black_center_control += black_attacks[sq] * 2
             
         # Tæl det udvidede centrum
-        for r, c in extended_center:
+        for sq in EXTENDED_CENTER_SQUARES:
             # Centrumskontrol med brikker
-            piece = board[r][c]
+            piece = board[sq >> 3][sq & 7]
             if piece:
                 if piece.color == 'w':
                     white_center_control += 1
@@ -1154,13 +1636,73 @@ class ChessAI:
                     black_center_control += 1
             
             # Centrumskontrol med angreb
-            white_attacks = self.count_attacks_on_square(board, r, c, 'w')
-            black_attacks = self.count_attacks_on_square(board, r, c, 'b')
+            white_center_control += white_attacks[sq]
+            black_center_control += black_attacks[sq]
             
-            white_center_control += white_attacks
-            black_center_control += black_attacks
-            
-        return (white_center_control - black_center_control) * 2
+        return white_center_control * 2, black_center_control * 2
+    
+    def count_mobility(self, board, r, c, piece, attack_counts):
+        #Count the moves of a piece without building a move list; each target square is added to attack_counts.
+        #Matches get_possible_moves except that castling is not counted (it needs full attack scans).
+        color = piece.color
+        name = piece.name
+        count = 0
+        
+        if name == 'P':
+            direction = -1 if color == 'w' else 1
+            nr = r + direction
+            if not 0 <= nr < 8:
+                return 0
+            ahead = board[nr]
+            if ahead[c] is None:
+                count += 1
+                attack_counts[nr * 8 + c] += 1
+                start_row = 6 if color == 'w' else 1
+                if r == start_row and board[nr + direction][c] is None:
+                    count += 1
+                    attack_counts[(nr + direction) * 8 + c] += 1
+            for nc in (c - 1, c + 1):
+                if 0 <= nc < 8:
+                    target = ahead[nc]
+                    if target is not None:
+                        if target.color != color:
+                            count += 1
+                            attack_counts[nr * 8 + nc] += 1
+                    elif r == (3 if color == 'w' else 4):
+                        # En-passant
+                        enemy_pawn = board[r][nc]
+                        if enemy_pawn is not None and enemy_pawn.name == 'P' and enemy_pawn.color != color and enemy_pawn.en_passant_vulnerable:
+                            count += 1
+                            attack_counts[nr * 8 + nc] += 1
+            return count
+        
+        sq = r * 8 + c
+        if name == 'N' or name == 'K':
+            for target_sq in (KNIGHT_TARGETS[sq] if name == 'N' else KING_TARGETS[sq]):
+                target = board[target_sq >> 3][target_sq & 7]
+                if target is None or target.color != color:
+                    count += 1
+                    attack_counts[target_sq] += 1
+            return count
+        
+        if name == 'R':
+            rays = ROOK_RAYS[sq]
+        elif name == 'B':
+            rays = BISHOP_RAYS[sq]
+        else:
+            rays = QUEEN_RAYS[sq]
+        for ray in rays:
+            for target_sq in ray:
+                target = board[target_sq >> 3][target_sq & 7]
+                if target is None:
+                    count += 1
+                    attack_counts[target_sq] += 1
+                else:
+                    if target.color != color:
+                        count += 1
+                        attack_counts[target_sq] += 1
+                    break
+        return count
     
     def count_attacks_on_square(self, board, row, col, color):
         #Tæller hvor mange angreb en spiller har på et specifikt felt
@@ -1174,9 +1716,6 @@ class ChessAI:
                         count += 1
         return count
     
-    def piece_value(self, piece, phase='middlegame'):
-        return self.PIECE_VALUES[piece.name][phase]
-
     def determine_game_phase(self, total_pieces):
         if total_pieces >= 28:
             return 'opening'
@@ -1185,27 +1724,12 @@ class ChessAI:
         else:
             return 'endgame'
 
-    def get_position_value(self, name, r, c, is_endgame, color):
-        if color == 'b':
-            r = 7 - r  # vend rækken for sort
-
-        table = {
-            'P': self.PAWN_POSITION,
-            'N': self.KNIGHT_POSITION,
-            'B': self.BISHOP_POSITION,
-            'R': self.ROOK_POSITION,
-            'Q': self.QUEEN_POSITION,
-            'K': self.KING_ENDGAME_POSITION if is_endgame else self.KING_MIDDLEGAME_POSITION
-        }.get(name)
-
-        return table[r][c] if table else 0
-
-    def evaluate_pawn_structure(self, board, r, c, color, pawns_by_file):
+    def evaluate_pawn_structure(self, board, r, c, color, pawns_by_file, enemy_pawns):
         score = 0
 
         # Dobbeltbønder
         if pawns_by_file[c] > 1:
-            score += self.PAWN_STRUCTURE_BONUS['doubled']
+            score += PAWN_STRUCTURE_BONUS['doubled']
 
         # Isoleret bønde
         is_isolated = True
@@ -1215,22 +1739,17 @@ class ChessAI:
                 is_isolated = False
                 break
         if is_isolated:
-            score += self.PAWN_STRUCTURE_BONUS['isolated']
+            score += PAWN_STRUCTURE_BONUS['isolated']
 
         # Fribønder og beskyttede bønder
         direction = -1 if color == 'w' else 1
         protected = False
         passed = True
 
-        for dr in range(1, 8):
-            nr = r + dr * direction
-            if 0 <= nr < 8:
-                for dc in [-1, 0, 1]:
-                    nc = c + dc
-                    if 0 <= nc < 8:
-                        target = board[nr][nc]
-                        if target and target.name == 'P' and target.color != color:
-                            passed = False
+        for er, ec in enemy_pawns:
+            if -1 <= ec - c <= 1 and (er - r) * direction > 0:
+                passed = False
+                break
         
         for dr in [-1]:
             nr = r + dr * direction
@@ -1242,9 +1761,9 @@ class ChessAI:
                         protected = True
 
         if passed:
-            score += self.PAWN_STRUCTURE_BONUS['passed']
+            score += PAWN_STRUCTURE_BONUS['passed']
         if protected:
-            score += self.PAWN_STRUCTURE_BONUS['protected']
+            score += PAWN_STRUCTURE_BONUS['protected']
 
         return score
 
@@ -1254,16 +1773,16 @@ class ChessAI:
 
         # Bonus hvis rokade er foretaget (baseret på placering)
         if (color == 'w' and r == 7 and c in (6, 2)) or (color == 'b' and r == 0 and c in (6, 2)):
-            score += self.KING_SAFETY_BONUS[color]['castled']
+            score += KING_SAFETY_BONUS['castled']
 
         # Bonus for åbne linjer foran kongen
         for dc in [-1, 0, 1]:
             nc = c + dc
             if 0 <= nc < 8:
                 if color == 'w' and (r - 1 >= 0 and board[r - 1][nc] is None):
-                    score += self.KING_SAFETY_BONUS[color]['open_lines']
+                    score += KING_SAFETY_BONUS['open_lines']
                 if color == 'b' and (r + 1 < 8 and board[r + 1][nc] is None):
-                    score += self.KING_SAFETY_BONUS[color]['open_lines']
+                    score += KING_SAFETY_BONUS['open_lines']
 
         # Bonus for bondeskjold
         for dc in [-1, 0, 1]:
@@ -1272,39 +1791,34 @@ class ChessAI:
                 if color == 'w' and r - 1 >= 0:
                     shield = board[r - 1][nc]
                     if shield and shield.name == 'P' and shield.color == 'w':
-                        score += self.KING_SAFETY_BONUS['w']['pawn_shield']
+                        score += KING_SAFETY_BONUS['pawn_shield']
                 elif color == 'b' and r + 1 < 8:
                     shield = board[r + 1][nc]
                     if shield and shield.name == 'P' and shield.color == 'b':
-                        score += self.KING_SAFETY_BONUS['b']['pawn_shield']
+                        score += KING_SAFETY_BONUS['pawn_shield']
 
         return score
 
-    def calculate_development(self, board, color):
-        #Calculate development score based on how many minor pieces have moved
+    def calculate_development(self, pieces, color):
+        #Calculate development score based on how many minor pieces have moved (pieces: (row, col, piece) list for color)
         development_score = 0
         
         # Check development of knights and bishops
-        for r in range(8):
-            for c in range(8):
-                piece = board[r][c]
-                if piece and piece.color == color and piece.name in ['N', 'B']:
-                    # Give points if the piece is not on its starting position
-                    if (color == 'w' and r < 7) or (color == 'b' and r > 0):
-                        development_score += 1
-                        
-                        # Additional bonus for centralized minor pieces
-                        if 2 <= r <= 5 and 2 <= c <= 5:
-                            development_score += 0.5
+        for r, c, piece in pieces:
+            if piece.name == 'N' or piece.name == 'B':
+                # Give points if the piece is not on its starting position
+                if (color == 'w' and r < 7) or (color == 'b' and r > 0):
+                    development_score += 1
+                    
+                    # Additional bonus for centralized minor pieces
+                    if 2 <= r <= 5 and 2 <= c <= 5:
+                        development_score += 0.5
         
         return development_score
 
 
     def find_king(self, board, color):
         #Find the king position for the given color
-        # Clear the cache to ensure fresh king position lookup
-        self.king_positions_cache = {}
-            
         for r, row in enumerate(board):
             for c, piece in enumerate(row):
                 if piece and piece.name == 'K' and piece.color == color:
@@ -1443,23 +1957,12 @@ class ChessAI:
         return moves
     def piece_value(self, piece, phase='middlegame'):
         #Get the value of a piece based on the game phase
-        return self.PIECE_VALUES[piece.name][phase]
+        return PIECE_VALUES[piece.name][phase]
 
     def get_position_value(self, name, r, c, is_endgame, color):
         #Get the positional value of a piece based on its type and position
-        if color == 'b':
-            r = 7 - r  # Mirror the row for black pieces
-        
-        table = {
-            'P': self.PAWN_POSITION,
-            'N': self.KNIGHT_POSITION,
-            'B': self.BISHOP_POSITION,
-            'R': self.ROOK_POSITION,
-            'Q': self.QUEEN_POSITION,
-            'K': self.KING_ENDGAME_POSITION if is_endgame else self.KING_MIDDLEGAME_POSITION
-        }.get(name)
-        
-        return table[r][c] if table else 0
+        table = PIECE_SQUARE_TABLES[color, is_endgame].get(name)
+        return table[r * 8 + c] if table else 0
 
     def is_checkmate(self, board, color):
         
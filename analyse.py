@@ -0,0 +1,174 @@
+import argparse
+import json
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from alphabeta import ChessAI
+from fen import board_from_fen, parse_epd, move_to_uci
+
+#
+# Batch analysis of FEN/EPD positions.
+#
+#   python analyse.py positions.epd --depth 4 --workers 8 --out results.jsonl
+#   cat positions.fen | python analyse.py - --time 2
+#
+# Positions are read lazily and only a bounded number are in flight at once, so the input
+# can be arbitrarily large. One JSON line is written per position as soon as it finishes
+# (in completion order). With --resume, positions whose id is already in the output file
+# are skipped and new results are appended.
+#
+
+# Depth used when only a time or node limit is given (iterative deepening stops on the limit)
+MAX_DEPTH = 64
+
+# Positions queued per worker; keeps every worker busy without reading the whole input
+IN_FLIGHT_PER_WORKER = 2
+
+_worker_ai = None
+
+
+def _init_worker(limits, tablebase_path):
+    #Runs once in every worker process
+    global _worker_ai
+    _worker_ai = ChessAI(depth=limits['depth'] or MAX_DEPTH)
+    _worker_ai.collect_stats = False
+    _worker_ai.max_time = limits['time'] if limits['time'] else math.inf
+    _worker_ai.max_nodes = limits['nodes']
+    if tablebase_path:
+        _worker_ai.load_tablebases(tablebase_path)
+
+
+def analyse_position(task):
+    #Search one position in a worker process and return its JSON-ready result
+    position_id, fen, operations = task
+    result = {'id': position_id, 'fen': fen}
+    if operations:
+        result['epd'] = operations
+    try:
+        board, color, _, _ = board_from_fen(fen)
+    except ValueError as error:
+        result['error'] = str(error)  # A bad input line; errors in the search itself are not hidden
+        return result
+    _worker_ai.new_game()
+    move = _worker_ai.get_best_move(board, color)
+
+    search = _worker_ai.last_search
+    score = search['score'] if color == 'w' else -search['score']
+    result.update(
+        bestmove=move_to_uci(board, move) if move else None,
+        score=score,
+        depth=search['depth'],
+        nodes=search['nodes'],
+        time=round(search['time'], 3),
+        nps=int(search['nodes'] / search['time']) if search['time'] > 0 else 0,
+    )
+    return result
+
+
+def read_positions(stream, skip_ids, skipped=None):
+    #Yield (id, fen, operations) for every position line; the id is the EPD 'id' or the line number.
+    #The ids of input positions left out because of skip_ids are appended to `skipped`
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            fen, operations = parse_epd(line)
+        except ValueError as error:
+            print(f"line {number}: {error}", file=sys.stderr)
+            continue
+        position_id = operations.get('id', str(number))
+        if position_id not in skip_ids:
+            yield position_id, fen, operations
+        elif skipped is not None:
+            skipped.append(position_id)
+
+
+def finished_ids(path):
+    #Ids already present in an earlier output file (for --resume)
+    done = set()
+    if path and os.path.exists(path):
+        with open(path) as results:
+            for line in results:
+                try:
+                    done.add(json.loads(line)['id'])
+                except (ValueError, KeyError):
+                    continue  # A line cut off by an interrupted run
+    return done
+
+
+def drop_partial_line(path):
+    #Cut off a last line without a newline, left by an interrupted run, so appending starts on a fresh line
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as results:
+        data = results.read()
+        if data and not data.endswith(b'\n'):
+            results.truncate(data.rfind(b'\n') + 1)
+
+
+def run(positions, output, workers, limits, tablebase_path=None):
+    #Analyse positions with a process pool, writing each result as it completes; returns the count
+    count = 0
+    max_in_flight = workers * IN_FLIGHT_PER_WORKER
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(limits, tablebase_path)) as pool:
+        pending = set()
+        for task in positions:
+            pending.add(pool.submit(analyse_position, task))
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                count += _write(done, output)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            count += _write(done, output)
+    return count
+
+
+def _write(futures, output):
+    for future in futures:
+        output.write(json.dumps(future.result()) + '\n')
+    output.flush()
+    return len(futures)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse FEN/EPD positions with the chess engine.")
+    parser.add_argument('input', help="File with one FEN or EPD per line, or - for stdin")
+    parser.add_argument('--out', help="JSON-lines output file (default: stdout)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument('--depth', type=int, help="Search depth per position")
+    parser.add_argument('--time', type=float, help="Seconds per position")
+    parser.add_argument('--nodes', type=int, help="Node limit per position")
+    parser.add_argument('--tablebases', help="Directory with tablebase files")
+    parser.add_argument('--resume', action='store_true',
+                        help="Skip positions already in --out and append the rest")
+    args = parser.parse_args(argv)
+
+    if args.resume and not args.out:
+        parser.error("--resume needs --out")
+    limits = {'depth': args.depth, 'time': args.time, 'nodes': args.nodes}
+    if not any(limits.values()):
+        limits['depth'] = 4
+
+    skip_ids = set()
+    if args.resume:
+        skip_ids = finished_ids(args.out)
+        drop_partial_line(args.out)  # Its position was not counted as finished and runs again
+    skipped = []
+    source = sys.stdin if args.input == '-' else open(args.input)
+    output = open(args.out, 'a' if args.resume else 'w') if args.out else sys.stdout
+    try:
+        count = run(read_positions(source, skip_ids, skipped), output, max(1, args.workers), limits, args.tablebases)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    print(f"Analysed {count} positions ({len(skipped)} skipped)", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
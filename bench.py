@@ -0,0 +1,142 @@
+import argparse
+import json
+import math
+import sys
+import time
+
+from alphabeta import ChessAI
+from fen import board_from_fen, move_to_uci
+
+#
+# Standard benchmark: search a fixed set of positions to a fixed depth.
+#
+#   python bench.py                          depth 2, prints nodes, time and nodes/second
+#   python bench.py --depth 3 --out bench.json
+#   python bench.py --baseline bench.json    compare against an earlier run
+#
+# The total node count is the signature of the search: it only changes when the search or
+# the evaluation behaves differently, never because the machine is faster or slower. A change
+# meant as a pure speed-up must keep the signature and raise nodes/second.
+#
+
+DEFAULT_DEPTH = 2
+
+BENCH_POSITIONS = (
+    # Openings
+    'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+    'r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3',
+    'rnbqkb1r/pp2pppp/3p1n2/8/3NP3/8/PPP2PPP/RNBQKB1R w KQkq - 1 5',
+    'rnbqk2r/ppp1bppp/4pn2/3p4/2PP4/2N2N2/PP2PPPP/R1BQKB1R w KQkq - 4 5',
+    'r1bqk2r/pppp1ppp/2n2n2/2b1p3/2B1P3/3P1N2/PPP2PPP/RNBQK2R w KQkq - 1 5',
+    # Middlegames
+    'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 10',
+    '4rrk1/pp1n3p/3q2pQ/2p1pb2/2PP4/2P3N1/P2B2PP/4RRK1 b - - 7 19',
+    'rq3rk1/ppp2ppp/1bnpb3/3N2B1/3NP3/7P/PPPQ1PP1/2KR3R w - - 7 14',
+    'r1bq1r1k/1pp1n1pp/1p1p4/4p2Q/4Pp2/1BNP4/PPP2PPP/3R1RK1 w - - 2 14',
+    'r3r1k1/2p2ppp/p1p1bn2/8/1q2P3/2NPQN2/PPP3PP/R4RK1 b - - 2 15',
+    'r1bbk1nr/pp3p1p/2n5/1N4p1/2Np1B2/8/PPP2PPP/2KR1B1R w kq - 0 13',
+    'r1bq1rk1/ppp1nppp/4n3/3p3Q/3P4/1BP1B3/PP1N2PP/R4RK1 w - - 1 16',
+    '4r1k1/r1q2ppp/ppp2n2/4P3/5Rb1/1N1BQ3/PPP3PP/R5K1 w - - 1 17',
+    '2rqkb1r/ppp2p2/2npb1p1/1N1Nn2p/2P1PP2/8/PP2B1PP/R1BQK2R b KQ - 0 11',
+    '3r1rk1/p5pp/bpp1pp2/8/q1PP1P2/b3P3/P2NQRPP/1R2B1K1 b - - 6 22',
+    'r1q2rk1/2p1bppp/2Pp4/p6b/Q1PNp3/4B3/PP1R1PPP/2K4R w - - 2 18',
+    '4k2r/1pb2ppp/1p2p3/1R1p4/3P4/2r1PN2/P4PPP/1R4K1 b - - 3 22',
+    '3q2k1/pb3p1p/4pbp1/2r5/PpN2N2/1P2P2P/5PP1/Q2R2K1 b - - 4 26',
+    # Tactics
+    '6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1',
+    'r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4',
+    '2r3k1/5ppp/8/8/8/8/1Q3PPP/6K1 b - - 0 1',
+    'r2qk2r/ppp2ppp/2n1bn2/2bpp3/4P3/2PP1N2/PP1NBPPP/R1BQK2R w KQkq - 0 7',
+    # Endgames
+    '6k1/6p1/6Pp/ppp5/3pn2P/1P3K2/1PP2P2/3N4 b - - 0 1',
+    '3b4/5kp1/1p1p1p1p/pP1PpP1P/P1P1P3/3KN3/8/8 w - - 0 1',
+    '2K5/p7/7P/5pR1/8/5k2/r7/8 w - - 0 1',
+    '8/6pk/1p6/8/PP3p1p/5P2/4KP1q/3Q4 w - - 0 1',
+    '8/2p5/8/2kPKp1p/2p4P/2P5/3P4/8 w - - 0 1',
+    '8/pp2r1k1/2p1p3/3pP2p/1P1P1P1P/P5KR/8/8 w - - 0 1',
+    '5k2/7R/4P2p/5K2/p1r2P1p/8/8/8 b - - 0 1',
+    '8/8/8/4k3/8/8/4P3/4K3 w - - 0 1',
+    '8/8/4k3/8/8/8/8/KQ6 w - - 0 1',
+    '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 11',
+)
+
+
+def bench_position(ai, fen):
+    #Search one position from a cleared engine and return its result
+    board, color, _, _ = board_from_fen(fen)
+    ai.new_game()
+    start = time.perf_counter()
+    move = ai.get_best_move(board, color)
+    elapsed = time.perf_counter() - start
+    return {'fen': fen, 'move': move_to_uci(board, move) if move else None,
+            'nodes': ai.last_search['nodes'], 'time': round(elapsed, 4)}
+
+
+def run(depth=DEFAULT_DEPTH, positions=BENCH_POSITIONS, output=sys.stderr):
+    #Search every position and return the bench result (per-position results plus totals)
+    ai = ChessAI(depth=depth)
+    ai.collect_stats = False
+    ai.max_time = math.inf
+    results = []
+    for number, fen in enumerate(positions, 1):
+        result = bench_position(ai, fen)
+        results.append(result)
+        print(f"Position {number}/{len(positions)}: {result['move']} {result['nodes']} nodes "
+              f"{result['time']:.2f}s", file=output)
+    nodes = sum(result['nodes'] for result in results)
+    elapsed = sum(result['time'] for result in results)
+    return {'depth': depth, 'positions': results, 'nodes': nodes, 'time': round(elapsed, 3),
+            'nps': int(nodes / elapsed) if elapsed > 0 else 0}
+
+
+def print_summary(result, output=sys.stdout):
+    output.write(f"Total time (s) : {result['time']:.2f}\n")
+    output.write(f"Nodes searched : {result['nodes']}\n")
+    output.write(f"Nodes/second   : {result['nps']}\n")
+
+
+def compare(result, baseline, output=sys.stdout):
+    #Report signature and speed differences against a baseline result; True when the signature matches
+    same = result['nodes'] == baseline['nodes'] and result['depth'] == baseline['depth']
+    if same:
+        output.write("Signature      : unchanged\n")
+    else:
+        output.write(f"Signature      : CHANGED ({baseline['nodes']} -> {result['nodes']} nodes)\n")
+        old = {entry['fen']: entry for entry in baseline['positions']}
+        for entry in result['positions']:
+            before = old.get(entry['fen'])
+            if before and (before['nodes'] != entry['nodes'] or before['move'] != entry['move']):
+                output.write(f"  {entry['fen']}: {before['move']} {before['nodes']} -> "
+                             f"{entry['move']} {entry['nodes']}\n")
+    if baseline['nps']:
+        change = (result['nps'] - baseline['nps']) / baseline['nps'] * 100
+        output.write(f"Nodes/second   : {baseline['nps']} -> {result['nps']} ({change:+.1f}%)\n")
+    return same
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the chess engine on a fixed set of positions.")
+    parser.add_argument('--depth', type=int, default=DEFAULT_DEPTH, help="Search depth per position")
+    parser.add_argument('--out', help="Write the result as JSON to this file")
+    parser.add_argument('--baseline', help="Earlier JSON result to compare against")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as source:
+            baseline = json.load(source)
+        if baseline['depth'] != args.depth:
+            parser.error(f"baseline was run at depth {baseline['depth']}")
+
+    result = run(args.depth)
+    print_summary(result)
+    if args.out:
+        with open(args.out, 'w') as target:
+            json.dump(result, target, indent=1)
+    if baseline is not None and not compare(result, baseline):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
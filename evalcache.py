@@ -0,0 +1,76 @@
+import sys
+
+# Default number of slots in the evaluation cache (rounded up to a power of two)
+EVAL_CACHE_SIZE = 1 << 18
+
+# Rough memory per used slot (slot pointers plus the stored hash and value), for sizing from a byte budget
+EVAL_CACHE_BYTES_PER_SLOT = 80
+
+
+class EvalCache:
+    #
+    # Fixed-size evaluation cache.
+    #
+    # Each position hash maps to exactly one slot (hash & mask). The full hash is kept
+    # in the slot as verification, so a lookup only hits when the stored hash matches.
+    # A store into a slot owned by another position overwrites it (counted as an eviction),
+    # which keeps memory use constant no matter how long the engine runs.
+    #
+    def __init__(self, size=EVAL_CACHE_SIZE):
+        self.resize(size)
+
+    def resize(self, size):
+        #Reallocate the slot arrays with room for at least `size` entries (clears the cache)
+        slots = 1
+        while slots < max(1, size):
+            slots <<= 1
+        self.size = slots
+        self._mask = slots - 1
+        self._checks = None  # Slot arrays are allocated by the first store, so an unused engine stays small
+        self._values = None
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def clear(self):
+        #Drop all entries but keep the counters
+        self._checks = None
+        self._values = None
+        self.used = 0
+
+    def lookup(self, key_hash):
+        #Return the cached value for a position hash, or None on a miss
+        index = key_hash & self._mask
+        checks = self._checks
+        if checks is not None and checks[index] == key_hash:
+            self.hits += 1
+            return self._values[index]
+        self.misses += 1
+        return None
+
+    def store(self, key_hash, value):
+        #Store a value, replacing whatever occupied the slot
+        if self._checks is None:
+            self._checks = [None] * self.size
+            self._values = [0] * self.size
+        index = key_hash & self._mask
+        check = self._checks[index]
+        if check is None:
+            self.used += 1
+        elif check != key_hash:
+            self.evictions += 1
+        self._checks[index] = key_hash
+        self._values[index] = value
+
+    def __len__(self):
+        return self.used
+
+    def hit_rate(self):
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
+
+    def estimated_bytes(self):
+        #Approximate memory held by the cache: the two slot arrays plus one hash int and one value per used slot
+        arrays = sys.getsizeof(self._checks) + sys.getsizeof(self._values) if self._checks is not None else 0
+        return arrays + self.used * (sys.getsizeof(1 << 62) + sys.getsizeof(0.5))
@@ -0,0 +1,232 @@
+import re
+
+from skakPieces import Pawn, Rook, Knight, Bishop, Queen, King
+
+#
+# FEN and UCI move notation for the engine's board.
+#
+# The board is an 8x8 list with row 0 = rank 8 and column 0 = file a. Castling rights and the
+# en-passant square are not stored separately: they live in the pieces' has_moved and
+# en_passant_vulnerable flags, exactly as the game itself tracks them.
+#
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+FILES = 'abcdefgh'
+
+# One EPD operation: opcode, operands (quoted strings may contain ';'), terminating ';'
+EPD_OPERATION = re.compile(r'([A-Za-z]\w*)((?:\s+(?:"[^"]*"|[^\s;"]+))*)\s*;')
+
+PIECE_CLASSES = {'P': Pawn, 'R': Rook, 'N': Knight, 'B': Bishop, 'Q': Queen, 'K': King}
+
+# King and rook squares behind each FEN castling letter
+CASTLING_SQUARES = {
+    'K': ((7, 4), (7, 7)),
+    'Q': ((7, 4), (7, 0)),
+    'k': ((0, 4), (0, 7)),
+    'q': ((0, 4), (0, 0)),
+}
+
+
+def square_name(r, c):
+    return f"{FILES[c]}{8 - r}"
+
+
+def parse_square(name):
+    #'e4' -> (row, col)
+    if len(name) != 2 or name[0] not in FILES or name[1] not in '12345678':
+        raise ValueError(f"Invalid square: {name}")
+    return 8 - int(name[1]), FILES.index(name[0])
+
+
+def board_from_fen(fen):
+    #
+    # Build a board from a FEN string.
+    #
+    # Returns (board, color to move, halfmove clock, fullmove number).
+    # Missing trailing fields default to '- - 0 1'.
+    #
+    fields = fen.split()
+    if not fields:
+        raise ValueError("Empty FEN")
+    fields += ['w', '-', '-', '0', '1'][len(fields) - 1:]
+    placement, color, castling, en_passant = fields[:4]
+
+    ranks = placement.split('/')
+    if len(ranks) != 8:
+        raise ValueError(f"FEN needs 8 ranks: {fen}")
+    board = []
+    for rank in ranks:
+        row = []
+        for char in rank:
+            if char.isdigit():
+                row.extend([None] * int(char))
+            elif char.upper() in PIECE_CLASSES:
+                piece = PIECE_CLASSES[char.upper()]('w' if char.isupper() else 'b')
+                piece.has_moved = True
+                row.append(piece)
+            else:
+                raise ValueError(f"Invalid piece '{char}' in FEN: {fen}")
+        if len(row) != 8:
+            raise ValueError(f"Rank '{rank}' does not have 8 squares: {fen}")
+        board.append(row)
+    if color not in ('w', 'b'):
+        raise ValueError(f"Invalid side to move '{color}': {fen}")
+
+    # Pawns on their start rank can still double-step, so they count as unmoved
+    for c in range(8):
+        for r, piece_color in ((6, 'w'), (1, 'b')):
+            piece = board[r][c]
+            if piece and piece.name == 'P' and piece.color == piece_color:
+                piece.has_moved = False
+
+    # A castling right means neither the king nor that rook has moved
+    for letter in castling if castling != '-' else '':
+        if letter not in CASTLING_SQUARES:
+            raise ValueError(f"Invalid castling rights '{castling}': {fen}")
+        piece_color = 'w' if letter.isupper() else 'b'
+        for r, c in CASTLING_SQUARES[letter]:
+            piece = board[r][c]
+            if piece and piece.color == piece_color and piece.name in ('K', 'R'):
+                piece.has_moved = False
+
+    # The en-passant square lies behind the pawn that just made a double step
+    if en_passant != '-':
+        r, c = parse_square(en_passant)
+        pawn_row = r - 1 if color == 'b' else r + 1
+        pawn = board[pawn_row][c] if 0 <= pawn_row < 8 else None
+        if pawn and pawn.name == 'P':
+            pawn.en_passant_vulnerable = True
+
+    return board, color, int(fields[4]), int(fields[5])
+
+
+def parse_epd(line):
+    #
+    # Split an EPD or FEN line into (fen, operations).
+    #
+    # EPD has the four position fields followed by operations such as 'bm Nf3; id "pos 1";'.
+    # A plain FEN (with or without the two clock fields) gives an empty operation dict.
+    #
+    fields = line.split(None, 4)
+    if len(fields) < 4:
+        raise ValueError(f"EPD needs at least 4 fields: {line}")
+    position = ' '.join(fields[:4])
+    rest = fields[4] if len(fields) > 4 else ''
+
+    clocks = rest.split()
+    if len(clocks) == 2 and all(field.isdigit() for field in clocks):
+        return f"{position} {rest.strip()}", {}
+
+    operations = {}
+    for match in EPD_OPERATION.finditer(rest):
+        opcode, operand = match.group(1), match.group(2).strip()
+        operations[opcode] = operand[1:-1] if operand.startswith('"') and operand.endswith('"') else operand
+
+    halfmove = operations.get('hmvc', '0')
+    fullmove = operations.get('fmvn', '1')
+    return f"{position} {halfmove} {fullmove}", operations
+
+
+def castling_string(board):
+    rights = ''
+    for letter, squares in CASTLING_SQUARES.items():
+        piece_color = 'w' if letter.isupper() else 'b'
+        pieces = [board[r][c] for r, c in squares]
+        if all(p and p.color == piece_color and not p.has_moved for p in pieces) \
+                and pieces[0].name == 'K' and pieces[1].name == 'R':
+            rights += letter
+    return rights or '-'
+
+
+def en_passant_square(board, color):
+    #FEN en-passant target for `color` to move, or '-'
+    row = 3 if color == 'w' else 4  # Row of an enemy pawn that just double-stepped
+    for c in range(8):
+        pawn = board[row][c]
+        if pawn and pawn.name == 'P' and pawn.color != color and pawn.en_passant_vulnerable:
+            return square_name(row - 1 if color == 'w' else row + 1, c)
+    return '-'
+
+
+def board_to_fen(board, color, halfmove=0, fullmove=1):
+    ranks = []
+    for row in board:
+        rank = ''
+        empty = 0
+        for piece in row:
+            if piece is None:
+                empty += 1
+                continue
+            if empty:
+                rank += str(empty)
+                empty = 0
+            rank += piece.name if piece.color == 'w' else piece.name.lower()
+        if empty:
+            rank += str(empty)
+        ranks.append(rank)
+    return f"{'/'.join(ranks)} {color} {castling_string(board)} {en_passant_square(board, color)} {halfmove} {fullmove}"
+
+
+def move_to_uci(board, move, promotion='q'):
+    #(r1, c1, r2, c2) -> 'e2e4'; pawns reaching the last rank get the promotion suffix
+    r1, c1, r2, c2 = move
+    text = square_name(r1, c1) + square_name(r2, c2)
+    piece = board[r1][c1]
+    if piece and piece.name == 'P' and r2 in (0, 7):
+        text += promotion
+    return text
+
+
+def uci_to_move(text):
+    #'e7e8q' -> ((r1, c1, r2, c2), 'Q'); the promotion is None for other moves
+    if len(text) not in (4, 5):
+        raise ValueError(f"Invalid UCI move: {text}")
+    r1, c1 = parse_square(text[:2])
+    r2, c2 = parse_square(text[2:4])
+    promotion = text[4].upper() if len(text) == 5 else None
+    if promotion is not None and promotion not in 'QRBN':
+        raise ValueError(f"Invalid promotion in UCI move: {text}")
+    return (r1, c1, r2, c2), promotion
+
+
+def apply_move(board, move, promotion=None):
+    #
+    # Play a move on the board in place, including castling, en passant and promotion.
+    #
+    # Returns True when the move resets the fifty-move counter (pawn move or capture).
+    #
+    r1, c1, r2, c2 = move
+    piece = board[r1][c1]
+    if piece is None:
+        raise ValueError(f"No piece on {square_name(r1, c1)}")
+    captured = board[r2][c2]
+
+    # Only the pawn that just double-stepped can be taken en passant
+    for row in board:
+        for other in row:
+            if other and other.name == 'P':
+                other.en_passant_vulnerable = False
+
+    if piece.name == 'P' and c1 != c2 and captured is None:
+        captured = board[r1][c2]
+        board[r1][c2] = None
+    if piece.name == 'K' and abs(c2 - c1) == 2:
+        rook_col, rook_new_col = (7, c2 - 1) if c2 > c1 else (0, c2 + 1)
+        rook = board[r1][rook_col]
+        board[r1][rook_new_col] = rook
+        board[r1][rook_col] = None
+        if rook:
+            rook.has_moved = True
+
+    board[r2][c2] = piece
+    board[r1][c1] = None
+    piece.has_moved = True
+    if piece.name == 'P':
+        if abs(r2 - r1) == 2:
+            piece.en_passant_vulnerable = True
+        elif r2 in (0, 7):
+            promoted = PIECE_CLASSES[promotion or 'Q'](piece.color)
+            promoted.has_moved = True
+            board[r2][c2] = promoted
+    return piece.name == 'P' or captured is not None
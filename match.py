@@ -0,0 +1,367 @@
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from fen import START_FEN, board_from_fen, board_to_fen, apply_move, parse_epd
+from pgn import read_games, san_to_move, move_to_san, legal_moves
+from matesearch import in_check
+
+#
+# Self-play matches between two engine configurations, used as a regression gate.
+#
+#   python match.py --games 200 --movetime 0.5 --b '{"lazy_eval_margin": 0}'
+#   python match.py --games 400 --nodes 2000 --b-path ../skak-baseline --sprt --pgn match.pgn
+#
+# An engine is ChessAI with attribute overrides given as JSON (depth, max_time, max_nodes,
+# aspiration_window, ...). With --a-path/--b-path the ChessAI class is loaded from another
+# checkout, so two versions of alphabeta.py can play each other. Every opening is played twice
+# with colors reversed. Games run in a process pool and are written to PGN as they finish.
+#
+
+# Openings used when no --openings file is given (a few plies into common openings)
+DEFAULT_OPENINGS = (
+    START_FEN,
+    'rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2',
+    'rnbqkbnr/pp1ppppp/8/2p5/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2',
+    'rnbqkbnr/ppp1pppp/8/3p4/3P4/8/PPP1PPPP/RNBQKBNR w KQkq - 0 2',
+    'rnbqkb1r/pppppppp/5n2/8/3P4/8/PPP1PPPP/RNBQKBNR w KQkq - 1 2',
+    'rnbqkbnr/pppp1ppp/4p3/8/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2',
+    'rnbqkbnr/pp1ppppp/2p5/8/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2',
+    'r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3',
+)
+
+# Games still running at this many plies are adjudicated as draws
+DEFAULT_MAX_PLIES = 300
+
+_engine_classes = {}
+
+
+def checkout_modules(path):
+    #Names of the top-level modules in a checkout; all of them are imported from there, not from here
+    return [name[:-3] for name in os.listdir(path) if name.endswith('.py')]
+
+
+def load_engine_class(path):
+    #ChessAI from the current tree (path None) or from the checkout in `path`
+    if path in _engine_classes:
+        return _engine_classes[path]
+    if path is None:
+        from alphabeta import ChessAI
+        _engine_classes[path] = ChessAI
+        return ChessAI
+
+    # Import the other checkout's modules under their usual names, then put ours back.
+    # The loaded class keeps its own module globals, so both versions live side by side.
+    modules = checkout_modules(path)
+    saved = {name: sys.modules.pop(name) for name in modules if name in sys.modules}
+    sys.path.insert(0, os.path.abspath(path))
+    try:
+        engine_class = importlib.import_module('alphabeta').ChessAI
+    finally:
+        sys.path.pop(0)
+        for name in modules:
+            sys.modules.pop(name, None)
+        sys.modules.update(saved)
+    _engine_classes[path] = engine_class
+    return engine_class
+
+
+def create_engine(config):
+    #Engine for a configuration; raises ValueError for an override the engine class does not have
+    engine = load_engine_class(config.get('path'))(depth=config.get('depth', 64))
+    if hasattr(engine, 'verbose'):
+        engine.verbose = False  # Checkouts from before searchstats printed their statistics unless told not to
+    engine.collect_stats = False
+    engine.max_time = math.inf
+    for name, value in config.get('options', {}).items():
+        # setattr would happily add an attribute the search never reads, e.g. max_nodes on a
+        # checkout without node limits, whose games would then never end
+        if not hasattr(engine, name):
+            raise ValueError(f"engine {config['name']} has no option {name}")
+        setattr(engine, name, value)
+    return engine
+
+
+def _material_is_insufficient(board):
+    pieces = [p.name for row in board for p in row if p and p.name != 'K']
+    return not pieces or (len(pieces) == 1 and pieces[0] in ('B', 'N'))
+
+
+def play_game(task):
+    #
+    # Play one game in a worker process.
+    #
+    # task: (game number, opening FEN, white config, black config, max plies).
+    # Returns the result, termination, SAN moves and per-engine nodes/time/depth totals.
+    #
+    number, opening, white_config, black_config, max_plies = task
+    engines = {'w': create_engine(white_config), 'b': create_engine(black_config)}
+    stats = {color: {'nodes': 0, 'time': 0.0, 'depth': 0, 'moves': 0} for color in engines}
+
+    board, color, halfmove, _ = board_from_fen(opening)
+    seen = {}
+    moves = []
+    result, termination = '1/2-1/2', 'max plies'
+    for _ in range(max_plies):
+        position = ' '.join(board_to_fen(board, color).split()[:4])
+        seen[position] = seen.get(position, 0) + 1
+        if seen[position] >= 3:
+            termination = 'repetition'
+            break
+        if halfmove >= 100:
+            termination = 'fifty moves'
+            break
+        if _material_is_insufficient(board):
+            termination = 'insufficient material'
+            break
+
+        legal = legal_moves(board, color)
+        if not legal:
+            if in_check(board, color):
+                result, termination = ('0-1' if color == 'w' else '1-0'), 'checkmate'
+            else:
+                termination = 'stalemate'
+            break
+
+        # Older checkouts have no last_search and print their statistics, so time and count here
+        engine = engines[color]
+        started = time.time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            move = engine.get_best_move(board, color)
+        side = stats[color]
+        side['time'] += time.time() - started
+        last_search = getattr(engine, 'last_search', None)
+        side['nodes'] += last_search['nodes'] if last_search else engine.stats['nodes_evaluated']
+        side['depth'] += last_search['depth'] if last_search else 0
+        side['moves'] += 1
+        if move is None:
+            move = legal[0]  # No iteration finished in time: any legal move, as uci.py plays
+        if move not in legal:
+            result, termination = ('0-1' if color == 'w' else '1-0'), f"illegal move {move}"
+            break
+
+        moves.append(move_to_san(board, color, move))
+        halfmove = 0 if apply_move(board, move) else halfmove + 1
+        color = 'b' if color == 'w' else 'w'
+
+    return {'number': number, 'opening': opening, 'white': white_config['name'], 'black': black_config['name'],
+            'result': result, 'termination': termination, 'moves': moves,
+            'stats': {white_config['name']: stats['w'], black_config['name']: stats['b']}}
+
+
+def load_openings(path):
+    #Opening FENs from an EPD/FEN file or a PGN file (position after each game's moves)
+    if path is None:
+        return list(DEFAULT_OPENINGS)
+    openings = []
+    with open(path) as source:
+        if path.endswith('.pgn'):
+            for game in read_games(source):
+                board, color, _, _ = board_from_fen(game.start_fen())
+                for san in game.moves:
+                    move, promotion = san_to_move(board, color, san)
+                    apply_move(board, move, promotion)
+                    color = 'b' if color == 'w' else 'w'
+                openings.append(board_to_fen(board, color))
+        else:
+            for line in source:
+                if line.strip() and not line.startswith('#'):
+                    openings.append(parse_epd(line.strip())[0])
+    return openings
+
+
+def elo_estimate(wins, draws, losses):
+    #(Elo difference, 95% error margin) from the first engine's point of view
+    games = wins + draws + losses
+    if games == 0:
+        return 0.0, math.inf
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = 1.96 * math.sqrt(variance / games)
+
+    def elo(s):
+        s = min(max(s, 1e-6), 1 - 1e-6)
+        return -400 * math.log10(1 / s - 1)
+
+    return elo(score), (elo(score + margin) - elo(score - margin)) / 2
+
+
+def sprt_llr(wins, draws, losses, elo0, elo1):
+    #Log-likelihood ratio of H1 (elo1) against H0 (elo0), normal approximation of the trinomial model
+    games = wins + draws + losses
+    if games == 0 or wins + losses == 0:
+        return 0.0
+    score = (wins + draws / 2) / games
+    variance = (wins + draws / 4) / games - score ** 2
+    if variance <= 0:
+        return 0.0
+    score0 = 1 / (1 + 10 ** (-elo0 / 400))
+    score1 = 1 / (1 + 10 ** (-elo1 / 400))
+    return (score1 - score0) * (2 * score - score0 - score1) / (2 * variance / games)
+
+
+def sprt_bounds(alpha, beta):
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+def write_pgn_game(game, output):
+    output.write(f'[Event "Self-play match"]\n[Round "{game["number"]}"]\n')
+    output.write(f'[White "{game["white"]}"]\n[Black "{game["black"]}"]\n[Result "{game["result"]}"]\n')
+    if game['opening'] != START_FEN:
+        output.write(f'[SetUp "1"]\n[FEN "{game["opening"]}"]\n')
+    output.write(f'[Termination "{game["termination"]}"]\n\n')
+
+    fields = game['opening'].split()
+    color, fullmove = fields[1], int(fields[5])
+    tokens = []
+    for index, san in enumerate(game['moves']):
+        if color == 'w':
+            tokens.append(f"{fullmove}.")
+        elif index == 0:
+            tokens.append(f"{fullmove}...")
+        tokens.append(san)
+        if color == 'b':
+            fullmove += 1
+        color = 'b' if color == 'w' else 'w'
+    tokens.append(game['result'])
+
+    line = ''
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > 79:
+            output.write(line + '\n')
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    output.write(line + '\n\n')
+    output.flush()
+
+
+class MatchScore:
+    def __init__(self, name_a, name_b):
+        self.name_a = name_a
+        self.name_b = name_b
+        self.wins = self.draws = self.losses = 0
+        self.totals = {name: {'nodes': 0, 'time': 0.0, 'depth': 0, 'moves': 0} for name in (name_a, name_b)}
+
+    def add(self, game):
+        a_is_white = game['white'] == self.name_a
+        if game['result'] == '1/2-1/2':
+            self.draws += 1
+        elif (game['result'] == '1-0') == a_is_white:
+            self.wins += 1
+        else:
+            self.losses += 1
+        for name, side in game['stats'].items():
+            for key in side:
+                self.totals[name][key] += side[key]
+
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    def report(self):
+        elo, margin = elo_estimate(self.wins, self.draws, self.losses)
+        lines = [f"{self.name_a} vs {self.name_b}: +{self.wins} ={self.draws} -{self.losses} "
+                 f"({self.games()} games), Elo {elo:+.1f} +/- {margin:.1f}"]
+        for name, total in self.totals.items():
+            nps = total['nodes'] / total['time'] if total['time'] else 0
+            depth = total['depth'] / total['moves'] if total['moves'] else 0
+            lines.append(f"  {name}: {nps:.0f} nps, average depth {depth:.2f}, {total['moves']} moves")
+        return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play two engine configurations against each other.")
+    parser.add_argument('--games', type=int, default=100, help="Number of games (rounded up to pairs)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--a', default='{}', help="JSON ChessAI attribute overrides for engine A")
+    parser.add_argument('--b', default='{}', help="JSON ChessAI attribute overrides for engine B")
+    parser.add_argument('--a-path', help="Checkout to load engine A's alphabeta.py from")
+    parser.add_argument('--b-path', help="Checkout to load engine B's alphabeta.py from")
+    parser.add_argument('--movetime', type=float, help="Seconds per move")
+    parser.add_argument('--nodes', type=int, help="Node limit per move")
+    parser.add_argument('--depth', type=int, help="Depth per move")
+    parser.add_argument('--openings', help="EPD/FEN or PGN file with opening positions")
+    parser.add_argument('--max-plies', type=int, default=DEFAULT_MAX_PLIES)
+    parser.add_argument('--pgn', help="Write the games to this PGN file")
+    parser.add_argument('--sprt', action='store_true', help="Stop early once the SPRT reaches a decision")
+    parser.add_argument('--elo0', type=float, default=0.0)
+    parser.add_argument('--elo1', type=float, default=10.0)
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--beta', type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    if not (args.movetime or args.nodes or args.depth):
+        args.depth = 3
+    configs = []
+    for name, options, path in (('A', args.a, args.a_path), ('B', args.b, args.b_path)):
+        config = {'name': name, 'path': path, 'options': json.loads(options)}
+        if args.depth:
+            config['depth'] = args.depth
+        if args.movetime:
+            config['options'].setdefault('max_time', args.movetime)
+        if args.nodes:
+            config['options'].setdefault('max_nodes', args.nodes)
+        try:
+            create_engine(config)
+        except ValueError as error:
+            parser.error(str(error))
+        configs.append(config)
+
+    openings = load_openings(args.openings)
+    tasks = []
+    for number in range((args.games + 1) // 2 * 2):
+        opening = openings[(number // 2) % len(openings)]
+        white, black = (configs[0], configs[1]) if number % 2 == 0 else (configs[1], configs[0])
+        tasks.append((number + 1, opening, white, black, args.max_plies))
+
+    score = MatchScore('A', 'B')
+    lower, upper = sprt_bounds(args.alpha, args.beta)
+    output = open(args.pgn, 'w') if args.pgn else None
+    try:
+        with ProcessPoolExecutor(max(1, args.workers)) as pool:
+            queue = iter(tasks)
+            pending = set()
+            for task in queue:
+                pending.add(pool.submit(play_game, task))
+                if len(pending) >= args.workers * 2:
+                    break
+            decided = False
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    game = future.result()
+                    score.add(game)
+                    if output:
+                        write_pgn_game(game, output)
+                    print(f"game {game['number']}: {game['white']}-{game['black']} {game['result']} "
+                          f"({game['termination']})", file=sys.stderr)
+                if args.sprt:
+                    llr = sprt_llr(score.wins, score.draws, score.losses, args.elo0, args.elo1)
+                    if llr <= lower or llr >= upper:
+                        decided = True
+                if not decided:
+                    for task in queue:
+                        pending.add(pool.submit(play_game, task))
+                        if len(pending) >= args.workers * 2:
+                            break
+    finally:
+        if output:
+            output.close()
+
+    print(score.report())
+    if args.sprt:
+        llr = sprt_llr(score.wins, score.draws, score.losses, args.elo0, args.elo1)
+        verdict = 'H1 accepted' if llr >= upper else 'H0 accepted' if llr <= lower else 'inconclusive'
+        print(f"SPRT elo0={args.elo0} elo1={args.elo1}: LLR {llr:.2f} ({lower:.2f}, {upper:.2f}) {verdict}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,339 @@
+from skakPieces import Queen
+
+#
+# Depth-first proof-number (df-pn) mate search.
+#
+# The attacker's nodes are OR nodes (one move that forces mate is enough), the defender's
+# nodes are AND nodes (every reply must lose). Proof and disproof numbers estimate how many
+# leaves still have to be solved; the search always follows the most promising branch and
+# backs up as soon as a node's numbers exceed the thresholds handed down by its parent.
+# Results are kept in the search's own transposition table, so transpositions are solved once.
+#
+# Castling and en passant are not generated and pawns always promote to a queen,
+# matching the moves the engine itself plays.
+#
+
+INFINITY = 10 ** 9
+
+# Default limit on the length of a mating line in plies
+MATE_MAX_PLIES = 31
+
+# The transposition table is cleared before a search once it holds more positions than this
+MATE_TABLE_LIMIT = 1000000
+
+KNIGHT_OFFSETS = ((-2, -1), (-1, -2), (1, -2), (2, -1), (2, 1), (1, 2), (-1, 2), (-2, 1))
+KING_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+ROOK_DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+BISHOP_DIRECTIONS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+QUEEN_DIRECTIONS = ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+
+
+def _targets(offsets):
+    table = []
+    for r in range(8):
+        row = []
+        for c in range(8):
+            row.append(tuple((r + dr, c + dc) for dr, dc in offsets if 0 <= r + dr < 8 and 0 <= c + dc < 8))
+        table.append(row)
+    return table
+
+
+KNIGHT_TARGETS = _targets(KNIGHT_OFFSETS)
+KING_TARGETS = _targets(KING_OFFSETS)
+SLIDER_DIRECTIONS = {'R': ROOK_DIRECTIONS, 'B': BISHOP_DIRECTIONS, 'Q': QUEEN_DIRECTIONS}
+
+
+def position_key(board, color):
+    #Hashable key of a position including the side to move
+    return (color,) + tuple((p.name, p.color) if p else None for row in board for p in row)
+
+
+def is_attacked(board, r, c, by_color):
+    #True when any piece of `by_color` attacks square (r, c)
+    for r2, c2 in KNIGHT_TARGETS[r][c]:
+        p = board[r2][c2]
+        if p and p.color == by_color and p.name == 'N':
+            return True
+    for r2, c2 in KING_TARGETS[r][c]:
+        p = board[r2][c2]
+        if p and p.color == by_color and p.name == 'K':
+            return True
+
+    # A white pawn attacks towards row - 1, so it sits one row below the square
+    pawn_row = r + 1 if by_color == 'w' else r - 1
+    if 0 <= pawn_row < 8:
+        for c2 in (c - 1, c + 1):
+            if 0 <= c2 < 8:
+                p = board[pawn_row][c2]
+                if p and p.color == by_color and p.name == 'P':
+                    return True
+
+    for dr, dc in QUEEN_DIRECTIONS:
+        diagonal = dr != 0 and dc != 0
+        r2, c2 = r + dr, c + dc
+        while 0 <= r2 < 8 and 0 <= c2 < 8:
+            p = board[r2][c2]
+            if p:
+                if p.color == by_color and (p.name == 'Q' or p.name == ('B' if diagonal else 'R')):
+                    return True
+                break
+            r2 += dr
+            c2 += dc
+    return False
+
+
+def pseudo_moves(board, color):
+    #Moves that follow the piece rules, without checking whether the own king is left in check
+    moves = []
+    for r in range(8):
+        for c in range(8):
+            p = board[r][c]
+            if not p or p.color != color:
+                continue
+            name = p.name
+            if name == 'P':
+                step = -1 if color == 'w' else 1
+                r2 = r + step
+                if 0 <= r2 < 8:
+                    if board[r2][c] is None:
+                        moves.append((r, c, r2, c))
+                        start_row = 6 if color == 'w' else 1
+                        if r == start_row and board[r2 + step][c] is None:
+                            moves.append((r, c, r2 + step, c))
+                    for c2 in (c - 1, c + 1):
+                        if 0 <= c2 < 8:
+                            target = board[r2][c2]
+                            if target and target.color != color:
+                                moves.append((r, c, r2, c2))
+            elif name == 'N' or name == 'K':
+                for r2, c2 in (KNIGHT_TARGETS if name == 'N' else KING_TARGETS)[r][c]:
+                    target = board[r2][c2]
+                    if target is None or target.color != color:
+                        moves.append((r, c, r2, c2))
+            else:
+                for dr, dc in SLIDER_DIRECTIONS[name]:
+                    r2, c2 = r + dr, c + dc
+                    while 0 <= r2 < 8 and 0 <= c2 < 8:
+                        target = board[r2][c2]
+                        if target is None:
+                            moves.append((r, c, r2, c2))
+                        else:
+                            if target.color != color:
+                                moves.append((r, c, r2, c2))
+                            break
+                        r2 += dr
+                        c2 += dc
+    return moves
+
+
+def make_move(board, move):
+    #New board with the move played (pawns reaching the last rank become queens)
+    r1, c1, r2, c2 = move
+    new_board = [row[:] for row in board]
+    piece = new_board[r1][c1]
+    if piece.name == 'P' and (r2 == 0 or r2 == 7):
+        piece = Queen(piece.color)
+    new_board[r2][c2] = piece
+    new_board[r1][c1] = None
+    return new_board
+
+
+def find_king(board, color):
+    for r in range(8):
+        for c in range(8):
+            p = board[r][c]
+            if p and p.name == 'K' and p.color == color:
+                return r, c
+    return None
+
+
+def in_check(board, color):
+    king = find_king(board, color)
+    return king is not None and is_attacked(board, king[0], king[1], 'b' if color == 'w' else 'w')
+
+
+def legal_children(board, color):
+    #(move, board after the move) for every legal move of `color`
+    opponent = 'b' if color == 'w' else 'w'
+    king = find_king(board, color)
+    children = []
+    for move in pseudo_moves(board, color):
+        new_board = make_move(board, move)
+        r, c = (move[2], move[3]) if (move[0], move[1]) == king else king
+        if not is_attacked(new_board, r, c, opponent):
+            children.append((move, new_board))
+    return children
+
+
+def rules_covered(board, color):
+    #
+    # True when castling and en passant cannot occur in a mate search by `color`.
+    #
+    # The generator has neither, so elsewhere a proof may miss a defence: the defender castling
+    # out of the net, or taking a pawn that just double-stepped en passant. Missing attacker
+    # moves only make proofs rarer, so the defender's castling rights and the attacker's pawns
+    # on their start rank are all that matter.
+    #
+    defender = 'b' if color == 'w' else 'w'
+    home_row = 7 if defender == 'w' else 0
+    king = board[home_row][4]
+    if king and king.name == 'K' and king.color == defender and not king.has_moved:
+        for rook in (board[home_row][0], board[home_row][7]):
+            if rook and rook.name == 'R' and rook.color == defender and not rook.has_moved:
+                return False
+    start_row = 6 if color == 'w' else 1
+    return not any(p and p.name == 'P' and p.color == color for p in board[start_row])
+
+
+class MateSearch:
+    #
+    # Proof-number mate finder. One instance keeps its transposition table between calls,
+    # so asking again about a position from the same game reuses the earlier work.
+    #
+    def __init__(self, max_plies=MATE_MAX_PLIES):
+        self.max_plies = max_plies
+        self.table = {}  # position key -> (proof number, disproof number, plies left when searched)
+        self.table_limit = MATE_TABLE_LIMIT  # Entries kept between calls
+        self.nodes = 0
+        self.max_nodes = 0
+        self.stop_event = None
+
+    def clear(self):
+        self.table = {}
+
+    def find_mate(self, board, color, max_nodes=100000, stop_event=None):
+        #
+        # Look for a forced mate by `color`.
+        #
+        # Returns the mating line as a list of moves (attacker's first move first),
+        # or None when no mate was proven within max_nodes expansions or the search was stopped.
+        #
+        if len(self.table) > self.table_limit:
+            self.table.clear()
+        self.nodes = 0
+        self.max_nodes = max_nodes
+        self.stop_event = stop_event
+        root = position_key(board, color)
+        self._search(board, color, root, True, INFINITY, INFINITY, 0, set())
+        if self.table.get(root, (1, 1, 0))[0] != 0:
+            return None
+        return self.principal_line(board, color)
+
+    def _budget_spent(self):
+        if self.nodes >= self.max_nodes:
+            return True
+        return self.stop_event is not None and self.stop_event.is_set()
+
+    def _numbers(self, key, plies_left):
+        #
+        # Stored proof and disproof number of a position, (1, 1) when unknown.
+        #
+        # A disproof found with fewer plies left than we have now may have been caused
+        # by the ply limit, so such a position is searched again.
+        #
+        entry = self.table.get(key)
+        if entry is None or (entry[1] == 0 and entry[2] < plies_left):
+            return 1, 1
+        return entry[0], entry[1]
+
+    def _total(self, values):
+        #Sum of child numbers; only a real (dis)proof reaches INFINITY, large sums saturate below it
+        total = 0
+        for value in values:
+            if value >= INFINITY:
+                return INFINITY
+            total += value
+        return min(total, INFINITY - 1)
+
+    def _search(self, board, color, key, attacker, threshold_pn, threshold_dn, ply, path):
+        #
+        # Expand a position until its proof or disproof number reaches the given threshold.
+        #
+        # Returns (proof number, disproof number, path dependent). A repetition of a position on
+        # the current path is never a mate; disproofs that rest on such a repetition only hold for
+        # this path and are therefore returned to the parent but not stored.
+        #
+        self.nodes += 1
+        plies_left = self.max_plies - ply
+        children = legal_children(board, color)
+        opponent = 'b' if color == 'w' else 'w'
+
+        if not children:
+            # Mate (or stalemate) on the board: only a mated defender is a proof
+            mated = in_check(board, color)
+            result = (0, INFINITY) if (mated and not attacker) else (INFINITY, 0)
+            self.table[key] = result + (INFINITY,)
+            return result + (False,)
+        if plies_left <= 0:
+            self.table[key] = (INFINITY, 0, 0)
+            return INFINITY, 0, False
+
+        child_keys = [position_key(child, opponent) for _, child in children]
+        numbers = []
+        dependent = []
+        for child_key in child_keys:
+            repeated = child_key in path
+            numbers.append((INFINITY, 0) if repeated else self._numbers(child_key, plies_left - 1))
+            dependent.append(repeated)
+
+        path.add(key)
+        while True:
+            if attacker:
+                pn = min(n[0] for n in numbers)
+                dn = self._total(n[1] for n in numbers)
+            else:
+                pn = self._total(n[0] for n in numbers)
+                dn = min(n[1] for n in numbers)
+            if pn >= threshold_pn or dn >= threshold_dn or self._budget_spent():
+                break
+
+            # Most promising child and the second-best value, which bounds how long we stay in it
+            index = best = second = None
+            for i, n in enumerate(numbers):
+                value = n[0] if attacker else n[1]
+                if best is None or value < best:
+                    index, second, best = i, best, value
+                elif second is None or value < second:
+                    second = value
+            if second is None:
+                second = INFINITY
+            child_pn, child_dn = numbers[index]
+            if attacker:
+                child_threshold_pn = min(threshold_pn, second + 1)
+                child_threshold_dn = threshold_dn - dn + child_dn
+            else:
+                child_threshold_pn = threshold_pn - pn + child_pn
+                child_threshold_dn = min(threshold_dn, second + 1)
+            child_pn, child_dn, child_dependent = self._search(
+                children[index][1], opponent, child_keys[index], not attacker,
+                child_threshold_pn, child_threshold_dn, ply + 1, path)
+            numbers[index] = (child_pn, child_dn)
+            dependent[index] = child_dependent
+        path.discard(key)
+
+        path_dependent = dn == 0 and any(dependent[i] for i, n in enumerate(numbers) if n[1] == 0)
+        if path_dependent:
+            self.table.pop(key, None)
+        else:
+            self.table[key] = (pn, dn, plies_left)
+        return pn, dn, path_dependent
+
+    def principal_line(self, board, color):
+        #Follow proven positions from the root to the mate
+        line = []
+        attacker = True
+        for _ in range(self.max_plies + 1):
+            opponent = 'b' if color == 'w' else 'w'
+            proven = [(move, child) for move, child in legal_children(board, color)
+                      if self.table.get(position_key(child, opponent), (1, 1, 0))[0] == 0]
+            if not proven:
+                break
+            if attacker:
+                # Prefer a move that mates on the spot
+                move, board = min(proven, key=lambda item: bool(legal_children(item[1], opponent)))
+            else:
+                move, board = proven[0]
+            line.append(move)
+            color = opponent
+            attacker = not attacker
+        return line
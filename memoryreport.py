@@ -0,0 +1,110 @@
+import itertools
+import sys
+import tracemalloc
+
+#
+# Memory accounting for the engine's tables and caches.
+#
+# Sizes are estimates: a table's size is its own hash table plus the deep size of a sample
+# of its entries scaled up to all entries. Strings are not counted (piece names and colors
+# are shared by every entry).
+#
+
+# How a memory budget is split between the structures that can grow large
+MEMORY_SHARES = {'transposition_table': 0.5, 'position_cache': 0.3, 'mate_table': 0.2}
+
+# Entries measured per table when estimating its size
+SIZE_SAMPLE = 16
+
+# Bytes per entry assumed before a table has entries to measure
+DEFAULT_ENTRY_BYTES = {'transposition_table': 3100, 'mate_table': 2500}
+
+# A table over its limit is cut back to this share of the limit, so trimming is not needed after every move
+TRIM_TARGET = 0.75
+
+# Lines reported from each allocation snapshot
+ALLOCATION_TOP = 10
+
+
+def deep_sizeof(obj, seen=None):
+    #Bytes held by obj and the containers and numbers inside it (each object counted once)
+    if seen is None:
+        seen = set()
+    if id(obj) in seen or isinstance(obj, str):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (tuple, list, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    return size
+
+
+def entry_bytes(table, default, sample=SIZE_SAMPLE):
+    #Average bytes per entry of a dict, measured on up to `sample` entries spread over the table
+    if not table:
+        return default
+    step = max(1, len(table) // sample)
+    measured = [deep_sizeof(key) + deep_sizeof(value)
+                for key, value in itertools.islice(table.items(), 0, None, step)][:sample]
+    return sum(measured) / len(measured)
+
+
+def table_bytes(table, default=0):
+    #Estimated bytes of a dict including its entries
+    return int(sys.getsizeof(table) + len(table) * entry_bytes(table, default))
+
+
+def trim_table(table, limit):
+    #Drop the oldest entries (insertion order) of a dict over `limit`; returns how many were dropped
+    if limit is None or len(table) <= limit:
+        return 0
+    excess = len(table) - int(limit * TRIM_TARGET)
+    for key in list(itertools.islice(table, excess)):
+        del table[key]
+    return excess
+
+
+class AllocationTracker:
+    #tracemalloc snapshots taken after each move, compared with the previous one
+    def __init__(self, top=ALLOCATION_TOP):
+        self.top = top
+        self.previous = None
+        self.started = not tracemalloc.is_tracing()
+        if self.started:
+            tracemalloc.start()
+
+    def snapshot(self):
+        #Largest allocation sites now, with their growth since the last snapshot
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        if self.previous is None:
+            stats = [(stat.traceback, stat.size, stat.count, stat.size) for stat in snapshot.statistics('lineno')]
+        else:
+            stats = [(stat.traceback, stat.size, stat.count, stat.size_diff)
+                     for stat in snapshot.compare_to(self.previous, 'lineno')]
+        self.previous = snapshot
+        current, peak = tracemalloc.get_traced_memory()
+        return {'current': current, 'peak': peak,
+                'top': [{'where': str(traceback[0]), 'bytes': size, 'blocks': count, 'growth': growth}
+                        for traceback, size, count, growth in stats[:self.top]]}
+
+    def stop(self):
+        if self.started:
+            tracemalloc.stop()
+        self.previous = None
+
+
+def format_report(report):
+    #Text table of a ChessAI.memory_report()
+    lines = [f"{'structure':<22}{'entries':>10}{'limit':>10}{'KB':>10}"]
+    for name, info in report['structures'].items():
+        limit = '-' if info['limit'] is None else str(info['limit'])
+        lines.append(f"{name:<22}{info['entries']:>10}{limit:>10}{info['bytes'] / 1024:>10.0f}")
+    budget = report['budget']
+    lines.append(f"{'total':<22}{'':>10}{'':>10}{report['total'] / 1024:>10.0f}"
+                 + (f"  (budget {budget / 1024:.0f} KB)" if budget else ''))
+    return '\n'.join(lines)
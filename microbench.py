@@ -0,0 +1,214 @@
+import argparse
+import copy
+import json
+import statistics
+import sys
+import time
+import zlib
+
+from alphabeta import ChessAI, EVAL_TERMS, PositionSummary
+from bench import BENCH_POSITIONS
+from fen import board_from_fen
+from skakPieces import Piece
+
+#
+# Micro-benchmarks for the hot functions under the search.
+#
+#   python microbench.py                          all cases, prints ns/op
+#   python microbench.py --filter moves.          only cases whose name contains "moves."
+#   python microbench.py --out micro.json
+#   python microbench.py --baseline micro.json    compare against an earlier run
+#
+# Each case is one function (a piece's get_possible_moves, is_in_check, an evaluation term, ...)
+# called on every fitting input from a fixed set of positions. One operation is one call.
+# After a warm-up run the case is timed in --repeat runs of enough loops to last --min-time
+# each; the report shows the mean ns/op and its spread over the runs.
+#
+# Every case also has a checksum of what the calls returned. Like the node count of bench.py
+# it must stay the same for a pure speed-up; a changed checksum means the function now
+# behaves differently.
+#
+
+# Every fourth bench position: openings, middlegames, tactics and endgames, and cheap enough
+# for get_all_moves (which copies the board for every move)
+MICRO_POSITIONS = BENCH_POSITIONS[::4]
+
+DEFAULT_REPEAT = 7
+DEFAULT_MIN_TIME = 0.05  # Seconds per timed run
+
+# A difference is reported as real when it is larger than this many standard deviations
+# of the two measurements together
+SIGNIFICANCE = 2.0
+
+PIECE_NAMES = 'PRNBQK'
+
+
+def load_positions(positions=MICRO_POSITIONS):
+    #(board, side to move) for every FEN
+    loaded = []
+    for fen in positions:
+        board, color, _, _ = board_from_fen(fen)
+        loaded.append((board, color))
+    return loaded
+
+
+def _pieces(positions, name):
+    #(board, row, col, piece) for every piece called `name` in the positions
+    return [(board, r, c, piece) for board, _ in positions
+            for r, row in enumerate(board) for c, piece in enumerate(row)
+            if piece and piece.name == name]
+
+
+def _moved_king(piece):
+    #Copy of a king that has moved, so get_possible_moves skips the castling checks
+    king = copy.copy(piece)
+    king.has_moved = True
+    return king
+
+
+def build_cases(ai, positions):
+    #Case name -> list of (function, args) calls
+    cases = {}
+    for name in PIECE_NAMES:
+        pieces = _pieces(positions, name)
+        if name == 'K':
+            cases['moves.K+castling'] = [(piece.get_possible_moves, (board, r, c))
+                                         for board, r, c, piece in pieces if not piece.has_moved]
+            pieces = [(board, r, c, _moved_king(piece)) for board, r, c, piece in pieces]
+        cases[f'moves.{name}'] = [(piece.get_possible_moves, (board, r, c)) for board, r, c, piece in pieces]
+        cases[f'attacks.{name}'] = [(piece.get_possible_moves, (board, r, c, True)) for board, r, c, piece in pieces]
+
+    cases['is_in_check'] = [(ai.is_in_check, (board, color)) for board, _ in positions for color in 'wb']
+    cases['get_all_moves'] = [(ai.get_all_moves, (board, color)) for board, color in positions]
+
+    summaries = [ai.summarize_position(board) for board, _ in positions]
+    for summary in summaries:
+        ai._eval_mobility(summary)  # Fills the attack counts that center control reads
+    cases['eval.summarize'] = [(ai.summarize_position, (board,)) for board, _ in positions]
+    for term in EVAL_TERMS:
+        cases['eval.' + term] = [(getattr(ai, '_eval_' + term), (summary,)) for summary in summaries]
+    cases['eval.all'] = [(ai.explain_eval, (board,)) for board, _ in positions]
+    return {name: calls for name, calls in cases.items() if calls}
+
+
+def _plain(value):
+    #Value with pieces and position summaries replaced by plain data, so its repr has no addresses
+    if isinstance(value, Piece):
+        return str(value)
+    if isinstance(value, PositionSummary):
+        return {name: _plain(getattr(value, name)) for name in value.__slots__ if name != 'board'}
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    return value
+
+
+def checksum(calls):
+    #CRC of the results of all calls
+    return zlib.crc32(repr([_plain(function(*args)) for function, args in calls]).encode())
+
+
+def _run(calls, loops):
+    #Seconds for `loops` passes over the calls
+    clock = time.perf_counter
+    start = clock()
+    for _ in range(loops):
+        for function, args in calls:
+            function(*args)
+    return clock() - start
+
+
+def time_case(calls, repeat=DEFAULT_REPEAT, min_time=DEFAULT_MIN_TIME):
+    #Warm up, pick a loop count that lasts min_time, then time `repeat` runs; returns ns/op per run
+    loops = 1
+    while True:
+        elapsed = _run(calls, loops)  # The first pass is the warm-up
+        if elapsed >= min_time:
+            break
+        loops = max(loops * 2, int(loops * min_time / elapsed * 1.2) if elapsed > 0 else loops * 10)
+    operations = loops * len(calls)
+    return [_run(calls, loops) / operations * 1e9 for _ in range(repeat)]
+
+
+def run(names=None, repeat=DEFAULT_REPEAT, min_time=DEFAULT_MIN_TIME, positions=MICRO_POSITIONS,
+        output=sys.stderr):
+    #Time every case (or those whose name contains one of `names`) and return the result
+    ai = ChessAI()
+    ai.collect_stats = False
+    cases = build_cases(ai, load_positions(positions))
+    results = {}
+    for name, calls in cases.items():
+        if names and not any(part in name for part in names):
+            continue
+        samples = time_case(calls, repeat, min_time)
+        mean = statistics.mean(samples)
+        results[name] = {'ops': len(calls), 'checksum': checksum(calls), 'mean': round(mean, 1),
+                         'stdev': round(statistics.stdev(samples), 1) if len(samples) > 1 else 0.0,
+                         'min': round(min(samples), 1)}
+        print(f"{name}: {mean:.0f} ns/op", file=output)
+    return {'repeat': repeat, 'positions': len(positions), 'cases': results}
+
+
+def print_summary(result, output=sys.stdout):
+    output.write(f"{'case':<24}{'ops':>6}{'ns/op':>12}{'+/-':>8}{'min':>12}\n")
+    for name, case in result['cases'].items():
+        spread = case['stdev'] / case['mean'] * 100 if case['mean'] else 0.0
+        output.write(f"{name:<24}{case['ops']:>6}{case['mean']:>12.0f}{spread:>7.1f}%{case['min']:>12.0f}\n")
+
+
+def compare(result, baseline, output=sys.stdout):
+    #Report per-case speed changes against a baseline result; True when no checksum changed
+    same = True
+    output.write(f"{'case':<24}{'before':>12}{'after':>12}{'change':>9}\n")
+    for name, case in result['cases'].items():
+        before = baseline['cases'].get(name)
+        if before is None:
+            output.write(f"{name:<24}{'-':>12}{case['mean']:>12.0f}{'new':>9}\n")
+            continue
+        change = (case['mean'] - before['mean']) / before['mean'] * 100 if before['mean'] else 0.0
+        noise = SIGNIFICANCE * (case['stdev'] ** 2 + before['stdev'] ** 2) ** 0.5
+        marks = ''
+        if abs(case['mean'] - before['mean']) > noise:
+            marks += '  faster' if change < 0 else '  slower'
+        if case['checksum'] != before['checksum'] or case['ops'] != before['ops']:
+            marks += '  RESULT CHANGED'
+            same = False
+        output.write(f"{name:<24}{before['mean']:>12.0f}{case['mean']:>12.0f}{change:>+8.1f}%{marks}\n")
+    return same
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the move generators, check detection and evaluation terms.")
+    parser.add_argument('--filter', action='append', help="Only run cases whose name contains this text (repeatable)")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="Timed runs per case")
+    parser.add_argument('--min-time', type=float, default=DEFAULT_MIN_TIME, help="Seconds per timed run")
+    parser.add_argument('--list', action='store_true', help="List the cases and exit")
+    parser.add_argument('--out', help="Write the result as JSON to this file")
+    parser.add_argument('--baseline', help="Earlier JSON result to compare against")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        ai = ChessAI()
+        for name, calls in build_cases(ai, load_positions()).items():
+            print(f"{name:<24}{len(calls):>6} ops")
+        return 0
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as source:
+            baseline = json.load(source)
+
+    result = run(args.filter, max(1, args.repeat), args.min_time)
+    if baseline is None:
+        print_summary(result)
+    if args.out:
+        with open(args.out, 'w') as target:
+            json.dump(result, target, indent=1)
+    if baseline is not None and not compare(result, baseline):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+import mmap
+import os
+import random
+import struct
+
+from zobrist import polyglot_key
+
+# Polyglot entry: key (u64), move (u16), weight (u16), learn (u32), big-endian, sorted by key
+ENTRY = struct.Struct('>QHHI')
+
+SELECTION_MODES = ('weighted', 'best')
+
+
+def decode_move(raw, board):
+    #
+    # Translates a Polyglot move into the engine's (r1, c1, r2, c2) format.
+    #
+    # Polyglot stores castling as king-takes-own-rook (e1h1), the engine moves the king two squares.
+    # The promotion piece is dropped since the engine always promotes to a queen.
+    #
+    to_file = raw & 7
+    to_row = 7 - ((raw >> 3) & 7)
+    from_file = (raw >> 6) & 7
+    from_row = 7 - ((raw >> 9) & 7)
+
+    piece = board[from_row][from_file]
+    target = board[to_row][to_file]
+    if (piece is not None and piece.name == 'K' and target is not None and target.name == 'R'
+            and target.color == piece.color):
+        to_file = from_file + 2 if to_file > from_file else from_file - 2
+
+    return (from_row, from_file, to_row, to_file)
+
+
+class OpeningBook:
+    #
+    # Read-only Polyglot (.bin) opening book.
+    #
+    # The file is memory-mapped and looked up by binary search on the Zobrist key,
+    # so opening a large book costs nothing up front and each probe touches only a few pages.
+    #
+    def __init__(self, path, selection='weighted', seed=None):
+        if selection not in SELECTION_MODES:
+            raise ValueError(f"Unknown book selection mode: {selection}")
+        self.path = path
+        self.selection = selection
+        self.random = random.Random(seed)
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self.entry_count = size // ENTRY.size
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+    def __len__(self):
+        return self.entry_count
+
+    def _key_at(self, index):
+        return ENTRY.unpack_from(self._data, index * ENTRY.size)[0]
+
+    def entries(self, key):
+        #All (raw_move, weight, learn) entries stored for a Zobrist key
+        lo, hi = 0, self.entry_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        found = []
+        index = lo
+        while index < self.entry_count:
+            entry_key, raw_move, weight, learn = ENTRY.unpack_from(self._data, index * ENTRY.size)
+            if entry_key != key:
+                break
+            found.append((raw_move, weight, learn))
+            index += 1
+        return found
+
+    def moves(self, board, color):
+        #Book moves for the position as (move, weight) pairs
+        return [(decode_move(raw_move, board), weight)
+                for raw_move, weight, _ in self.entries(polyglot_key(board, color))]
+
+    def choose(self, board, color, legal_moves=None):
+        #
+        # Picks a book move for the position, or None when the position is not in the book.
+        #
+        # 'weighted' draws a move with probability proportional to its weight,
+        # 'best' always plays the highest-weighted move.
+        # If legal_moves is given, book moves outside it are ignored (guards against key collisions).
+        #
+        candidates = self.moves(board, color)
+        if legal_moves is not None:
+            candidates = [(move, weight) for move, weight in candidates if move in legal_moves]
+        if not candidates:
+            return None
+
+        if self.selection == 'best':
+            return max(candidates, key=lambda candidate: candidate[1])[0]
+
+        total = sum(weight for _, weight in candidates)
+        if total == 0:
+            return self.random.choice(candidates)[0]
+        pick = self.random.uniform(0, total)
+        for move, weight in candidates:
+            pick -= weight
+            if pick <= 0:
+                return move
+        return candidates[-1][0]
@@ -0,0 +1,121 @@
+import mmap
+import os
+import queue
+import struct
+import threading
+
+#
+# Search results kept on disk between sessions.
+#
+# The file is a fixed-size array of hash-indexed slots behind a small header:
+#   header  magic, format version, slot count
+#   slot    position key (Polyglot Zobrist of the full position, 0 = empty), score, search depth
+# A file with the wrong magic, version or size is reinitialized instead of being read.
+#
+
+MAGIC = b'SKPC'
+FORMAT_VERSION = 2  # 2: keys include side to move, castling and en passant
+HEADER = struct.Struct('<4sHxxI')
+SLOT = struct.Struct('<Qdh')
+
+# Default number of slots (rounded up to a power of two), about 4.5 MB on disk
+PERSISTENT_CACHE_SLOTS = 1 << 18
+
+
+class PersistentCache:
+    #
+    # Memory-mapped search cache shared by every session that opens the same file.
+    #
+    # Lookups read the mapped file directly, so a warm file is usable immediately without
+    # loading anything. New results are handed over in batches with write_async() and written
+    # by a background thread, which keeps disk I/O out of the search.
+    # A slot is only replaced by a result searched at least as deep as the one it holds.
+    #
+    def __init__(self, path, slots=PERSISTENT_CACHE_SLOTS):
+        size = 1
+        while size < max(1, slots):
+            size <<= 1
+        self.path = path
+        self.size = size
+        self._mask = size - 1
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+        file_size = HEADER.size + size * SLOT.size
+        self._file = open(path, 'r+b' if os.path.exists(path) else 'w+b')
+        self.reset = not self._header_matches(file_size)
+        if self.reset:
+            self._file.truncate(0)
+            self._file.truncate(file_size)
+            self._file.seek(0)
+            self._file.write(HEADER.pack(MAGIC, FORMAT_VERSION, size))
+            self._file.flush()
+        self._data = mmap.mmap(self._file.fileno(), file_size)
+
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def _header_matches(self, file_size):
+        #True when the file on disk is a cache of the current format and size
+        if os.fstat(self._file.fileno()).st_size != file_size:
+            return False
+        self._file.seek(0)
+        header = self._file.read(HEADER.size)
+        return header == HEADER.pack(MAGIC, FORMAT_VERSION, self.size)
+
+    def probe(self, key, depth):
+        #Stored score for a position searched at least `depth` deep, or None
+        stored_key, value, stored_depth = SLOT.unpack_from(self._data, HEADER.size + (key & self._mask) * SLOT.size)
+        if stored_key == key and key and stored_depth >= depth:
+            self.hits += 1
+            return value
+        self.misses += 1
+        return None
+
+    def store(self, key, value, depth):
+        #Write one result into its slot (depth-preferred replacement)
+        if not key:
+            return
+        offset = HEADER.size + (key & self._mask) * SLOT.size
+        stored_key, _, stored_depth = SLOT.unpack_from(self._data, offset)
+        if stored_key and depth < stored_depth:
+            return
+        SLOT.pack_into(self._data, offset, key, value, depth)
+        self.writes += 1
+
+    def write_async(self, entries):
+        #Queue a {key: (value, depth)} batch for the writer thread
+        if entries:
+            self._queue.put(entries)
+
+    def _write_loop(self):
+        while True:
+            entries = self._queue.get()
+            try:
+                if entries is None:
+                    return
+                for key, (value, depth) in entries.items():
+                    self.store(key, value, depth)
+                self._data.flush()
+            finally:
+                self._queue.task_done()
+
+    def sync(self):
+        #Block until every queued batch is on disk
+        self._queue.join()
+
+    def used(self):
+        #Number of occupied slots (scans the whole file)
+        return sum(1 for index in range(self.size)
+                   if SLOT.unpack_from(self._data, HEADER.size + index * SLOT.size)[0])
+
+    def close(self):
+        #Finish pending writes and release the file
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        self._data.flush()
+        self._data.close()
+        self._file.close()
@@ -0,0 +1,308 @@
+import argparse
+import json
+import math
+import re
+import sys
+
+from alphabeta import ChessAI
+from fen import START_FEN, FILES, PIECE_CLASSES, board_from_fen, board_to_fen, apply_move, parse_square, square_name
+from matesearch import make_move, legal_children, in_check
+
+#
+# PGN reading, SAN conversion and whole-game annotation.
+#
+#   python pgn.py games.pgn --depth 3 --out annotated.pgn
+#   python pgn.py games.pgn --time 1 --format json > annotated.jsonl
+#
+# Games are read one at a time from the stream, so archives of any size can be processed.
+# Every position of a game is searched with the same ChessAI, whose transposition table stays
+# warm from one move to the next; the table is only cleared between games.
+#
+
+HEADER_LINE = re.compile(r'^\[(\w+)\s+"(.*)"\]\s*$')
+MOVE_NUMBER = re.compile(r'^\d+\.+$')
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+SAN_MOVE = re.compile(r'^([NBRQK])?([a-h])?([1-8])?(x)?([a-h][1-8])(?:=?([NBRQ]))?$')
+
+# The seven tags every PGN game starts with, in the required order
+SEVEN_TAG_ROSTER = ('Event', 'Site', 'Date', 'Round', 'White', 'Black', 'Result')
+
+
+class Game:
+    def __init__(self, headers, moves, result):
+        self.headers = headers  # Tag name -> value, in file order
+        self.moves = moves  # SAN strings without move numbers, comments or variations
+        self.result = result
+
+    def start_fen(self):
+        return self.headers.get('FEN', START_FEN)
+
+
+def strip_movetext(text):
+    #Remove comments, variations and NAGs, leaving the main line tokens
+    text = re.sub(r'\{[^}]*\}', ' ', text)
+    text = re.sub(r';[^\n]*', ' ', text)
+    while '(' in text:
+        stripped = re.sub(r'\([^()]*\)', ' ', text)
+        if stripped == text:
+            break
+        text = stripped
+    text = re.sub(r'\$\d+', ' ', text)
+    return text
+
+
+def _make_game(headers, movetext):
+    moves = []
+    result = headers.get('Result', '*')
+    for token in strip_movetext('\n'.join(movetext)).split():  # Lines kept apart so a ';' comment ends at its line
+        token = re.sub(r'^\d+\.+', '', token)  # '12.e4' written without a space
+        if not token or MOVE_NUMBER.match(token):
+            continue
+        if token in RESULTS:
+            result = token
+            continue
+        moves.append(token.rstrip('+#!?'))
+    return Game(headers, moves, result)
+
+
+def read_games(stream):
+    #Yield the games of a PGN stream one at a time
+    headers = {}
+    movetext = []
+    for line in stream:
+        line = line.strip()
+        if line.startswith('%'):
+            continue  # Escape line
+        header = HEADER_LINE.match(line)
+        if header:
+            if movetext:
+                yield _make_game(headers, movetext)
+                headers, movetext = {}, []
+            headers[header.group(1)] = header.group(2)
+        elif line:
+            movetext.append(line)
+    if headers or movetext:
+        yield _make_game(headers, movetext)
+
+
+def _is_legal(board, color, move):
+    return not in_check(make_move(board, move), color)
+
+
+def legal_moves(board, color):
+    #Every legal (r1, c1, r2, c2) move, including castling and en passant
+    moves = []
+    for r in range(8):
+        for c in range(8):
+            piece = board[r][c]
+            if piece and piece.color == color:
+                for r2, c2 in piece.get_possible_moves(board, r, c):
+                    move = (r, c, r2, c2)
+                    if piece.name == 'P' and c2 != c and board[r2][c2] is None:
+                        # En passant: the captured pawn disappears from beside the mover
+                        after = make_move(board, move)
+                        after[r][c2] = None
+                        if not in_check(after, color):
+                            moves.append(move)
+                    elif _is_legal(board, color, move):
+                        moves.append(move)
+    return moves
+
+
+def san_to_move(board, color, san):
+    #
+    # Resolve a SAN move for `color` into ((r1, c1, r2, c2), promotion).
+    # Raises ValueError when the move is illegal or ambiguous.
+    #
+    san = san.rstrip('+#!?')
+    if san in ('O-O', '0-0', 'O-O-O', '0-0-0'):
+        row = 7 if color == 'w' else 0
+        move = (row, 4, row, 6 if san in ('O-O', '0-0') else 2)
+        piece = board[row][4]
+        if piece is None or piece.name != 'K' or move not in legal_moves(board, color):
+            raise ValueError(f"Illegal move: {san}")
+        return move, None
+
+    match = SAN_MOVE.match(san)
+    if not match:
+        raise ValueError(f"Unreadable SAN move: {san}")
+    name, from_file, from_rank, _, target, promotion = match.groups()
+    name = name or 'P'
+    r2, c2 = parse_square(target)
+
+    found = []
+    for move in legal_moves(board, color):
+        r1, c1 = move[0], move[1]
+        if (move[2], move[3]) != (r2, c2) or board[r1][c1].name != name:
+            continue
+        if from_file and FILES[c1] != from_file:
+            continue
+        if from_rank and 8 - r1 != int(from_rank):
+            continue
+        found.append(move)
+    if len(found) != 1:
+        raise ValueError(f"{'Ambiguous' if found else 'Illegal'} move: {san}")
+    return found[0], promotion
+
+
+def move_to_san(board, color, move, promotion='Q'):
+    #SAN for a legal move of `color`, with '+' or '#' for checks and mates
+    r1, c1, r2, c2 = move
+    piece = board[r1][c1]
+    if piece.name == 'K' and abs(c2 - c1) == 2:
+        san = 'O-O' if c2 > c1 else 'O-O-O'
+    else:
+        capture = board[r2][c2] is not None or (piece.name == 'P' and c1 != c2)
+        if piece.name == 'P':
+            san = (FILES[c1] + 'x' if capture else '') + square_name(r2, c2)
+            if r2 in (0, 7):
+                san += '=' + promotion
+        else:
+            rivals = [m for m in legal_moves(board, color)
+                      if (m[2], m[3]) == (r2, c2) and (m[0], m[1]) != (r1, c1) and board[m[0]][m[1]].name == piece.name]
+            prefix = ''
+            if rivals:
+                if all(m[1] != c1 for m in rivals):
+                    prefix = FILES[c1]
+                elif all(m[0] != r1 for m in rivals):
+                    prefix = str(8 - r1)
+                else:
+                    prefix = square_name(r1, c1)
+            san = piece.name + prefix + ('x' if capture else '') + square_name(r2, c2)
+
+    opponent = 'b' if color == 'w' else 'w'
+    after = make_move(board, move)
+    if piece.name == 'P':
+        if r2 in (0, 7):
+            after[r2][c2] = PIECE_CLASSES[promotion](color)
+        elif c1 != c2 and board[r2][c2] is None:
+            after[r1][c2] = None  # En passant
+    if in_check(after, opponent):
+        san += '#' if not legal_children(after, opponent) else '+'
+    return san
+
+
+def annotate_game(ai, game):
+    #
+    # Replay a game and search every position with the same (warm) engine.
+    #
+    # Returns one entry per position before each move, plus the final position:
+    # fen, side to move, played move (SAN, None at the end), engine best move (SAN),
+    # score (white-positive centipawns), depth and nodes.
+    #
+    # The positions are searched from the last one back to the first: the position after
+    # the played move was then already searched one ply deeper than needed, so that whole
+    # subtree comes straight out of the transposition table.
+    #
+    board, color, _, _ = board_from_fen(game.start_fen())
+    entries = []
+    for index in range(len(game.moves) + 1):
+        played = game.moves[index] if index < len(game.moves) else None
+        entry = {'ply': index, 'fen': board_to_fen(board, color), 'color': color, 'move': played}
+        entries.append(entry)
+        if played is not None:
+            move, promotion = san_to_move(board, color, played)
+            entry['move'] = move_to_san(board, color, move, promotion or 'Q')
+            apply_move(board, move, promotion)
+            color = 'b' if color == 'w' else 'w'
+
+    ai.new_game()
+    for entry in reversed(entries):
+        board, color, _, _ = board_from_fen(entry['fen'])
+        if legal_moves(board, color):
+            best = ai.get_best_move(board, color)
+            search = ai.last_search
+            entry.update(best=move_to_san(board, color, best) if best else None,
+                         score=search['score'], depth=search['depth'], nodes=search['nodes'])
+    return entries
+
+
+def _format_score(score):
+    if abs(score) >= 19000:
+        plies = 20000 - abs(score)
+        return f"#{'' if score > 0 else '-'}{(plies + 1) // 2}"
+    return f"{score / 100:.2f}"
+
+
+def write_pgn(game, entries, output):
+    #Annotated PGN: each move gets the score of the position it leads to and the engine's choice
+    headers = dict(game.headers)
+    headers.setdefault('Result', game.result)
+    tags = [tag for tag in SEVEN_TAG_ROSTER if tag in headers] + \
+        [tag for tag in headers if tag not in SEVEN_TAG_ROSTER]
+    for tag in tags:
+        output.write(f'[{tag} "{headers[tag]}"]\n')
+    output.write('\n')
+
+    tokens = []
+    fullmove = int(game.start_fen().split()[5]) if len(game.start_fen().split()) > 5 else 1
+    for index, entry in enumerate(entries[:-1]):
+        if entry['color'] == 'w':
+            tokens.append(f"{fullmove}.")
+        elif index == 0:
+            tokens.append(f"{fullmove}...")
+        tokens.append(entry['move'])
+
+        comment = []
+        after = entries[index + 1]
+        if 'score' in after:
+            comment.append(f"[%eval {_format_score(after['score'])}]")
+        if entry.get('best') and entry['best'] != entry['move']:
+            comment.append(f"best {entry['best']}")
+        if comment:
+            tokens.append('{' + ' '.join(comment) + '}')
+        if entry['color'] == 'b':
+            fullmove += 1
+    tokens.append(game.result)
+
+    line = ''
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > 79:
+            output.write(line + '\n')
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    output.write(line + '\n\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Annotate PGN games with the chess engine.")
+    parser.add_argument('input', help="PGN file, or - for stdin")
+    parser.add_argument('--out', help="Output file (default: stdout)")
+    parser.add_argument('--format', choices=('pgn', 'json'), default='pgn',
+                        help="Annotated PGN or one JSON object per game")
+    parser.add_argument('--depth', type=int, default=3, help="Search depth per position")
+    parser.add_argument('--time', type=float, help="Seconds per position")
+    parser.add_argument('--max-games', type=int, help="Stop after this many games")
+    args = parser.parse_args(argv)
+
+    ai = ChessAI(depth=args.depth)
+    ai.collect_stats = False
+    ai.max_time = args.time if args.time else math.inf
+
+    source = sys.stdin if args.input == '-' else open(args.input)
+    output = open(args.out, 'w') if args.out else sys.stdout
+    try:
+        for number, game in enumerate(read_games(source), 1):
+            if args.max_games and number > args.max_games:
+                break
+            try:
+                entries = annotate_game(ai, game)
+            except ValueError as error:
+                print(f"game {number}: {error}", file=sys.stderr)
+                continue
+            if args.format == 'json':
+                output.write(json.dumps({'headers': game.headers, 'result': game.result, 'positions': entries}) + '\n')
+            else:
+                write_pgn(game, entries, output)
+            output.flush()
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
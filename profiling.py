@@ -0,0 +1,264 @@
+import argparse
+import math
+import os
+import sys
+import threading
+import time
+
+#
+# Search profiling: where does the time of get_best_move go?
+#
+#   python profiling.py --fen "<fen>" --depth 3 --sample --out profile
+#
+# PhaseTimer wraps the engine's main phases (move generation, legality checks, evaluation,
+# move ordering, hashing, making moves, the search itself) in timers on one ChessAI instance,
+# without touching the class. Times are exclusive: time spent in a nested phase (evaluation
+# inside quiescence) is only counted for the inner phase.
+#
+# Sampler takes a stack sample of the searching thread at a fixed interval and counts the
+# stacks in collapsed format ("outer;inner;leaf count" per line), which flamegraph.pl,
+# speedscope and similar tools read directly.
+#
+# Both are pure Python, so they also work in the PyInstaller build, where node counts and
+# timings differ from running the source. There the GUI turns profiling on from the
+# environment (see profile_from_environment) and writes the files after every engine move.
+#
+
+# Engine methods timed per phase
+PHASES = {
+    'search': ('search_with_aspiration', 'alphabeta_enhanced'),
+    'quiescence': ('quiescence_search',),
+    'movegen': ('get_all_moves', 'get_tactical_moves'),
+    'legality': ('is_in_check', 'is_game_over', 'find_king', 'is_check_giving_move'),
+    'eval': ('evaluate_board',),
+    'ordering': ('sort_moves_advanced',),
+    'hashing': ('board_to_key',),
+    'make_move': ('make_move_fast',),
+}
+
+# Seconds between two stack samples
+DEFAULT_SAMPLE_INTERVAL = 0.001
+
+# Environment variables read by profile_from_environment
+PROFILE_ENV = 'SKAK_PROFILE'          # "phases" or "sample"
+PROFILE_OUT_ENV = 'SKAK_PROFILE_OUT'  # Output file prefix
+DEFAULT_PROFILE_OUT = 'skak-profile'
+
+_MODULE = os.path.splitext(os.path.basename(__file__))[0]
+
+
+class PhaseTimer:
+    #Exclusive wall time and call counts per search phase, collected by wrapping ChessAI methods
+    def __init__(self):
+        self.times = {phase: 0.0 for phase in PHASES}
+        self.calls = {phase: 0 for phase in PHASES}
+        self.total = 0.0
+        self._stack = []  # [phase, start, time spent in nested phases]
+        self._ai = None
+        self._thread = None
+        self._saved = {}  # Instance attributes replaced by the wrappers (e.g. a tracer's)
+
+    def attach(self, ai):
+        #Wrap the phase methods of one ChessAI instance (the class is left alone).
+        #Only calls from the attaching thread are timed; e.g. the GUI thread passes straight through.
+        self._ai = ai
+        self._thread = threading.get_ident()
+        self._saved = {}
+        for phase, names in PHASES.items():
+            for name in names:
+                if name in ai.__dict__:
+                    self._saved[name] = ai.__dict__[name]
+                setattr(ai, name, self._wrap(phase, getattr(ai, name)))
+
+    def detach(self):
+        #Remove the wrappers again
+        for names in PHASES.values():
+            for name in names:
+                self._ai.__dict__.pop(name, None)
+        self._ai.__dict__.update(self._saved)
+        self._ai = None
+
+    def _wrap(self, phase, method):
+        stack = self._stack
+        times = self.times
+        calls = self.calls
+        clock = time.perf_counter
+        owner = self._thread
+        get_ident = threading.get_ident
+
+        def timed(*args, **kwargs):
+            if get_ident() != owner:
+                return method(*args, **kwargs)
+            frame = [phase, clock(), 0.0]
+            stack.append(frame)
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = clock() - frame[1]
+                stack.pop()
+                times[phase] += elapsed - frame[2]
+                calls[phase] += 1
+                if stack:
+                    stack[-1][2] += elapsed
+        return timed
+
+    def report(self):
+        #Rows of (phase, calls, seconds, share of the measured total), most expensive first
+        total = self.total or sum(self.times.values()) or 1.0
+        rows = [(phase, self.calls[phase], self.times[phase], self.times[phase] / total) for phase in PHASES]
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+    def format(self):
+        lines = [f"{'phase':<12}{'calls':>10}{'seconds':>10}{'share':>8}{'us/call':>10}"]
+        for phase, calls, seconds, share in self.report():
+            per_call = seconds / calls * 1e6 if calls else 0.0
+            lines.append(f"{phase:<12}{calls:>10}{seconds:>10.3f}{share * 100:>7.1f}%{per_call:>10.1f}")
+        other = self.total - sum(self.times.values())
+        if self.total:
+            lines.append(f"{'(other)':<12}{'':>10}{other:>10.3f}{other / self.total * 100:>7.1f}%")
+        return '\n'.join(lines)
+
+
+class Sampler:
+    #Stack sampler for one thread; counts collapsed stacks
+    def __init__(self, interval=DEFAULT_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self, thread_id=None):
+        #Start sampling `thread_id` (default: the calling thread)
+        target = thread_id if thread_id is not None else threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(target,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, target):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(target)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                module = os.path.splitext(os.path.basename(code.co_filename))[0]
+                if module != _MODULE:  # Leave out the phase timer wrappers
+                    names.append(f"{module}.{code.co_name}")
+                frame = frame.f_back
+            stack = ';'.join(reversed(names))
+            self.stacks[stack] = self.stacks.get(stack, 0) + 1
+            self.samples += 1
+
+    def collapsed(self):
+        #Collapsed-stack text, one "frame;frame;frame count" line per distinct stack
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+    def top_functions(self, limit=15):
+        #(function, self samples, total samples) for the functions seen most often on top of the stack
+        own = {}
+        inclusive = {}
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] = own.get(frames[-1], 0) + count
+            for name in set(frames):
+                inclusive[name] = inclusive.get(name, 0) + count
+        ranked = sorted(own.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [(name, count, inclusive[name]) for name, count in ranked]
+
+    def format(self, limit=15):
+        lines = [f"{self.samples} samples every {self.interval * 1000:.1f} ms",
+                 f"{'self%':>7}{'total%':>8}  function"]
+        for name, count, total in self.top_functions(limit):
+            lines.append(f"{count / max(1, self.samples) * 100:>6.1f}%{total / max(1, self.samples) * 100:>7.1f}%  {name}")
+        return '\n'.join(lines)
+
+
+class SearchProfile:
+    #Phase timers and optionally a sampler around every get_best_move of one ChessAI
+    def __init__(self, sample=False, interval=DEFAULT_SAMPLE_INTERVAL):
+        self.phases = PhaseTimer()
+        self.sampler = Sampler(interval) if sample else None
+        self.searches = 0
+        self.nodes = 0
+
+    def begin(self, ai):
+        #Called by get_best_move before searching
+        self.phases.attach(ai)
+        if self.sampler is not None:
+            self.sampler.start()
+        self._start = time.perf_counter()
+
+    def end(self, ai):
+        #Called by get_best_move after searching
+        self.phases.total += time.perf_counter() - self._start
+        if self.sampler is not None:
+            self.sampler.stop()
+        self.phases.detach()
+        self.searches += 1
+        self.nodes += ai.nodes_searched
+
+    def format(self):
+        build = 'PyInstaller build' if getattr(sys, 'frozen', False) else 'source'
+        lines = [f"Search profile ({build}): {self.searches} searches, {self.nodes} nodes, "
+                 f"{self.phases.total:.2f} s", '', self.phases.format()]
+        if self.sampler is not None:
+            lines += ['', self.sampler.format()]
+        return '\n'.join(lines)
+
+    def write(self, prefix):
+        #Write prefix.txt (summary tables) and, when sampling, prefix.folded (collapsed stacks)
+        with open(prefix + '.txt', 'w') as summary:
+            summary.write(self.format() + '\n')
+        if self.sampler is not None:
+            with open(prefix + '.folded', 'w') as folded:
+                folded.write(self.sampler.collapsed())
+
+
+def profile_from_environment(ai, environ=os.environ):
+    #Turn on search profiling when SKAK_PROFILE is set; returns (profile, output prefix) or None
+    mode = environ.get(PROFILE_ENV, '').strip().lower()
+    if mode not in ('phases', 'sample'):
+        return None
+    profile = ai.enable_search_profiling(sample=mode == 'sample')
+    return profile, environ.get(PROFILE_OUT_ENV) or DEFAULT_PROFILE_OUT
+
+
+def main(argv=None):
+    from alphabeta import ChessAI
+    from fen import START_FEN, board_from_fen
+
+    parser = argparse.ArgumentParser(description="Profile one engine search.")
+    parser.add_argument('--fen', default=START_FEN, help="Position to search")
+    parser.add_argument('--depth', type=int, default=3, help="Search depth")
+    parser.add_argument('--time', type=float, help="Seconds for the search")
+    parser.add_argument('--sample', action='store_true', help="Also run the stack sampler")
+    parser.add_argument('--interval', type=float, default=DEFAULT_SAMPLE_INTERVAL * 1000,
+                        help="Milliseconds between samples")
+    parser.add_argument('--out', help="Write OUT.txt and OUT.folded instead of printing")
+    args = parser.parse_args(argv)
+
+    ai = ChessAI(depth=args.depth)
+    ai.collect_stats = False
+    ai.max_time = args.time if args.time else math.inf
+    profile = ai.enable_search_profiling(sample=args.sample, interval=args.interval / 1000)
+    board, color, _, _ = board_from_fen(args.fen)
+    ai.get_best_move(board, color)
+    ai.disable_search_profiling()
+
+    if args.out:
+        profile.write(args.out)
+    else:
+        print(profile.format())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
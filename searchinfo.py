@@ -0,0 +1,51 @@
+import collections
+
+#
+# Live information about a running search.
+#
+# Set ChessAI.info_callback to a function taking one info record (a dict). The searching
+# thread calls it after every completed iteration ('kind': 'iteration') and, while an
+# iteration runs, at most every info_interval seconds ('kind': 'progress', which repeats the
+# depth, score and PV of the last completed iteration with up-to-date counts):
+#
+#   depth     last completed depth (0 before the first one)
+#   seldepth  deepest ply reached, quiescence included
+#   score     white-positive score of the PV (None before the first iteration)
+#   pv        principal variation as (r1, c1, r2, c2) moves, read from the transposition table
+#   nodes, nps, time (seconds since the search started)
+#   hashfull  transposition table use in permille of its limit (None without a memory budget)
+#
+# A record is never changed after it has been handed out, so the callback may pass it on to
+# another thread as it is. The callback runs inside the search and should return quickly;
+# InfoQueue is a ready-made callback for consumers on another thread.
+#
+
+# Seconds between two progress records
+DEFAULT_INFO_INTERVAL = 1.0
+
+# Records kept by an InfoQueue nobody reads; older ones are dropped first
+INFO_QUEUE_SIZE = 64
+
+
+class InfoQueue:
+    #Info callback that collects records for another thread; the search never waits on it
+    def __init__(self, maxsize=INFO_QUEUE_SIZE):
+        self.records = collections.deque(maxlen=maxsize)  # append and popleft are thread-safe
+        self.latest = None
+
+    def __call__(self, info):
+        self.records.append(info)
+        self.latest = info
+
+    def drain(self):
+        #All records received since the last drain, oldest first
+        records = []
+        while True:
+            try:
+                records.append(self.records.popleft())
+            except IndexError:
+                return records
+
+    def clear(self):
+        self.records.clear()
+        self.latest = None
@@ -0,0 +1,129 @@
+#
+# Search statistics, collected per iteration of the iterative deepening.
+#
+# ChessAI fills one IterationStats per iteration while collect_stats is on; with it off the
+# search only keeps its node count. The finished SearchStats is returned in
+# ChessAI.last_search['stats'] so callers decide whether and how to show it.
+#
+
+COUNTERS = (
+    'nodes',                  # Main-search nodes (alphabeta_enhanced calls)
+    'qnodes',                 # Quiescence nodes
+    'tt_probes',              # Transposition table lookups
+    'tt_hits',                # Lookups that returned a stored value (entry deep enough)
+    'tt_stores',              # Entries written
+    'tt_overwrites',          # Writes that replaced an entry for the same position
+    'cutoffs',                # Fail-high / fail-low nodes in the main search
+    'first_move_cutoffs',     # ... where the first move searched caused the cutoff
+    'killer_cutoffs',         # ... where the cutoff move was a killer move
+    'null_move_cutoffs',      # Nodes pruned by the null move search
+    'lmr_reductions',         # Moves searched with reduced depth
+    'lmr_researches',         # Reduced searches that had to be repeated at full depth
+    'pvs_researches',         # Null-window searches that had to be repeated with the full window
+    'aspiration_researches',  # Root searches repeated after falling outside the aspiration window
+    'persistent_hits',        # Values taken from the on-disk cache
+    'tablebase_hits',         # Values taken from the tablebases
+    'lazy_evaluations',       # Evaluations cut short by the lazy exit
+)
+
+
+class IterationStats:
+    #Counters for one iteration (one root depth)
+    __slots__ = ('depth', 'time', 'completed') + COUNTERS
+
+    def __init__(self, depth):
+        self.depth = depth
+        self.time = 0.0
+        self.completed = False
+        for name in COUNTERS:
+            setattr(self, name, 0)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class SearchStats:
+    #Statistics of one get_best_move call
+    def __init__(self):
+        self.iterations = []
+
+    def begin_iteration(self, depth):
+        #Start counting a new iteration and return its counters
+        iteration = IterationStats(depth)
+        self.iterations.append(iteration)
+        return iteration
+
+    def totals(self):
+        #All iterations added up
+        total = IterationStats(self.iterations[-1].depth if self.iterations else 0)
+        for iteration in self.iterations:
+            total.time += iteration.time
+            for name in COUNTERS:
+                setattr(total, name, getattr(total, name) + getattr(iteration, name))
+        total.completed = any(iteration.completed for iteration in self.iterations)
+        return total
+
+    def effective_branching_factor(self):
+        #Average growth in nodes from one completed iteration to the next (geometric mean)
+        nodes = [it.nodes + it.qnodes for it in self.iterations if it.completed and it.nodes + it.qnodes]
+        if len(nodes) < 2:
+            return None
+        return (nodes[-1] / nodes[0]) ** (1 / (len(nodes) - 1))
+
+    def rates(self, iteration=None):
+        #Derived ratios for one iteration, or for the whole search
+        stats = iteration or self.totals()
+        all_nodes = stats.nodes + stats.qnodes
+        return {
+            'first_move_cutoff_rate': _ratio(stats.first_move_cutoffs, stats.cutoffs),
+            'tt_hit_rate': _ratio(stats.tt_hits, stats.tt_probes),
+            'tt_store_rate': _ratio(stats.tt_stores, stats.nodes),
+            'tt_overwrite_rate': _ratio(stats.tt_overwrites, stats.tt_stores),
+            'quiescence_share': _ratio(stats.qnodes, all_nodes),
+        }
+
+    def as_dict(self):
+        #JSON-ready form
+        return {'iterations': [iteration.as_dict() for iteration in self.iterations],
+                'totals': self.totals().as_dict(),
+                'effective_branching_factor': self.effective_branching_factor(),
+                **self.rates()}
+
+    def format(self):
+        #Human-readable report: one row per iteration and a summary
+        lines = [f"{'depth':>5}{'nodes':>9}{'qnodes':>9}{'ebf':>6}{'fmc%':>6}{'tt%':>6}"
+                 f"{'cuts':>7}{'lmr-rs':>7}{'pvs-rs':>7}{'asp-rs':>7}{'time':>8}"]
+        previous = None
+        for iteration in self.iterations:
+            rates = self.rates(iteration)
+            nodes = iteration.nodes + iteration.qnodes
+            branching = f"{nodes / previous:.1f}" if previous else '-'
+            lines.append(f"{iteration.depth:>5}{iteration.nodes:>9}{iteration.qnodes:>9}{branching:>6}"
+                         f"{_percent(rates['first_move_cutoff_rate']):>6}{_percent(rates['tt_hit_rate']):>6}"
+                         f"{iteration.cutoffs:>7}{iteration.lmr_researches:>7}{iteration.pvs_researches:>7}"
+                         f"{iteration.aspiration_researches:>7}{iteration.time:>8.2f}"
+                         + ('' if iteration.completed else '  (stopped)'))
+            previous = nodes if iteration.completed else previous
+
+        total = self.totals()
+        rates = self.rates(total)
+        ebf = self.effective_branching_factor()
+        lines.append(f"Effective branching factor: {ebf:.2f}" if ebf else "Effective branching factor: -")
+        lines.append(f"First-move cutoffs: {_percent(rates['first_move_cutoff_rate'])}% of {total.cutoffs} "
+                     f"(killer {total.killer_cutoffs}, null move {total.null_move_cutoffs})")
+        lines.append(f"TT: {total.tt_probes} probes, hit {_percent(rates['tt_hit_rate'])}%, "
+                     f"{total.tt_stores} stores ({_percent(rates['tt_overwrite_rate'])}% overwrites)")
+        lines.append(f"Quiescence nodes: {_percent(rates['quiescence_share'])}% of {total.nodes + total.qnodes}")
+        lines.append(f"Re-searches: {total.lmr_researches} LMR ({total.lmr_reductions} reductions), "
+                     f"{total.pvs_researches} PVS, {total.aspiration_researches} aspiration")
+        lines.append(f"Lazy evaluations: {total.lazy_evaluations}, tablebase hits: {total.tablebase_hits}, "
+                     f"persistent cache hits: {total.persistent_hits}")
+        return '\n'.join(lines)
+
+
+def _ratio(part, whole):
+    return part / whole if whole else 0.0
+
+
+def _percent(rate):
+    return f"{rate * 100:.0f}"
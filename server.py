@@ -0,0 +1,348 @@
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from alphabeta import ChessAI
+from fen import START_FEN, board_from_fen, board_to_fen, apply_move, uci_to_move, move_to_uci
+from matesearch import in_check
+from pgn import legal_moves
+from uci import allocate_time
+
+#
+# Engine server for many simultaneous games.
+#
+#   python server.py --port 8765 --workers 4
+#   python server.py --unix /tmp/skak.sock
+#
+# Clients talk JSON lines. Each connection is one session with its own position and clock:
+#   {"cmd": "new", "fen": "...", "engine": "b", "time": 300, "increment": 2, "priority": 0}
+#   {"cmd": "move", "move": "e2e4"}     play a move; the engine answers when it is its turn
+#   {"cmd": "go"}                       let the engine move now
+#   {"cmd": "stop"}                     end the current search (the best move so far is played)
+#   {"cmd": "state"}                    position, clocks and whether the engine is thinking
+# An optional "id" is echoed in the reply. Engine moves arrive as {"event": "bestmove", ...}.
+#
+# Searches run in a bounded process pool. Requests wait in a priority queue (lower priority
+# value first, then arrival order); a client that disconnects has its queued search dropped
+# and its running search stopped.
+#
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# Default clock for a new session (seconds) and increment per move
+DEFAULT_TIME = 300.0
+DEFAULT_INCREMENT = 2.0
+
+# Upper bound on one engine search, so a long clock does not tie up a worker
+MAX_SEARCH_TIME = 10.0
+
+_worker_ai = None
+_worker_session = None
+_worker_stop_flags = None
+
+
+class SharedStopFlag:
+    #Stop event for ChessAI backed by one slot of a shared array; is_set is a plain memory read
+    def __init__(self, flags, slot):
+        self.flags = flags
+        self.slot = slot
+
+    def is_set(self):
+        return self.flags[self.slot] != 0
+
+
+def init_worker(stop_flags):
+    #Pool initializer: keep the shared stop flags, which can only be handed over at process start
+    global _worker_stop_flags
+    _worker_stop_flags = stop_flags
+
+
+def search_job(session_id, fen, max_time, depth, slot):
+    #Runs in a pool process: search one position, reusing the process' engine for the same session
+    global _worker_ai, _worker_session
+    if _worker_ai is None:
+        _worker_ai = ChessAI()
+        _worker_ai.collect_stats = False
+    if _worker_session != session_id:
+        _worker_ai.new_game()
+        _worker_session = session_id
+
+    board, color, _, _ = board_from_fen(fen)
+    _worker_ai.depth = depth
+    _worker_ai.max_time = max_time
+    _worker_ai.stop_event = SharedStopFlag(_worker_stop_flags, slot)
+    move = _worker_ai.get_best_move(board, color)
+    if move is None:
+        moves = legal_moves(board, color)
+        move = moves[0] if moves else None
+    search = _worker_ai.last_search
+    return {'move': move, 'score': search['score'], 'depth': search['depth'], 'nodes': search['nodes']}
+
+
+def parse_new_request(request):
+    #Checked settings of a 'new' request; raises ValueError (or TypeError) before the session is touched
+    fen = request.get('fen', START_FEN)
+    if not isinstance(fen, str):
+        raise ValueError("fen must be a string")
+    board_from_fen(fen)
+    engine = request.get('engine', 'b')
+    if engine not in ('w', 'b'):
+        raise ValueError(f"engine must be 'w' or 'b', not {engine!r}")
+    settings = {'fen': fen, 'engine': engine,
+                'time': float(request.get('time', DEFAULT_TIME)),
+                'increment': float(request.get('increment', DEFAULT_INCREMENT)),
+                'priority': int(request.get('priority', 0)),
+                'depth': int(request.get('depth', 64))}
+    if settings['depth'] < 1:
+        raise ValueError("depth must be at least 1")
+    if math.isnan(settings['time']) or math.isnan(settings['increment']):
+        raise ValueError("time and increment must be numbers")
+    return settings
+
+
+class SearchRequest:
+    def __init__(self, session, fen, max_time, depth):
+        self.session = session
+        self.fen = fen
+        self.max_time = max_time
+        self.depth = depth
+        self.slot = None  # Stop flag slot while the search runs
+        self.stopped = False
+        self.cancelled = False
+        self.queued_at = time.monotonic()
+
+
+class Session:
+    _ids = itertools.count(1)
+
+    def __init__(self, server, writer):
+        self.server = server
+        self.writer = writer
+        self.id = next(Session._ids)
+        self.priority = 0
+        self.engine_color = 'b'
+        self.depth = 64
+        self.search = None  # SearchRequest while the engine is queued or thinking
+        self.reset(START_FEN, DEFAULT_TIME, DEFAULT_INCREMENT)
+
+    def reset(self, fen, seconds, increment):
+        self.board, self.color, self.halfmove, self.fullmove = board_from_fen(fen)
+        self.clock = {'w': float(seconds), 'b': float(seconds)}
+        self.increment = float(increment)
+        self.turn_started = time.monotonic()
+
+    def fen(self):
+        return board_to_fen(self.board, self.color, self.halfmove, self.fullmove)
+
+    def state(self):
+        return {'fen': self.fen(), 'to_move': self.color, 'clock': self.clock,
+                'thinking': self.search is not None, 'result': self.result()}
+
+    def result(self):
+        #'1-0', '0-1', '1/2-1/2' when the game is over, else None
+        if self.halfmove >= 100:
+            return '1/2-1/2'
+        if legal_moves(self.board, self.color):
+            return None
+        if in_check(self.board, self.color):
+            return '0-1' if self.color == 'w' else '1-0'
+        return '1/2-1/2'
+
+    def play(self, move, promotion=None):
+        #Apply a move for the side to move and run the chess clock
+        now = time.monotonic()
+        self.clock[self.color] = max(0.0, self.clock[self.color] - (now - self.turn_started)) + self.increment
+        self.turn_started = now
+        self.halfmove = 0 if apply_move(self.board, move, promotion) else self.halfmove + 1
+        if self.color == 'b':
+            self.fullmove += 1
+        self.color = 'b' if self.color == 'w' else 'w'
+
+    async def send(self, message):
+        self.writer.write((json.dumps(message) + '\n').encode())
+        await self.writer.drain()
+
+    async def handle(self, request):
+        #Process one client request and return the reply
+        command = request.get('cmd')
+        if command == 'new':
+            try:
+                settings = parse_new_request(request)
+            except (ValueError, TypeError) as error:
+                return {'error': str(error)}
+            self.cancel_search()
+            self.reset(settings['fen'], settings['time'], settings['increment'])
+            self.engine_color = settings['engine']
+            self.priority = settings['priority']
+            self.depth = settings['depth']
+            self.maybe_start_search()
+            return self.state()
+        if command == 'move':
+            if self.search is not None:
+                return {'error': 'engine is thinking'}
+            if self.color == self.engine_color:
+                return {'error': 'not your turn'}
+            try:
+                move, promotion = uci_to_move(request.get('move', ''))
+            except (ValueError, TypeError) as error:
+                return {'error': str(error)}
+            if move not in legal_moves(self.board, self.color):
+                return {'error': f"illegal move {request.get('move')}"}
+            self.play(move, promotion)
+            self.maybe_start_search()
+            return self.state()
+        if command == 'go':
+            if self.search is None and self.result() is None:
+                self.start_search()
+            return self.state()
+        if command == 'stop':
+            if self.search is not None:
+                self.server.stop(self.search)
+            return self.state()
+        if command == 'state':
+            return self.state()
+        return {'error': f"unknown command {command}"}
+
+    def maybe_start_search(self):
+        if self.color == self.engine_color and self.search is None and self.result() is None:
+            self.start_search()
+
+    def start_search(self):
+        remaining = self.clock[self.color]
+        max_time = min(MAX_SEARCH_TIME, allocate_time(remaining, self.increment)) if math.isfinite(remaining) else MAX_SEARCH_TIME
+        self.search = SearchRequest(self, self.fen(), max_time, self.depth)
+        self.server.submit(self.search)
+
+    def cancel_search(self):
+        if self.search is not None:
+            self.search.cancelled = True
+            self.server.stop(self.search)
+            self.search = None
+
+    async def search_finished(self, request, result):
+        #Called by the dispatcher when this session's search is done
+        if request is not self.search or request.cancelled:
+            return
+        self.search = None
+        move = result['move']
+        if move is None:
+            return
+        text = move_to_uci(self.board, move)
+        self.play(move)
+        score = result['score'] if self.engine_color == 'w' else -result['score']
+        await self.send({'event': 'bestmove', 'move': text, 'score': score, 'depth': result['depth'],
+                         'nodes': result['nodes'], **self.state()})
+
+
+class EngineServer:
+    def __init__(self, workers=DEFAULT_WORKERS):
+        self.workers = workers
+        # One stop flag per dispatcher in shared memory; a search polls its flag at every node
+        self.stop_flags = multiprocessing.Array('b', workers, lock=False)
+        self.pool = ProcessPoolExecutor(workers, initializer=init_worker, initargs=(self.stop_flags,))
+        self.queue = asyncio.PriorityQueue()
+        self.order = itertools.count()
+        self.sessions = set()
+
+    def submit(self, request):
+        self.queue.put_nowait((request.session.priority, next(self.order), request))
+
+    def stop(self, request):
+        #End a search early; a running one plays its best move so far
+        request.stopped = True
+        if request.slot is not None:
+            self.stop_flags[request.slot] = 1
+
+    async def dispatcher(self, slot):
+        #One dispatcher per worker process, so at most `workers` searches run at once
+        loop = asyncio.get_running_loop()
+        while True:
+            _, _, request = await self.queue.get()
+            if request.cancelled:
+                continue
+            # Time spent waiting in the queue comes off the search budget
+            waited = time.monotonic() - request.queued_at
+            max_time = max(0.05, request.max_time - waited)
+            request.slot = slot
+            self.stop_flags[slot] = 1 if request.stopped else 0
+            try:
+                result = await loop.run_in_executor(self.pool, search_job, request.session.id, request.fen,
+                                                    max_time, request.depth, slot)
+            except Exception as error:
+                print(f"search failed: {error}", file=sys.stderr)
+                request.session.search = None
+                continue
+            finally:
+                request.slot = None
+            try:
+                await request.session.search_finished(request, result)
+            except ConnectionError:
+                pass
+
+    async def serve_client(self, reader, writer):
+        session = Session(self, writer)
+        self.sessions.add(session)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    await session.send({'error': 'invalid JSON'})
+                    continue
+                if not isinstance(request, dict):
+                    await session.send({'error': 'request must be a JSON object'})
+                    continue
+                reply = await session.handle(request)
+                if 'id' in request:
+                    reply['id'] = request['id']
+                await session.send(reply)
+        except ConnectionError:
+            pass
+        finally:
+            session.cancel_search()
+            self.sessions.discard(session)
+            writer.close()
+
+    async def run(self, host=None, port=None, unix_path=None):
+        if unix_path:
+            server = await asyncio.start_unix_server(self.serve_client, path=unix_path)
+        else:
+            server = await asyncio.start_server(self.serve_client, host, port)
+        dispatchers = [asyncio.create_task(self.dispatcher(slot)) for slot in range(self.workers)]
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in dispatchers:
+                task.cancel()
+            self.pool.shutdown(cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the chess engine to many clients at once.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help="Listen on this Unix socket instead of TCP")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Searches running at once")
+    args = parser.parse_args(argv)
+
+    server = EngineServer(max(1, args.workers))
+    try:
+        asyncio.run(server.run(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
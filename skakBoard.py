@@ -4,6 +4,8 @@ import sys
 import time
 import threading
 from alphabeta import ChessAI
+from profiling import profile_from_environment
+from searchinfo import InfoQueue
 from skakPieces import Piece, Pawn, Rook, Knight, Bishop, Queen, King
 from copy import deepcopy
 import sys
@@ -22,18 +24,60 @@ RED = (255, 0, 0)
 HIGHLIGHT = (255, 255, 0, 100)  # Gul med gennemsigtighed
 BLUE = (65, 105, 225)  # Sidste træk markering
 
+# Valgfri Polyglot åbningsbog
+BOOK_PATH = os.path.join("assets", "book.bin")
+
+# Valgfri mappe med slutspilstabeller (genereres med tablebase.py)
+TABLEBASE_PATH = "tablebases"
+
 # Game states
 STATE_MENU = 0
 STATE_SETTINGS = 1
 STATE_GAME = 2
 STATE_GAME_OVER = 3
 
+# Egne begivenheder: AI'en er færdig med sit træk / har ny søgeinfo (sendes fra AI-tråden)
+AI_MOVE_EVENT = pygame.USEREVENT
+SEARCH_INFO_EVENT = pygame.USEREVENT + 1
+
+# Længste tid (ms) hovedløkken venter på en begivenhed før den alligevel kigger efter ændringer
+EVENT_TIMEOUT = 1000
+
+# Status for én stilling. Konger og skak beregnes med det samme; lovlige træk og slutstilling
+# (get_all_moves kopierer brættet for hvert træk) først når de bruges
+class GameStatus:
+    def __init__(self, ai, board, version, to_move):
+        self.ai = ai
+        self.board = board
+        self.version = version  # ChessGame.position_version da status blev beregnet
+        self.to_move = to_move
+        self.king_pos = {color: ai.find_king(board, color) for color in ('w', 'b')}
+        self.in_check = {color: bool(pos) and ai.is_in_check(board, color, pos) for color, pos in self.king_pos.items()}
+        self._legal_moves = None
+        self._game_over = None
+
+    def legal_moves(self):
+        # Lovlige træk (r1, c1, r2, c2) for siden i trækket
+        if self._legal_moves is None:
+            self._legal_moves = self.ai.get_all_moves(self.board, self.to_move)
+        return self._legal_moves
+
+    def moves_from(self, row, col):
+        # Lovlige målfelter for brikken på (row, col)
+        return [(r2, c2) for r1, c1, r2, c2 in self.legal_moves() if r1 == row and c1 == col]
+
+    def is_game_over(self):
+        # Samme betingelse som ChessAI.is_game_over: ingen af siderne har lovlige træk
+        if self._game_over is None:
+            other = 'b' if self.to_move == 'w' else 'w'
+            self._game_over = not self.legal_moves() and not self.ai.get_all_moves(self.board, other)
+        return self._game_over
+
 class ChessGame:
     def __init__(self):
         pygame.init()
         self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
         pygame.display.set_caption("Skak GUI med pygame")
-        self.clock = pygame.time.Clock()
         
         self.piece_images = {}
         self.load_images()
@@ -63,6 +107,12 @@ class ChessGame:
         self.ai_thinking = False
         self.move_log = []
 
+        # Spilstatus (konger, skak, lovlige træk) caches pr. stilling; position_version tælles op
+        # hver gang brættet ændres, og status beregnes først igen når den bruges
+        self.position_version = 0
+        self.side_to_move = 'w'
+        self.status = None
+
         
         self.state = STATE_MENU
         
@@ -74,6 +124,12 @@ class ChessGame:
             # Undo-knap
         self.undo_button = pygame.Rect(WIDTH - 110, HEIGHT - 50, 100, 40)
         self.undo_text = self.small_font.render("Undo", True, (255,255,255))
+
+        # Dirty-rectangle tegning: hvad der sidst blev tegnet på hvert felt og hvilke overlays der var
+        self.text_cache = {}
+        self.pause_overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+        self.pause_overlay.fill((0, 0, 0, 150))  # Halvtransparent overlay
+        self.invalidate()
     
    
     def undo_move(self):
@@ -88,6 +144,7 @@ class ChessGame:
         # Skift tur: efter begge undo skal det være menneskets tur
         # (første iteration går til AI’s tur, anden til menneskets)
         self.human_turn = (i == 1)
+     self.position_changed('w' if self.human_turn else 'b')
     # Ryd highlights
      self.selected_piece = None
      self.possible_moves = []
@@ -118,81 +175,69 @@ class ChessGame:
             [Rook('w'), Knight('w'), Bishop('w'), Queen('w'), King('w'), Bishop('w'), Knight('w'), Rook('w')],
         ]
     
-    def draw_board(self):
-        # Tegner skakbrættet
-        for row in range(ROWS):
-            for col in range(COLS):
-                color = LIGHT if (row + col) % 2 == 0 else DARK
-                pygame.draw.rect(self.screen, color, (col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
-
-        # Hvis spillet er på pause, vis en pause-overlay
-        if self.is_paused:
-            pause_overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-            pause_overlay.fill((0, 0, 0, 150))  # Halvtransparent overlay
-            self.screen.blit(pause_overlay, (0, 0))
-
-            pause_text = self.medium_font.render("Spillet er på pause", True, (255, 255, 255))
+    def square_rect(self, row, col):
+        # Rektanglet for et felt på skærmen
+        return pygame.Rect(col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
+
+    def square_state(self, row, col, targets, checked):
+        # Alt hvad der bestemmer hvordan et felt ser ud; feltet tegnes kun igen når dette ændrer sig
+        piece = self.board[row][col]
+        selected = self.selected_piece is not None and self.selected_piece[:2] == (row, col)
+        last = self.last_move is not None and (row, col) in (self.last_move[:2], self.last_move[2:])
+        return (f"{piece.color}{piece.name}" if piece else None, self.is_paused, last, selected,
+                (row, col) in targets, (row, col) in checked)
+
+    def draw_square(self, row, col, state):
+        # Tegner et felt med alt hvad der ligger på det, i samme rækkefølge som hele brættet tegnes
+        image_key, paused, last, selected, target, checked = state
+        rect = self.square_rect(row, col)
+        pygame.draw.rect(self.screen, LIGHT if (row + col) % 2 == 0 else DARK, rect)
+
+        # Hvis spillet er på pause, vis en pause-overlay (klippes til feltet)
+        if paused:
+            self.screen.blit(self.pause_overlay, (0, 0))
+            pause_text = self.render_text(self.medium_font, "Spillet er på pause", (255, 255, 255))
             self.screen.blit(pause_text, (WIDTH // 2 - pause_text.get_width() // 2, HEIGHT // 2 - pause_text.get_height() // 2))
 
+        # Koordinater står i nederste række og venstre kolonne
+        if row == ROWS - 1:
+            self.screen.blit(self.render_text(self.tiny_font, chr(97 + col), (0, 0, 0)), (col * SQUARE_SIZE + SQUARE_SIZE - 15, HEIGHT - 15))
+        if col == 0:
+            self.screen.blit(self.render_text(self.tiny_font, str(8 - row), (0, 0, 0)), (5, row * SQUARE_SIZE + 5))
 
-    
-    def draw_coordinates(self):
-        # Tegner skakkoordinater
-        for col in range(COLS):
-            label = self.tiny_font.render(chr(97 + col), True, (0, 0, 0))
-            self.screen.blit(label, (col * SQUARE_SIZE + SQUARE_SIZE - 15, HEIGHT - 15))
-        
-        for row in range(ROWS):
-            label = self.tiny_font.render(str(8 - row), True, (0, 0, 0))
-            self.screen.blit(label, (5, row * SQUARE_SIZE + 5))
-    
-    def draw_pieces(self):
-        # Tegner skakbrikker
-        for row in range(8):
-            for col in range(8):
-                piece = self.board[row][col]
-                if piece:
-                    image_key = f"{piece.color}{piece.name}"
-                    if image_key in self.piece_images:
-                        self.screen.blit(self.piece_images[image_key], (col * SQUARE_SIZE, row * SQUARE_SIZE))
-
-        # Hvis en brik er valgt under pause, fremhæv den
-        if self.selected_piece:
-            row, col, _ = self.selected_piece
-            pygame.draw.rect(self.screen, BLUE, (col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE), 5)
-    
-    def draw_possible_moves(self):
-        # Tegner mulige træk
-        for row, col in self.possible_moves:
-            # Tjek om feltet er tomt eller har en modstander
-            if self.board[row][col] is None:
-                # Tegn en cirkel for tomme felter
-                pygame.draw.circle(self.screen, GREEN, (col * SQUARE_SIZE + SQUARE_SIZE // 2, row * SQUARE_SIZE + SQUARE_SIZE // 2), 10)
-            else:
-                # Tegn en rød kant omkring felter med modstanderbrikker
-                pygame.draw.rect(self.screen, RED, (col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE), 3)
-    
-    def highlight_selected(self):
-        # Fremhæver den valgte brik
-        if self.selected_piece:
-            row, col, _ = self.selected_piece
+        # Sidste træk
+        if last:
+            pygame.draw.rect(self.screen, BLUE, rect, 3)
+
+        if image_key in self.piece_images:
+            self.screen.blit(self.piece_images[image_key], rect.topleft)
+
+        # Valgt brik
+        if selected:
+            pygame.draw.rect(self.screen, BLUE, rect, 5)
             s = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE), pygame.SRCALPHA)
             s.fill(HIGHLIGHT)
-            self.screen.blit(s, (col * SQUARE_SIZE, row * SQUARE_SIZE))
-    
-    def highlight_last_move(self):
-        # Fremhæver det sidste træk
-        if self.last_move:
-            r1, c1, r2, c2 = self.last_move
-            pygame.draw.rect(self.screen, BLUE, (c1 * SQUARE_SIZE, r1 * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE), 3)
-            pygame.draw.rect(self.screen, BLUE, (c2 * SQUARE_SIZE, r2 * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE), 3)
-    
-    def highlight_check(self, king_pos):
-        # Fremhæver en konge, der er i skak
-        if king_pos:
-            row, col = king_pos
-            pygame.draw.rect(self.screen, RED, (col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE), 3)
-    
+            self.screen.blit(s, rect.topleft)
+
+        # Mulige træk: en cirkel på tomme felter, en rød kant omkring modstanderbrikker
+        if target:
+            if image_key is None:
+                pygame.draw.circle(self.screen, GREEN, rect.center, 10)
+            else:
+                pygame.draw.rect(self.screen, RED, rect, 3)
+
+        # Konge i skak
+        if checked:
+            pygame.draw.rect(self.screen, RED, rect, 3)
+
+    def render_text(self, font, text, color):
+        # Faste tekster renderes kun én gang
+        key = (id(font), text, color)
+        surface = self.text_cache.get(key)
+        if surface is None:
+            surface = self.text_cache[key] = font.render(text, True, color)
+        return surface
+
     def get_square_under_mouse(self):
         # Returnerer koordinaterne for feltet under musen
         mouse_x, mouse_y = pygame.mouse.get_pos()
@@ -201,20 +246,40 @@ class ChessGame:
         if 0 <= row < 8 and 0 <= col < 8:
             return row, col
         return None
-    
-    def show_thinking_indicator(self):
+
+    def thinking_info_text(self):
+        # Seneste søgeinfo fra AI'en (vurdering fra hvids side i bønder), eller None
+        info = self.search_info.latest
+        if info is None or not info['depth']:
+            return None
+        return (f"Dybde {info['depth']}/{info['seldepth']}  {info['score'] / 100:+.2f}  "
+                f"{info['nodes']} noder  {info['nps']} n/s")
+
+    def thinking_indicator_rect(self, info_text):
+        # Boksen til tænke-indikatoren; den bliver bredere og højere når der er søgeinfo
+        box_width = max(200, self.tiny_font.size(info_text)[0] + 20) if info_text else 200
+        return pygame.Rect(WIDTH // 2 - box_width // 2, 10, box_width, 58 if info_text else 40)
+
+    def show_thinking_indicator(self, text_bg, info_text):
         # Viser en indikator når AI'en tænker
-        if self.ai_thinking:
-            thinking_text = self.small_font.render("Let him cook", True, (0, 0, 0))
-            # Increase the box width from 140 to 200 and height stays at 40
-            text_bg = pygame.Rect(WIDTH // 2 - 100, 10, 200, 40)  # Changed width and x-position
-            pygame.draw.rect(self.screen, (200, 200, 200), text_bg)
-            pygame.draw.rect(self.screen, (0, 0, 0), text_bg, 2)
-            # Center the text in the larger box
-            text_x = WIDTH // 2 - thinking_text.get_width() // 2
-            self.screen.blit(thinking_text, (text_x, 15))
-            pygame.display.update(text_bg)
+        thinking_text = self.render_text(self.small_font, "Let him cook", (0, 0, 0))
+        pygame.draw.rect(self.screen, (200, 200, 200), text_bg)
+        pygame.draw.rect(self.screen, (0, 0, 0), text_bg, 2)
+        # Center the text in the larger box
+        text_x = WIDTH // 2 - thinking_text.get_width() // 2
+        self.screen.blit(thinking_text, (text_x, 15))
+        if info_text:
+            info_surface = self.tiny_font.render(info_text, True, (0, 0, 0))
+            self.screen.blit(info_surface, (WIDTH // 2 - info_surface.get_width() // 2, 44))
     
+    def wait_events(self, timeout=EVENT_TIMEOUT):
+        # Venter uden at bruge CPU på næste begivenhed og returnerer den sammen med resten af køen
+        # (en tom liste når der ikke kom noget inden for timeout ms)
+        event = pygame.event.wait(timeout)
+        if event.type == pygame.NOEVENT:
+            return []
+        return [event] + pygame.event.get()
+
     def draw_slider(self, x, y, width, value, min_val, max_val, label):
         # Beregn position for slideren
         pos = x + ((value - min_val) / (max_val - min_val)) * width
@@ -263,12 +328,8 @@ class ChessGame:
             mouse_pos = pygame.mouse.get_pos()
             mouse_pressed = pygame.mouse.get_pressed()[0]
             
-            # Tegn slidere
-            self.draw_slider(slider_x, easy_y, slider_width, easy_depth, 1, 5, "Let")
-            self.draw_slider(slider_x, medium_y, slider_width, medium_depth, 1, 5, "Mellem")
-            self.draw_slider(slider_x, hard_y, slider_width, hard_depth, 1, 5, "Svær")
-            
-            # Opdater sliderværdier hvis musen er trykket ned
+            # Opdater sliderværdier hvis musen er trykket ned (før der tegnes, da der først
+            # tegnes igen ved næste begivenhed)
             easy_depth = self.handle_slider(slider_x, easy_y, slider_width, easy_depth, 1, 5, mouse_pos, mouse_pressed)
             medium_depth = self.handle_slider(slider_x, medium_y, slider_width, medium_depth, 1, 5, mouse_pos, mouse_pressed)
             hard_depth = self.handle_slider(slider_x, hard_y, slider_width, hard_depth, 1, 5, mouse_pos, mouse_pressed)
@@ -279,13 +340,18 @@ class ChessGame:
             if medium_depth > hard_depth:
                 hard_depth = medium_depth
             
+            # Tegn slidere
+            self.draw_slider(slider_x, easy_y, slider_width, easy_depth, 1, 5, "Let")
+            self.draw_slider(slider_x, medium_y, slider_width, medium_depth, 1, 5, "Mellem")
+            self.draw_slider(slider_x, hard_y, slider_width, hard_depth, 1, 5, "Svær")
+            
             # Tegn start-knap
             pygame.draw.rect(self.screen, (0, 128, 0), start_btn)
             self.screen.blit(btn_text, (start_btn.x + 30, start_btn.y + 10))
             
             pygame.display.flip()
             
-            for event in pygame.event.get():
+            for event in self.wait_events():
                 if event.type == pygame.QUIT:
                     pygame.quit()
                     sys.exit()
@@ -334,7 +400,7 @@ class ChessGame:
                 
             pygame.display.flip()
 
-            for event in pygame.event.get():
+            for event in self.wait_events():
                 if event.type == pygame.QUIT:
                     pygame.quit()
                     sys.exit()
@@ -373,7 +439,7 @@ class ChessGame:
             
             pygame.display.flip()
 
-            for event in pygame.event.get():
+            for event in self.wait_events():
                 if event.type == pygame.QUIT:
                     pygame.quit()
                     sys.exit()
@@ -416,7 +482,7 @@ class ChessGame:
 
         waiting_for_input = True
         while waiting_for_input:
-            for event in pygame.event.get():
+            for event in self.wait_events():
                 if event.type == pygame.QUIT:
                     pygame.quit()
                     sys.exit()
@@ -432,6 +498,15 @@ class ChessGame:
         # Starter et nyt spil
         self.board = self.initialize_board()
         self.ai = ChessAI(depth=self.ai_depth)
+        if os.path.exists(BOOK_PATH):
+            self.ai.load_opening_book(BOOK_PATH)
+        if os.path.isdir(TABLEBASE_PATH):
+            self.ai.load_tablebases(TABLEBASE_PATH)
+        # Profilering af AI'ens søgning, også i .exe-filen: sæt SKAK_PROFILE=phases eller sample
+        self.search_profile = profile_from_environment(self.ai)
+        # Løbende søgeinfo (dybde, vurdering, noder) fra AI-tråden til tænke-indikatoren
+        self.search_info = InfoQueue()
+        self.ai.info_callback = self.on_search_info
         self.selected_piece = None
         self.possible_moves = []
         self.human_turn = self.player_color == 'w'  # Set initial turn based on color
@@ -440,13 +515,33 @@ class ChessGame:
         self.last_move = None
         self.ai_thinking = False
         self.state = STATE_GAME
+        self.position_changed('w' if self.human_turn else 'b')
+        self.invalidate()
         #Tæller moves for begge farver (spiller)
         self.white_move_count = 0
         self.black_move_count = 0
     
     
+    def position_changed(self, to_move):
+        # Kaldes når brættet er ændret; den cachede status gælder ikke længere
+        self.position_version += 1
+        self.side_to_move = to_move
+
+    def game_status(self):
+        # Status for den aktuelle stilling, beregnet én gang pr. positionsversion
+        version = self.position_version
+        status = self.status
+        if status is None or status.version != version:
+            status = self.status = GameStatus(self.ai, self.board, version, self.side_to_move)
+        return status
+
     def get_valid_moves(self, row, col, piece):
         # Finder lovlige træk for en brik, der ikke efterlader kongen i skak
+        status = self.game_status()
+        if piece.color == status.to_move:
+            return status.moves_from(row, col)
+
+        # Brikker der ikke er i trækket (kan vælges under pause)
         all_moves = piece.get_possible_moves(self.board, row, col)
         valid_moves = []
         
@@ -483,6 +578,7 @@ class ChessGame:
                         if (row, col) != (r1, c1):  # Gør kun ændringer, hvis det er et andet felt
                             self.board[row][col] = p
                             self.board[r1][c1] = None
+                            self.position_changed(self.side_to_move)
                             self.selected_piece = None  # Fjern den valgte brik
                             self.possible_moves = []  # Fjern mulige træk
                     else:
@@ -508,6 +604,7 @@ class ChessGame:
                                 dest_col = c1 - 2
                                 if self._verify_castling_path(self.board, row, c1, dest_col, p.color):
                                     self.board = p.perform_castling(self.board, r1, c1, dest_col)
+                                    self.position_changed('b')
                                     self.last_move = (r1, c1, r1, dest_col)
                                     self.selected_piece = None
                                     self.possible_moves = []
@@ -519,6 +616,7 @@ class ChessGame:
                                 dest_col = c1 + 2
                                 if self._verify_castling_path(self.board, row, c1, dest_col, p.color):
                                     self.board = p.perform_castling(self.board, r1, c1, dest_col)
+                                    self.position_changed('b')
                                     self.last_move = (r1, c1, r1, dest_col)
                                     self.selected_piece = None
                                     self.possible_moves = []
@@ -543,13 +641,15 @@ class ChessGame:
                             # Markér at kongen/tårnet har bevæget sig (for rokade)
                             if p.name == 'K' or p.name == 'R':
                                 p.has_moved = True
+                            self.position_changed('b')
                             
                             self.selected_piece = None
                             self.possible_moves = []
 
-                            if self.ai.is_game_over(self.board):
+                            status = self.game_status()
+                            if status.is_game_over():
                                 self.game_over = True
-                                self.winner_text = "Sort vinder!" if self.ai.find_king(self.board, 'w') is None else "Hvid vinder!"
+                                self.winner_text = "Sort vinder!" if status.king_pos['w'] is None else "Hvid vinder!"
                                 self.state = STATE_GAME_OVER
                             else:
                                 #Tæller træk for begge farver
@@ -627,6 +727,10 @@ class ChessGame:
     
     def ai_move_callback(self, best_move):
         # Callback funktion til håndtering af AI træk
+        self.ai.print_stats()  # Søgestatistik for trækket i konsollen
+        if self.search_profile:
+            profile, prefix = self.search_profile
+            profile.write(prefix)  # Skriver prefix.txt (og prefix.folded ved sample) efter hvert træk
         if best_move:
          r1, c1, r2, c2 = best_move
          moved = self.board[r1][c1]
@@ -641,13 +745,15 @@ class ChessGame:
             # Bondeforvandling til dronning hvis en bonde når modstanderens baglinje
          if self.board[r2][c2].name == 'P' and r2 == 7:  # Sort bonde når hvid baglinje
                 self.board[r2][c2] = Queen('b')
+        self.position_changed('w')
 
         self.ai_thinking = False
         self.human_turn = True
         #Tæller antal træk for begge farver
-        if self.ai.is_game_over(self.board):
+        status = self.game_status()
+        if status.is_game_over():
             self.game_over = True
-            self.winner_text = "Hvid vinder!" if self.ai.find_king(self.board, 'b') is None else "Sort vinder!"
+            self.winner_text = "Hvid vinder!" if status.king_pos['b'] is None else "Sort vinder!"
             self.state = STATE_GAME_OVER
             self.black_move_count += 1
             if self.black_move_count >= 50:
@@ -658,55 +764,107 @@ class ChessGame:
         
         self.human_turn = True
     
+    def on_search_info(self, info):
+        # Kaldes fra AI-tråden: gem søgeinfoen og væk hovedløkken, så indikatoren tegnes igen
+        self.search_info(info)
+        pygame.event.post(pygame.event.Event(SEARCH_INFO_EVENT))
+
     def update_game(self):
         # Opdaterer spilfasen
         if not self.human_turn and not self.ai_thinking:
             self.ai_thinking = True
-            pygame.display.flip()  # Opdater skærmen med "AI tænker..." besked
+            self.search_info.clear()
             
-            # Start AI beregning i baggrunden
-            self.ai.calculate_best_move_async(self.board, 'b', self.ai_move_callback)
+            # Start AI beregning i baggrunden; trækket sendes tilbage til hovedløkken som en begivenhed
+            ai = self.ai
+            ai.calculate_best_move_async(self.board, 'b', lambda best_move: pygame.event.post(
+                pygame.event.Event(AI_MOVE_EVENT, move=best_move, ai=ai)))
     
-    def render_game(self):
-        # Tegner spilfasen
-        self.draw_board()
-        self.draw_coordinates()
-        self.highlight_last_move()
-        self.draw_pieces()
-        self.highlight_selected()
-        self.draw_possible_moves()
-        self.show_thinking_indicator()
+    def overlays(self, checked_colors):
+        # Tekster og knapper oven på brættet: navn -> (rektangel, tilstand, tegnefunktion), nederste først
+        overlays = {}
+        if self.ai_thinking:
+            info_text = self.thinking_info_text()
+            rect = self.thinking_indicator_rect(info_text)
+            overlays['thinking'] = (rect, info_text, lambda: self.show_thinking_indicator(rect, info_text))
 
         # Vis skak-status
-        white_king_pos = self.ai.find_king(self.board, 'w')
-        black_king_pos = self.ai.find_king(self.board, 'b')
-
-        if white_king_pos and self.ai.is_in_check(self.board, 'w', white_king_pos):
-            self.highlight_check(white_king_pos)
-            # Vis "Skak!" tekst
-            check_text = self.small_font.render("Skak til hvid!", True, (255, 0, 0))
-            self.screen.blit(check_text, (WIDTH - 150, 10))
-            
-        if black_king_pos and self.ai.is_in_check(self.board, 'b', black_king_pos):
-            self.highlight_check(black_king_pos)
-            # Vis "Skak!" tekst
-            check_text = self.small_font.render("Skak til sort!", True, (255, 0, 0))
-            self.screen.blit(check_text, (WIDTH - 150, 40))
-        
-        # Vis hvis det er menneskets tur
+        for color, text, y in (('w', "Skak til hvid!", 10), ('b', "Skak til sort!", 40)):
+            if color in checked_colors:
+                check_text = self.render_text(self.small_font, text, (255, 0, 0))
+                overlays['check_' + color] = (check_text.get_rect(topleft=(WIDTH - 150, y)), None,
+                                              lambda check_text=check_text, y=y: self.screen.blit(check_text, (WIDTH - 150, y)))
+
+        # Vis hvis det er menneskets tur, og Undo-knappen
         if self.human_turn and not self.game_over:
-            turn_text = self.small_font.render("Din tur (hvid)", True, (0, 0, 0))
-            self.screen.blit(turn_text, (10, 10))
-    
-               # Tegn Undo-knap
-            pygame.draw.rect(self.screen, (50,50,50), self.undo_button, border_radius=5)
-            self.screen.blit(
+            turn_text = self.render_text(self.small_font, "Din tur (hvid)", (0, 0, 0))
+            overlays['turn'] = (turn_text.get_rect(topleft=(10, 10)), None, lambda: self.screen.blit(turn_text, (10, 10)))
+            overlays['undo'] = (self.undo_button, None, self.draw_undo_button)
+        return overlays
+
+    def draw_undo_button(self):
+        # Tegn Undo-knap
+        pygame.draw.rect(self.screen, (50,50,50), self.undo_button, border_radius=5)
+        self.screen.blit(
             self.undo_text,
             (
                 self.undo_button.x + (self.undo_button.width - self.undo_text.get_width())//2,
                 self.undo_button.y + (self.undo_button.height - self.undo_text.get_height())//2
             )
-         )
+        )
+
+    def squares_under(self, rect):
+        # Felterne (række, kolonne) som et rektangel dækker
+        first_col, last_col = max(0, rect.left // SQUARE_SIZE), min(COLS - 1, (rect.right - 1) // SQUARE_SIZE)
+        first_row, last_row = max(0, rect.top // SQUARE_SIZE), min(ROWS - 1, (rect.bottom - 1) // SQUARE_SIZE)
+        return {(row, col) for row in range(first_row, last_row + 1) for col in range(first_col, last_col + 1)}
+
+    def invalidate(self):
+        # Næste billede tegnes helt forfra (nyt spil, vinduet har været dækket osv.)
+        self.drawn_squares = None
+        self.drawn_overlays = {}
+
+    def render_game(self):
+        # Tegner spilfasen. Kun felter hvis indhold har ændret sig, og felter under overlays der er
+        # kommet, forsvundet eller ændret, tegnes igen og sendes til skærmen med display.update.
+        # Er intet ændret, tegnes intet.
+        status = self.game_status()
+        checked = {color: status.king_pos[color] for color in ('w', 'b') if status.in_check[color]}
+
+        targets = set(self.possible_moves)
+        king_squares = set(checked.values())
+        squares = {(row, col): self.square_state(row, col, targets, king_squares) for row in range(ROWS) for col in range(COLS)}
+        overlays = self.overlays(checked)
+
+        if self.drawn_squares is None:
+            dirty = set(squares)
+        else:
+            dirty = {square for square, state in squares.items() if self.drawn_squares[square] != state}
+            for name in overlays.keys() | self.drawn_overlays.keys():
+                old = self.drawn_overlays.get(name)
+                new = overlays.get(name)
+                if old is not None and (new is None or old[:2] != new[:2]):
+                    dirty |= self.squares_under(old[0])
+                if new is not None and (old is None or old[:2] != new[:2]):
+                    dirty |= self.squares_under(new[0])
+        self.drawn_squares = squares
+        self.drawn_overlays = overlays
+        if not dirty:
+            return
+
+        # Hvert felt tegnes forfra og overlays oven på det klippes til feltet,
+        # så halvgennemsigtige lag ikke tegnes to gange samme sted
+        rects = []
+        for row, col in dirty:
+            rect = self.square_rect(row, col)
+            self.screen.set_clip(rect)
+            self.draw_square(row, col, squares[row, col])
+            for overlay_rect, _, draw in overlays.values():
+                if overlay_rect.colliderect(rect):
+                    draw()
+            rects.append(rect)
+        self.screen.set_clip(None)
+        pygame.display.update(rects)
     
     def run(self):
         # Kører hovedspiløjfen
@@ -718,12 +876,26 @@ class ChessGame:
             elif self.state == STATE_SETTINGS:
                 self.show_difficulty_settings()
             elif self.state == STATE_GAME:
-                # Håndter begivenheder
-                for event in pygame.event.get():
+                # Håndter begivenheder; løkken sover indtil der sker noget (input, AI-træk, søgeinfo)
+                for event in self.wait_events():
                     if event.type == pygame.QUIT:
                         pygame.quit()
                         sys.exit()
 
+                    # Vinduet skal tegnes helt igen når det har været dækket
+                    elif event.type == pygame.WINDOWEXPOSED:
+                        self.invalidate()
+
+                    # AI'ens træk udføres her i hovedtråden (træk fra et tidligere spil ignoreres)
+                    elif event.type == AI_MOVE_EVENT:
+                        if event.ai is self.ai and self.state == STATE_GAME:
+                            self.ai_move_callback(event.move)
+                        continue
+
+                    # Ny søgeinfo: tænke-indikatoren tegnes igen nedenfor
+                    elif event.type == SEARCH_INFO_EVENT:
+                        continue
+
                     # Tjek for klik på Undo-knap
                     elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
                         if self.undo_button.collidepoint(event.pos):
@@ -736,10 +908,8 @@ class ChessGame:
                 # Opdater spillet (AI-træk osv.)
                 self.update_game()
 
-                # Render spillet (bræt, brikker, knapper mv.)
+                # Render spillet (kun det der har ændret sig sendes til skærmen)
                 self.render_game()
-                pygame.display.flip()
-                self.clock.tick(60)
 
             elif self.state == STATE_GAME_OVER:
                 self.show_game_over_menu()
@@ -0,0 +1,586 @@
+import argparse
+import itertools
+import mmap
+import os
+import struct
+import sys
+import time
+
+#
+# Endgame tablebases for small material sets (3 and 4 pieces including kings).
+#
+# Tables are built offline by retrograde analysis and stored one file per material
+# signature (e.g. KQvK.sktb). Every position gets one byte:
+#   bits 0-1  result for the side to move (ILLEGAL, DRAW, WIN, LOSS)
+#   bits 2-7  distance to mate in moves (capped at 63)
+# Positions are indexed by the squares of the pieces in signature order
+# (white pieces, then black pieces, each ordered K Q R B N P) and the side to move.
+# Squares follow the engine's layout: row * 8 + col with row 0 = rank 8.
+# Castling and en passant are not part of tablebase positions.
+#
+
+MAGIC = b'SKTB'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHH16s')  # magic, version, piece count, signature
+FILE_SUFFIX = '.sktb'
+MAX_PIECES = 4
+
+ILLEGAL, DRAW, WIN, LOSS = 0, 1, 2, 3
+MAX_DTM = 63
+
+PIECE_ORDER = 'KQRBNP'
+PIECE_VALUE = {'K': 0, 'Q': 9, 'R': 5, 'B': 3, 'N': 3, 'P': 1}
+PROMOTIONS = 'QRBN'
+
+# Material that can never deliver mate is a draw without a table
+DRAWN_SIDES = ('K', 'KB', 'KN')
+
+DEFAULT_DIRECTORY = 'tablebases'
+
+
+def _step_targets(offsets):
+    targets = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        targets.append(tuple((r + dr) * 8 + c + dc for dr, dc in offsets
+                             if 0 <= r + dr < 8 and 0 <= c + dc < 8))
+    return tuple(targets)
+
+
+def _rays(directions):
+    rays = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        square_rays = []
+        for dr, dc in directions:
+            ray = []
+            nr, nc = r + dr, c + dc
+            while 0 <= nr < 8 and 0 <= nc < 8:
+                ray.append(nr * 8 + nc)
+                nr += dr
+                nc += dc
+            square_rays.append(tuple(ray))
+        rays.append(tuple(square_rays))
+    return tuple(rays)
+
+
+KING_TARGETS = _step_targets(((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)))
+KNIGHT_TARGETS = _step_targets(((-2, -1), (-1, -2), (1, -2), (2, -1), (2, 1), (1, 2), (-1, 2), (-2, 1)))
+ROOK_RAYS = _rays(((-1, 0), (1, 0), (0, -1), (0, 1)))
+BISHOP_RAYS = _rays(((-1, -1), (-1, 1), (1, -1), (1, 1)))
+SLIDER_RAYS = {'R': ROOK_RAYS, 'B': BISHOP_RAYS,
+               'Q': tuple(ROOK_RAYS[sq] + BISHOP_RAYS[sq] for sq in range(64))}
+PAWN_ATTACKS = {
+    'w': _step_targets(((-1, -1), (-1, 1))),
+    'b': _step_targets(((1, -1), (1, 1))),
+}
+
+
+def _build_lines():
+    #For every square pair on a common line: (line kind 'R'/'B', squares strictly between)
+    lines = [[None] * 64 for _ in range(64)]
+    for kind, rays in (('R', ROOK_RAYS), ('B', BISHOP_RAYS)):
+        for sq in range(64):
+            for ray in rays[sq]:
+                for i, target in enumerate(ray):
+                    lines[sq][target] = (kind, ray[:i])
+    return lines
+
+
+LINES = _build_lines()
+
+
+def other(color):
+    return 'b' if color == 'w' else 'w'
+
+
+def mirror(sq):
+    #Flip a square vertically (used when swapping colors)
+    return (7 - (sq >> 3)) * 8 + (sq & 7)
+
+
+def sort_side(names):
+    return ''.join(sorted(names, key=PIECE_ORDER.index))
+
+
+def parse_signature(signature):
+    #'KQvK' -> ('KQ', 'K')
+    try:
+        white, black = signature.upper().split('V')
+    except ValueError:
+        raise ValueError(f"Bad material signature: {signature}")
+    for side in (white, black):
+        if side.count('K') != 1 or any(name not in PIECE_ORDER for name in side):
+            raise ValueError(f"Bad material signature: {signature}")
+    return sort_side(white), sort_side(black)
+
+
+def make_signature(white, black):
+    return f"{sort_side(white)}v{sort_side(black)}"
+
+
+def _side_strength(side):
+    return (sum(PIECE_VALUE[name] for name in side), len(side), [-PIECE_ORDER.index(name) for name in side])
+
+
+def canonical(white, black):
+    #Tables are stored with the stronger side as white; returns (white, black, flipped)
+    white, black = sort_side(white), sort_side(black)
+    if _side_strength(black) > _side_strength(white):
+        return black, white, True
+    return white, black, False
+
+
+def is_trivial_draw(white, black):
+    return sort_side(white) in DRAWN_SIDES and sort_side(black) in DRAWN_SIDES
+
+
+def all_signatures(max_pieces=MAX_PIECES):
+    #Every canonical signature with at most max_pieces pieces that needs a table
+    found = []
+    extras = 'QRBNP'
+    for total in range(3, max_pieces + 1):
+        for white_count in range(0, total - 1):
+            black_count = total - 2 - white_count
+            for white_extra in itertools.combinations_with_replacement(extras, white_count):
+                for black_extra in itertools.combinations_with_replacement(extras, black_count):
+                    white, black, _ = canonical('K' + ''.join(white_extra), 'K' + ''.join(black_extra))
+                    signature = make_signature(white, black)
+                    if not is_trivial_draw(white, black) and signature not in found:
+                        found.append(signature)
+    return found
+
+
+def encode(result, plies):
+    #Pack a result and its distance in plies into one byte (distance stored in moves)
+    if result == WIN:
+        moves = (plies + 1) // 2
+    elif result == LOSS:
+        moves = plies // 2
+    else:
+        moves = 0
+    return (min(moves, MAX_DTM) << 2) | result
+
+
+def decode(entry):
+    #Unpack a table byte into (result, distance to mate in plies)
+    result = entry & 3
+    moves = entry >> 2
+    if result == WIN:
+        return result, 2 * moves - 1
+    if result == LOSS:
+        return result, 2 * moves
+    return result, 0
+
+
+def position_index(squares, color):
+    index = 0
+    for sq in squares:
+        index = index * 64 + sq
+    return index * 2 + (0 if color == 'w' else 1)
+
+
+class TableSet:
+    #
+    # Looks up positions in a set of tables (in-memory bytearrays or memory-mapped files),
+    # handling piece ordering, color flipping and trivially drawn material.
+    #
+    def __init__(self):
+        self.tables = {}
+
+    def __contains__(self, signature):
+        return signature in self.tables
+
+    def lookup(self, pieces, color):
+        #
+        # pieces: list of (name, piece_color, square)
+        # Returns (result, plies) for the side to move, or None when no table covers the material.
+        #
+        white = sorted(((name, sq) for name, piece_color, sq in pieces if piece_color == 'w'),
+                       key=lambda item: PIECE_ORDER.index(item[0]))
+        black = sorted(((name, sq) for name, piece_color, sq in pieces if piece_color == 'b'),
+                       key=lambda item: PIECE_ORDER.index(item[0]))
+        white_names = ''.join(name for name, _ in white)
+        black_names = ''.join(name for name, _ in black)
+        if is_trivial_draw(white_names, black_names):
+            return DRAW, 0
+
+        table = self.tables.get(make_signature(white_names, black_names))
+        if table is not None:
+            squares = [sq for _, sq in white] + [sq for _, sq in black]
+            return decode(table[position_index(squares, color)])
+
+        # Same material with colors swapped
+        table = self.tables.get(make_signature(black_names, white_names))
+        if table is not None:
+            squares = [mirror(sq) for _, sq in black] + [mirror(sq) for _, sq in white]
+            return decode(table[position_index(squares, other(color))])
+        return None
+
+
+class _Position:
+    #Scratch position used by the generator: piece names/colors are fixed, squares change
+    def __init__(self, names, colors):
+        self.names = names
+        self.colors = colors
+        self.count = len(names)
+
+    def attacked(self, squares, occupied, target, by_color, skip=-1):
+        #Is `target` attacked by a piece of by_color (piece index `skip` is treated as captured)?
+        for k in range(self.count):
+            if k == skip or self.colors[k] != by_color:
+                continue
+            sq = squares[k]
+            name = self.names[k]
+            if name == 'K':
+                if target in KING_TARGETS[sq]:
+                    return True
+            elif name == 'N':
+                if target in KNIGHT_TARGETS[sq]:
+                    return True
+            elif name == 'P':
+                if target in PAWN_ATTACKS[by_color][sq]:
+                    return True
+            else:
+                line = LINES[sq][target]
+                if line is not None and (name == 'Q' or name == line[0]):
+                    if not any(between in occupied for between in line[1]):
+                        return True
+        return False
+
+    def pseudo_moves(self, squares, occupied, k):
+        #Target squares of piece k: (target, captured piece index or -1, promotes)
+        name = self.names[k]
+        color = self.colors[k]
+        sq = squares[k]
+        moves = []
+        if name == 'P':
+            step = -8 if color == 'w' else 8
+            target = sq + step
+            last_row = 0 if color == 'w' else 7
+            promotes = (target >> 3) == last_row
+            if target not in occupied:
+                moves.append((target, -1, promotes))
+                start_row = 6 if color == 'w' else 1
+                if (sq >> 3) == start_row and target + step not in occupied:
+                    moves.append((target + step, -1, False))
+            for target in PAWN_ATTACKS[color][sq]:
+                victim = occupied.get(target)
+                if victim is not None and self.colors[victim] != color:
+                    moves.append((target, victim, promotes))
+            return moves
+
+        if name == 'K' or name == 'N':
+            for target in (KING_TARGETS[sq] if name == 'K' else KNIGHT_TARGETS[sq]):
+                victim = occupied.get(target)
+                if victim is None:
+                    moves.append((target, -1, False))
+                elif self.colors[victim] != color:
+                    moves.append((target, victim, False))
+            return moves
+
+        for ray in SLIDER_RAYS[name][sq]:
+            for target in ray:
+                victim = occupied.get(target)
+                if victim is None:
+                    moves.append((target, -1, False))
+                else:
+                    if self.colors[victim] != color:
+                        moves.append((target, victim, False))
+                    break
+        return moves
+
+    def unmove_origins(self, squares, occupied, k):
+        #Squares piece k could have come from with a quiet, non-promoting move
+        name = self.names[k]
+        color = self.colors[k]
+        sq = squares[k]
+        if name == 'P':
+            step = 8 if color == 'w' else -8  # Backwards for the pawn
+            origin = sq + step
+            origins = []
+            start_row = 6 if color == 'w' else 1
+            if origin not in occupied and 0 < (origin >> 3) < 7:
+                origins.append(origin)
+                if (origin >> 3) != start_row and (origin + step) >> 3 == start_row and origin + step not in occupied:
+                    origins.append(origin + step)
+            return origins
+        if name == 'K' or name == 'N':
+            return [origin for origin in (KING_TARGETS[sq] if name == 'K' else KNIGHT_TARGETS[sq])
+                    if origin not in occupied]
+        origins = []
+        for ray in SLIDER_RAYS[name][sq]:
+            for origin in ray:
+                if origin in occupied:
+                    break
+                origins.append(origin)
+        return origins
+
+
+class Generator:
+    #
+    # Retrograde tablebase generator.
+    #
+    # Tables that a signature depends on (after captures and promotions) are generated first.
+    # Finished tables are written to `directory` and kept in memory for dependent signatures.
+    #
+    def __init__(self, directory=DEFAULT_DIRECTORY, log=print):
+        self.directory = directory
+        self.log = log
+        self.table_set = TableSet()
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, signature):
+        return os.path.join(self.directory, signature + FILE_SUFFIX)
+
+    def ensure(self, signature):
+        #Generate (or load) the table for a signature and everything it depends on
+        white, black = parse_signature(signature)
+        white, black, _ = canonical(white, black)
+        signature = make_signature(white, black)
+        if signature in self.table_set or is_trivial_draw(white, black):
+            return
+        for dependency in self.dependencies(white, black):
+            self.ensure(dependency)
+
+        path = self.path_for(signature)
+        if os.path.exists(path):
+            table = load_table(path)
+            if table is not None:
+                self.table_set.tables[signature] = table[1]
+                return
+
+        start = time.time()
+        table = self.generate(white, black)
+        write_table(path, signature, len(white) + len(black), table)
+        self.table_set.tables[signature] = table
+        self.log(f"{signature}: {len(table)} positions in {time.time() - start:.1f}s -> {path}")
+
+    def dependencies(self, white, black):
+        #Signatures reachable by one capture or promotion
+        found = []
+        for side, rest, is_white in ((white, black, True), (black, white, False)):
+            for i, name in enumerate(side):
+                if name == 'K':
+                    continue
+                smaller = side[:i] + side[i + 1:]
+                variants = [smaller] + ([smaller + promoted for promoted in PROMOTIONS] if name == 'P' else [])
+                for variant in variants:
+                    # Captures remove a piece from `side`, promotions swap a pawn on `side`
+                    if variant is smaller:
+                        pair = (smaller, rest) if is_white else (rest, smaller)
+                    else:
+                        pair = (variant, rest) if is_white else (rest, variant)
+                    canonical_white, canonical_black, _ = canonical(*pair)
+                    if not is_trivial_draw(canonical_white, canonical_black):
+                        signature = make_signature(canonical_white, canonical_black)
+                        if signature not in found:
+                            found.append(signature)
+        return found
+
+    def generate(self, white, black):
+        names = list(white) + list(black)
+        colors = ['w'] * len(white) + ['b'] * len(black)
+        position = _Position(names, colors)
+        piece_count = len(names)
+        size = 2 * 64 ** piece_count
+        king_index = {'w': 0, 'b': len(white)}
+
+        table = bytearray(size)        # Result codes (ILLEGAL until proven legal, DRAW until resolved)
+        plies = bytearray(size)        # Distance in plies for resolved positions
+        remaining = bytearray(size)    # Moves not yet refuted, for LOSS detection
+        escapes = bytearray(size)      # 1 when a drawing or winning exit prevents a LOSS
+        frontier = {0: []}             # Ply -> positions resolved at that ply
+        exit_events = {}               # Ply -> [(index, child_result)] from captures and promotions
+
+        # Pass 1: legality, mates, stalemates, move counts and exits into smaller tables
+        for squares in itertools.product(range(64), repeat=piece_count):
+            if len(set(squares)) != piece_count:
+                continue
+            if any(names[k] == 'P' and (squares[k] >> 3) in (0, 7) for k in range(piece_count)):
+                continue
+            if squares[king_index['b']] in KING_TARGETS[squares[king_index['w']]]:
+                continue
+            occupied = {sq: k for k, sq in enumerate(squares)}
+
+            for color in ('w', 'b'):
+                enemy = other(color)
+                # The side that just moved must not be left in check
+                if position.attacked(squares, occupied, squares[king_index[enemy]], color):
+                    continue
+                index = position_index(squares, color)
+                table[index] = DRAW
+                in_check = position.attacked(squares, occupied, squares[king_index[color]], enemy)
+
+                legal = 0
+                quiet = 0
+                for k in range(piece_count):
+                    if colors[k] != color:
+                        continue
+                    for target, victim, promotes in position.pseudo_moves(squares, occupied, k):
+                        if victim == king_index[enemy]:
+                            continue
+                        moved = list(squares)
+                        moved[k] = target
+                        moved_occupied = dict(occupied)
+                        del moved_occupied[squares[k]]
+                        moved_occupied[target] = k
+                        king_sq = moved[king_index[color]]
+                        if position.attacked(moved, moved_occupied, king_sq, enemy, skip=victim):
+                            continue
+                        legal += 1
+                        if victim < 0 and not promotes:
+                            quiet += 1
+                            continue
+
+                        # Exit into a smaller or different table
+                        survivors = [j for j in range(piece_count) if j != victim]
+                        for promoted in (PROMOTIONS if promotes else (None,)):
+                            child_position = [(promoted if promoted and j == k else names[j], colors[j], moved[j])
+                                              for j in survivors]
+                            child_result = self.table_set.lookup(child_position, enemy)
+                            if child_result is None:
+                                raise RuntimeError("Missing dependency table for exit position")
+                            result, child_plies = child_result
+                            if result == WIN:
+                                # Refuted exit: counts against LOSS until its ply is reached
+                                remaining[index] += 1
+                                exit_events.setdefault(child_plies, []).append((index, WIN))
+                            elif result == LOSS:
+                                escapes[index] = 1
+                                exit_events.setdefault(child_plies, []).append((index, LOSS))
+                            else:
+                                escapes[index] = 1
+
+                if legal == 0:
+                    if in_check:
+                        table[index] = LOSS
+                        frontier[0].append(index)
+                    continue
+                remaining[index] += quiet
+
+        # Pass 2: retrograde propagation, one ply at a time
+        ply = 0
+        max_ply = max(exit_events, default=0)
+        while frontier.get(ply) or ply <= max_ply:
+            next_ply = ply + 1
+            resolved = frontier.setdefault(next_ply, [])
+
+            def child_resolved(parent, child_result):
+                # Only legal positions that are still undecided (DRAW) can change
+                if table[parent] != DRAW:
+                    return
+                if child_result == LOSS:
+                    table[parent] = WIN
+                    plies[parent] = min(next_ply, 255)
+                    resolved.append(parent)
+                else:
+                    remaining[parent] -= 1
+                    if remaining[parent] == 0 and not escapes[parent]:
+                        table[parent] = LOSS
+                        plies[parent] = min(next_ply, 255)
+                        resolved.append(parent)
+
+            for parent, child_result in exit_events.get(ply, ()):
+                child_resolved(parent, child_result)
+
+            for index in frontier.pop(ply, ()):
+                child_result = table[index]
+                color = 'w' if index % 2 == 0 else 'b'
+                mover = other(color)
+                squares = []
+                rest = index // 2
+                for _ in range(piece_count):
+                    squares.append(rest % 64)
+                    rest //= 64
+                squares.reverse()
+                occupied = {sq: k for k, sq in enumerate(squares)}
+                for k in range(piece_count):
+                    if colors[k] != mover:
+                        continue
+                    for origin in position.unmove_origins(squares, occupied, k):
+                        previous = list(squares)
+                        previous[k] = origin
+                        child_resolved(position_index(previous, mover), child_result)
+            ply = next_ply
+
+        for index in range(size):
+            result = table[index]
+            if result == WIN or result == LOSS:
+                table[index] = encode(result, plies[index])
+        return table
+
+
+def write_table(path, signature, piece_count, table):
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, piece_count, signature.encode('ascii')))
+        f.write(table)
+
+
+def load_table(path):
+    #Memory-map a table file; returns (signature, table view) or None if the file is not a valid table
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return None
+        magic, version, piece_count, signature = HEADER.unpack(header)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            return None
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(data) != HEADER.size + 2 * 64 ** piece_count:
+        data.close()
+        return None
+    return signature.rstrip(b'\0').decode('ascii'), memoryview(data)[HEADER.size:]
+
+
+class Tablebase:
+    #
+    # Prober for the tables in a directory. Files are memory-mapped, so only the pages
+    # that are actually probed get read from disk.
+    #
+    def __init__(self, directory=DEFAULT_DIRECTORY):
+        self.directory = directory
+        self.table_set = TableSet()
+        self.max_pieces = 0
+        if os.path.isdir(directory):
+            for filename in sorted(os.listdir(directory)):
+                if filename.endswith(FILE_SUFFIX):
+                    loaded = load_table(os.path.join(directory, filename))
+                    if loaded is not None:
+                        signature, table = loaded
+                        self.table_set.tables[signature] = table
+                        self.max_pieces = max(self.max_pieces, len(signature) - 1)
+
+    def __len__(self):
+        return len(self.table_set.tables)
+
+    def probe(self, board, color):
+        #(result, distance to mate in plies) for `color` to move, or None when the material is not covered
+        pieces = []
+        for r, row in enumerate(board):
+            for c, p in enumerate(row):
+                if p:
+                    pieces.append((p.name, p.color, r * 8 + c))
+                    if len(pieces) > self.max_pieces:
+                        return None
+        return self.table_set.lookup(pieces, color)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate endgame tablebases for the chess engine.")
+    parser.add_argument('signatures', nargs='*',
+                        help="Material signatures such as KQvK or KRvKP (default: every 3-piece ending)")
+    parser.add_argument('--pieces', type=int, choices=(3, 4), default=3,
+                        help="Generate every ending with up to this many pieces when no signatures are given")
+    parser.add_argument('--out', default=DEFAULT_DIRECTORY, help="Output directory")
+    args = parser.parse_args(argv)
+
+    signatures = args.signatures or all_signatures(args.pieces)
+    generator = Generator(args.out)
+    for signature in signatures:
+        generator.ensure(signature)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,315 @@
+import argparse
+import math
+import mmap
+import struct
+import sys
+
+#
+# Search tree tracer.
+#
+#   python tracer.py record --fen "<fen>" --depth 3 --out trace.bin
+#   python tracer.py summary trace.bin
+#   python tracer.py dump trace.bin --last 50
+#
+# Tracer attaches to one ChessAI (ChessAI.enable_tracing) by wrapping search_with_aspiration
+# and alphabeta_enhanced on that instance only, so the search code is unchanged and an engine
+# without a tracer pays nothing. Every finished node appends one fixed-size record to a
+# memory-mapped ring buffer; when the buffer is full the oldest records are overwritten.
+#
+# Records are written when a node returns (children before their parent). Why a node was
+# searched (kind) is worked out from the calls themselves: the same board as the parent is a
+# null move, the same child board again is a re-search (LMR when the depth went up, PVS
+# otherwise), a depth below the parent's depth - 1 is an LMR reduction and a one-point window
+# is a PVS scout search.
+#
+
+MAGIC = b'SKTR'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIQ12x')  # magic, version, record size, capacity, records written
+RECORD = struct.Struct('<IBBbBBxHfffI')  # seq, iteration, ply, depth, kind, outcome, move, alpha, beta, score, nodes
+
+DEFAULT_CAPACITY = 1 << 20  # Records kept (28 bytes each)
+
+# Why a node was searched
+KIND_ROOT = 0
+KIND_FULL = 1           # Full window
+KIND_SCOUT = 2          # PVS null-window search
+KIND_PVS_RESEARCH = 3   # Scout search that failed and was repeated with the full window
+KIND_LMR = 4            # Late move searched with reduced depth
+KIND_LMR_RESEARCH = 5   # Reduced search repeated at full depth
+KIND_NULL_MOVE = 6      # Null move search
+KIND_NAMES = ('root', 'full', 'scout', 'pvs-research', 'lmr', 'lmr-research', 'null-move')
+
+# How the node ended
+OUTCOME_PV = 0          # Score inside the window
+OUTCOME_CUT = 1         # Fail high for the side to move (cutoff)
+OUTCOME_ALL = 2         # Fail low: no move reached the window
+OUTCOME_EARLY = 3       # Returned before searching moves: TT, persistent cache, tablebase, mate or stalemate
+OUTCOME_LEAF = 4        # Depth 0: value from quiescence search
+OUTCOME_NULL_CUT = 5    # Pruned by the null move search
+OUTCOME_TIMEOUT = 6     # Search stopped while in this node
+OUTCOME_NAMES = ('pv', 'cut', 'all', 'early', 'leaf', 'null-cut', 'timeout')
+
+NO_MOVE = 0xFFFF
+
+
+class TraceFrame:
+    #A node that is being searched
+    __slots__ = ('board', 'depth', 'nodes', 'children', 'last_board', 'last_depth', 'last_move', 'null_move_only')
+
+    def __init__(self, board, depth, nodes):
+        self.board = board
+        self.depth = depth
+        self.nodes = nodes
+        self.children = 0
+        self.last_board = None
+        self.last_depth = None
+        self.last_move = NO_MOVE
+        self.null_move_only = False
+
+
+def encode_move(parent, child):
+    #The move that turned `parent` into `child` as from_square << 6 | to_square (squares are row * 8 + col)
+    source = target = None
+    for r in range(8):
+        before, after = parent[r], child[r]
+        for c in range(8):
+            if before[c] is not after[c]:
+                if after[c] is None:
+                    source = r * 8 + c
+                else:
+                    target = r * 8 + c
+    if source is None or target is None:
+        return NO_MOVE
+    return source << 6 | target
+
+
+def decode_move(value):
+    #'e2e4' style text for an encoded move (row 0 is rank 8)
+    if value == NO_MOVE:
+        return '-'
+    source, target = value >> 6, value & 63
+    return ''.join('abcdefgh'[square % 8] + str(8 - square // 8) for square in (source, target))
+
+
+class Tracer:
+    def __init__(self, path, capacity=DEFAULT_CAPACITY):
+        self.path = path
+        self.capacity = capacity
+        size = HEADER.size + capacity * RECORD.size
+        with open(path, 'wb') as target:
+            target.truncate(size)
+        self._file = open(path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self.written = 0
+        self._write_header()
+        self._stack = []
+        self._ai = None
+
+    def _write_header(self):
+        HEADER.pack_into(self._map, 0, MAGIC, VERSION, RECORD.size, self.capacity, self.written)
+
+    def record(self, iteration, ply, depth, kind, outcome, move, alpha, beta, score, nodes):
+        offset = HEADER.size + (self.written % self.capacity) * RECORD.size
+        RECORD.pack_into(self._map, offset, self.written & 0xFFFFFFFF, min(iteration, 255), min(ply, 255),
+                         max(-128, min(depth, 127)), kind, outcome, move, alpha, beta, score,
+                         min(nodes, 0xFFFFFFFF))
+        self.written += 1
+        self._write_header()
+
+    def attach(self, ai):
+        #Wrap the search methods of one ChessAI instance
+        self._ai = ai
+        root_search = ai.search_with_aspiration
+        node_search = ai.alphabeta_enhanced
+        stack = self._stack
+
+        def traced_root(board, color, depth, alpha, beta):
+            stack.append(TraceFrame(board, depth, ai.nodes_searched))
+            outcome = OUTCOME_TIMEOUT
+            score = 0
+            try:
+                score, move = root_search(board, color, depth, alpha, beta)
+                outcome = _window_outcome(score, alpha, beta, color == 'w')
+                return score, move
+            finally:
+                frame = stack.pop()
+                self.record(depth, 0, depth, KIND_ROOT, outcome, NO_MOVE, alpha, beta, score,
+                            ai.nodes_searched - frame.nodes)
+
+        def traced_node(board, depth, alpha, beta, maximizing, original_depth, null_move_allowed=True):
+            parent = stack[-1] if stack else None
+            move = NO_MOVE
+            kind = KIND_FULL
+            if parent is not None:
+                if board is parent.board:
+                    kind = KIND_NULL_MOVE
+                elif board is parent.last_board:
+                    kind = KIND_LMR_RESEARCH if depth > parent.last_depth else KIND_PVS_RESEARCH
+                    move = parent.last_move
+                elif depth < parent.depth - 1:
+                    kind = KIND_LMR
+                elif beta - alpha == 1:
+                    kind = KIND_SCOUT
+                if kind != KIND_NULL_MOVE:
+                    if move == NO_MOVE:
+                        move = encode_move(parent.board, board)
+                    parent.last_board = board
+                    parent.last_depth = depth
+                    parent.last_move = move
+                parent.null_move_only = kind == KIND_NULL_MOVE and parent.children == 0
+                parent.children += 1
+
+            frame = TraceFrame(board, depth, ai.nodes_searched)
+            stack.append(frame)
+            outcome = OUTCOME_TIMEOUT
+            score = 0
+            try:
+                score = node_search(board, depth, alpha, beta, maximizing, original_depth, null_move_allowed)
+                if frame.children == 0:
+                    outcome = OUTCOME_LEAF if depth == 0 else OUTCOME_EARLY
+                elif frame.null_move_only:
+                    outcome = OUTCOME_NULL_CUT
+                else:
+                    outcome = _window_outcome(score, alpha, beta, maximizing)
+                return score
+            finally:
+                stack.pop()
+                self.record(original_depth, len(stack), depth, kind, outcome, move, alpha, beta, score,
+                            ai.nodes_searched - frame.nodes)
+
+        ai.search_with_aspiration = traced_root
+        ai.alphabeta_enhanced = traced_node
+
+    def detach(self):
+        if self._ai is not None:
+            self._ai.__dict__.pop('search_with_aspiration', None)
+            self._ai.__dict__.pop('alphabeta_enhanced', None)
+            self._ai = None
+        self._stack.clear()
+
+    def close(self):
+        self.detach()
+        self._map.flush()
+        self._map.close()
+        self._file.close()
+
+
+def _window_outcome(score, alpha, beta, maximizing):
+    if score >= beta:
+        return OUTCOME_CUT if maximizing else OUTCOME_ALL
+    if score <= alpha:
+        return OUTCOME_ALL if maximizing else OUTCOME_CUT
+    return OUTCOME_PV
+
+
+def read_trace(path):
+    #Records of a trace file as tuples, oldest first (only the last `capacity` survive a wrap)
+    with open(path, 'rb') as source:
+        data = source.read()
+    magic, version, record_size, capacity, written = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+        raise ValueError(f"{path} is not a trace file of this version")
+    first = max(0, written - capacity)
+    records = []
+    for index in range(first, written):
+        records.append(RECORD.unpack_from(data, HEADER.size + (index % capacity) * RECORD.size))
+    return records, written
+
+
+def summarize(records):
+    #Per iteration: node kinds and outcomes, LMR and PVS re-search counts and the nodes they wasted
+    iterations = {}
+    last_at_ply = {}  # ply -> last finished record there (the first search of a re-searched move)
+    for record in records:
+        _, iteration, ply, depth, kind, outcome, move, _, _, _, nodes = record
+        summary = iterations.setdefault(iteration, {
+            'nodes': 0, 'kinds': [0] * len(KIND_NAMES), 'outcomes': [0] * len(OUTCOME_NAMES),
+            'wasted': {KIND_LMR_RESEARCH: 0, KIND_PVS_RESEARCH: 0}, 'wasted_by_depth': {}})
+        summary['nodes'] += 1
+        summary['kinds'][kind] += 1
+        summary['outcomes'][outcome] += 1
+        if kind in (KIND_LMR_RESEARCH, KIND_PVS_RESEARCH):
+            first = last_at_ply.get(ply)
+            if first is not None and first[6] == move:
+                summary['wasted'][kind] += first[10]
+                by_depth = summary['wasted_by_depth']
+                by_depth[depth] = by_depth.get(depth, 0) + first[10]
+        last_at_ply[ply] = record
+    return iterations
+
+
+def format_summary(records, written):
+    lines = [f"{len(records)} records ({written} written{', oldest overwritten' if written > len(records) else ''})"]
+    for iteration, summary in sorted(summarize(records).items()):
+        kinds = summary['kinds']
+        outcomes = summary['outcomes']
+        lines.append('')
+        lines.append(f"Iteration {iteration}: {summary['nodes']} nodes")
+        lines.append('  kinds:    ' + ', '.join(f"{name} {kinds[i]}" for i, name in enumerate(KIND_NAMES) if kinds[i]))
+        lines.append('  outcomes: ' + ', '.join(f"{name} {outcomes[i]}" for i, name in enumerate(OUTCOME_NAMES) if outcomes[i]))
+        reduced = kinds[KIND_LMR]
+        if reduced:
+            lines.append(f"  LMR re-search rate: {kinds[KIND_LMR_RESEARCH] / reduced * 100:.1f}% "
+                         f"({kinds[KIND_LMR_RESEARCH]} of {reduced})")
+        scouts = kinds[KIND_SCOUT]
+        if scouts:
+            lines.append(f"  PVS re-search rate: {kinds[KIND_PVS_RESEARCH] / scouts * 100:.1f}% "
+                         f"({kinds[KIND_PVS_RESEARCH]} of {scouts})")
+        if kinds[KIND_NULL_MOVE]:
+            lines.append(f"  Null move cutoffs: {outcomes[OUTCOME_NULL_CUT]} of {kinds[KIND_NULL_MOVE]} tries")
+        wasted = summary['wasted']
+        if any(wasted.values()):
+            lines.append(f"  Nodes wasted on re-searched moves: {wasted[KIND_LMR_RESEARCH]} LMR, "
+                         f"{wasted[KIND_PVS_RESEARCH]} PVS; by remaining depth: "
+                         + ', '.join(f"{depth}: {nodes}" for depth, nodes in sorted(summary['wasted_by_depth'].items())))
+    return '\n'.join(lines)
+
+
+def format_record(record):
+    seq, iteration, ply, depth, kind, outcome, move, alpha, beta, score, nodes = record
+    return (f"{seq:>8} it{iteration:<3}{'  ' * ply}{decode_move(move):<5} d{depth:<3}{KIND_NAMES[kind]:<13}"
+            f"{OUTCOME_NAMES[outcome]:<9}[{alpha:g}, {beta:g}] {score:g} ({nodes} nodes)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record and inspect search tree traces.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    record = commands.add_parser('record', help="Search one position with tracing on")
+    record.add_argument('--fen', help="Position (default: the start position)")
+    record.add_argument('--depth', type=int, default=3)
+    record.add_argument('--capacity', type=int, default=DEFAULT_CAPACITY, help="Records kept in the ring buffer")
+    record.add_argument('--out', default='trace.bin')
+    summary = commands.add_parser('summary', help="Summarize a trace file")
+    summary.add_argument('trace')
+    dump = commands.add_parser('dump', help="Print trace records")
+    dump.add_argument('trace')
+    dump.add_argument('--last', type=int, default=100, help="Number of records from the end")
+    args = parser.parse_args(argv)
+
+    if args.command == 'record':
+        from alphabeta import ChessAI
+        from fen import START_FEN, board_from_fen
+        ai = ChessAI(depth=args.depth)
+        ai.collect_stats = False
+        ai.max_time = math.inf
+        board, color, _, _ = board_from_fen(args.fen or START_FEN)
+        ai.enable_tracing(args.out, args.capacity)
+        try:
+            ai.get_best_move(board, color)
+        finally:
+            ai.disable_tracing()
+        print(f"Wrote {args.out}")
+        return 0
+
+    records, written = read_trace(args.trace)
+    if args.command == 'summary':
+        print(format_summary(records, written))
+    else:
+        for record in records[-args.last:]:
+            print(format_record(record))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,310 @@
+import math
+import os
+import sys
+import threading
+import time
+
+import bench
+from alphabeta import ChessAI
+from fen import START_FEN, board_from_fen, board_to_fen, apply_move, uci_to_move, move_to_uci
+
+#
+# UCI front end for ChessAI, for chess GUIs and match runners.
+#
+# Run with "python uci.py". Only the engine modules are imported (no pygame), so the engine
+# starts quickly. Commands are read on the main thread while the search runs in its own thread,
+# which lets "stop" and "ponderhit" take effect in the middle of a search.
+#
+
+ENGINE_NAME = 'Skak'
+ENGINE_AUTHOR = 'Jonas2620'
+
+# Depth used when the GUI only limits time or nodes (iterative deepening stops on the limit)
+MAX_DEPTH = 64
+
+# Scores at or beyond this are mates; the engine scores a mate as 20000 minus the distance in plies
+MATE_SCORE = 20000
+MATE_THRESHOLD = MATE_SCORE - 1000
+
+# Time management: share of the remaining clock per move and a safety margin for I/O
+DEFAULT_MOVES_TO_GO = 30
+MOVE_OVERHEAD = 0.05
+
+# Default and upper limit for the Hash option (MB), the engine's memory budget for its tables and caches
+DEFAULT_HASH_MB = 16
+MAX_HASH_MB = 4096
+MAX_THREADS = 2
+
+# setoption names (lower case) and the UCIEngine attributes that hold their values
+OPTION_ATTRIBUTES = {'hash': 'hash_mb', 'threads': 'threads', 'bookfile': 'book_file',
+                     'tablebasepath': 'tablebase_path'}
+
+# Node budget for the mate-search helper thread when Threads > 1
+MATE_HELPER_NODES = 200000
+
+
+def allocate_time(remaining, increment=0.0, moves_to_go=DEFAULT_MOVES_TO_GO):
+    #Seconds to think about one move given the remaining clock and increment (both in seconds)
+    budget = remaining / max(1, moves_to_go) + increment * 0.8
+    return max(0.01, min(budget, remaining / 2) - MOVE_OVERHEAD)
+
+
+def parse_int(text, default=None):
+    #Integer value of a command argument, or `default` when it is not a number
+    try:
+        return int(text)
+    except ValueError:
+        return default
+
+
+class UCIEngine:
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.ai = self.create_ai()
+        self.hash_mb = DEFAULT_HASH_MB
+        self.threads = 1
+        self.book_file = ''
+        self.tablebase_path = ''
+        self.set_position(START_FEN, [])
+
+        self.search_thread = None
+        self.search_root = None  # (board, color) of the running search, for the info lines
+        self.release = threading.Event()  # Set when bestmove may be sent (not pondering / not infinite)
+        self.ponder_time = None  # Time budget to use once the GUI sends ponderhit
+        self.apply_options()  # The advertised defaults hold before the first setoption
+
+    def create_ai(self):
+        ai = ChessAI(depth=MAX_DEPTH)
+        ai.collect_stats = False
+        ai.info_callback = self.send_info
+        return ai
+
+    def send(self, line):
+        self.output.write(line + '\n')
+        self.output.flush()
+
+    def handle(self, line):
+        #Process one command line; returns False on quit
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+
+        if command == 'uci':
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send(f"option name Hash type spin default {DEFAULT_HASH_MB} min 1 max {MAX_HASH_MB}")
+            self.send(f"option name Threads type spin default 1 min 1 max {MAX_THREADS}")
+            self.send("option name Ponder type check default false")
+            self.send("option name BookFile type string default <empty>")
+            self.send("option name TablebasePath type string default <empty>")
+            self.send("uciok")
+        elif command == 'isready':
+            self.send("readyok")
+        elif command == 'setoption':
+            self.set_option(args)
+        elif command == 'ucinewgame':
+            self.stop_search()
+            self.ai.new_game()
+        elif command == 'position':
+            self.stop_search()
+            self.parse_position(args)
+        elif command == 'go':
+            self.stop_search()
+            self.go(args)
+        elif command == 'stop':
+            self.stop_search()
+        elif command == 'ponderhit':
+            self.ponderhit()
+        elif command == 'bench':
+            self.stop_search()
+            depth = parse_int(args[0], bench.DEFAULT_DEPTH) if args else bench.DEFAULT_DEPTH
+            result = bench.run(max(1, depth), output=self.output)
+            bench.print_summary(result, self.output)
+            self.output.flush()
+        elif command == 'd':
+            self.send(board_to_fen(self.board, self.color, self.halfmove, self.fullmove))
+        elif command == 'quit':
+            self.stop_search()
+            return False
+        return True
+
+    def set_option(self, args):
+        #setoption name <name> [value <value>]
+        if 'name' not in args:
+            return
+        value_at = args.index('value') if 'value' in args else len(args)
+        name = ' '.join(args[args.index('name') + 1:value_at]).lower()
+        value = ' '.join(args[value_at + 1:])
+        if value == '<empty>':
+            value = ''
+        if name not in OPTION_ATTRIBUTES:
+            return  # Ponder and unknown options change nothing in the engine
+        previous = getattr(self, OPTION_ATTRIBUTES[name])
+
+        # Spin values outside their range are clamped; a value that is not a number is ignored
+        if name == 'hash':
+            self.hash_mb = min(max(1, parse_int(value, self.hash_mb)), MAX_HASH_MB)
+        elif name == 'threads':
+            self.threads = min(max(1, parse_int(value, self.threads)), MAX_THREADS)
+        elif name == 'bookfile':
+            self.book_file = value
+        elif name == 'tablebasepath':
+            self.tablebase_path = value
+        # GUIs send every option at startup; only a changed value is pushed into the engine
+        if getattr(self, OPTION_ATTRIBUTES[name]) != previous:
+            self.apply_options((name,))
+
+    def apply_options(self, names=tuple(OPTION_ATTRIBUTES)):
+        #Push the current values of the named options into the engine
+        if 'hash' in names:
+            self.ai.set_memory_budget(self.hash_mb * 1024 * 1024)
+        if 'threads' in names:
+            self.ai.mate_helper_nodes = MATE_HELPER_NODES if self.threads > 1 else 0
+        if 'bookfile' in names and self.book_file and os.path.exists(self.book_file):
+            self.ai.load_opening_book(self.book_file)
+        if 'tablebasepath' in names and self.tablebase_path and os.path.isdir(self.tablebase_path):
+            self.ai.load_tablebases(self.tablebase_path)
+
+    def set_position(self, fen, moves):
+        #Raises ValueError for a bad FEN or move; the current position only changes on success
+        board, color, halfmove, fullmove = board_from_fen(fen)
+        for text in moves:
+            move, promotion = uci_to_move(text)
+            if apply_move(board, move, promotion):
+                halfmove = 0
+            else:
+                halfmove += 1
+            if color == 'b':
+                fullmove += 1
+            color = 'b' if color == 'w' else 'w'
+        self.board, self.color, self.halfmove, self.fullmove = board, color, halfmove, fullmove
+
+    def parse_position(self, args):
+        #position [startpos | fen <fen>] [moves <m1> <m2> ...]
+        moves_at = args.index('moves') if 'moves' in args else len(args)
+        if args and args[0] == 'fen':
+            fen = ' '.join(args[1:moves_at])
+        else:
+            fen = START_FEN
+        try:
+            self.set_position(fen, args[moves_at + 1:])
+        except ValueError as error:
+            self.send(f"info string ignoring position: {error}")
+
+    def parse_go(self, args):
+        #Turn the go arguments into a dict of limits
+        limits = {}
+        flags = ('infinite', 'ponder')
+        index = 0
+        while index < len(args):
+            key = args[index]
+            if key in flags:
+                limits[key] = True
+                index += 1
+            elif key == 'searchmoves':
+                break
+            else:
+                # A limit whose value is not a number is left out
+                value = parse_int(args[index + 1]) if index + 1 < len(args) else None
+                if value is not None:
+                    limits[key] = value
+                index += 2
+        return limits
+
+    def time_budget(self, limits):
+        #Seconds to spend on this move (math.inf when the GUI sets no time limit)
+        if 'movetime' in limits:
+            return max(0.01, limits['movetime'] / 1000 - MOVE_OVERHEAD)
+        clock = limits.get('wtime' if self.color == 'w' else 'btime')
+        if clock is None:
+            return math.inf
+        increment = limits.get('winc' if self.color == 'w' else 'binc', 0)
+        return allocate_time(clock / 1000, increment / 1000, limits.get('movestogo', DEFAULT_MOVES_TO_GO))
+
+    def go(self, args):
+        limits = self.parse_go(args)
+        budget = self.time_budget(limits)
+
+        self.ai.depth = limits.get('depth', MAX_DEPTH)
+        self.ai.max_nodes = limits.get('nodes')
+        self.ai.stop_event.clear()
+        if limits.get('ponder') or limits.get('infinite'):
+            # Search without a clock until ponderhit (then budget applies) or stop
+            self.ai.max_time = math.inf
+            self.ponder_time = budget if limits.get('ponder') else None
+            self.release.clear()
+        else:
+            self.ai.max_time = budget
+            self.ponder_time = None
+            self.release.set()
+
+        board = [row[:] for row in self.board]
+        self.search_root = (board, self.color)
+        self.search_thread = threading.Thread(target=self.search, args=(board, self.color), daemon=True)
+        self.search_thread.start()
+
+    def search(self, board, color):
+        move = self.ai.get_best_move(board, color)
+        if move is None:
+            # No iteration finished in time: any legal move beats forfeiting
+            legal_moves = self.ai.get_all_moves(board, color)
+            move = legal_moves[0] if legal_moves else None
+
+        # bestmove must not be sent while pondering or in infinite mode until the GUI says so
+        self.release.wait()
+        self.send(f"bestmove {move_to_uci(board, move) if move else '0000'}")
+
+    def send_info(self, info):
+        #Info callback of the engine; runs on the search thread
+        self.send(self.info_line(info, *self.search_root))
+
+    def info_line(self, info, board, color):
+        #UCI info line for an engine info record (see searchinfo.py)
+        counts = f"nodes {info['nodes']} nps {info['nps']}"
+        if info['hashfull'] is not None:
+            counts += f" hashfull {info['hashfull']}"
+        counts += f" time {int(info['time'] * 1000)}"
+        if info['kind'] == 'progress':
+            return f"info {counts}"
+
+        score = info['score'] if color == 'w' else -info['score']
+        if abs(score) >= MATE_THRESHOLD:
+            plies = MATE_SCORE - abs(score)
+            score_text = f"mate {(plies + 1) // 2 if score > 0 else -((plies + 1) // 2)}"
+        else:
+            score_text = f"cp {int(score)}"
+        pv = []
+        for move in info['pv']:
+            pv.append(move_to_uci(board, move))
+            board = self.ai.make_move_fast(board, move)
+        return f"info depth {info['depth']} seldepth {info['seldepth']} score {score_text} {counts} pv {' '.join(pv)}"
+
+    def ponderhit(self):
+        #The opponent played the expected move: keep searching, now against the clock
+        if self.ponder_time is not None:
+            self.ai.start_time = time.time()
+            self.ai.max_time = self.ponder_time
+            self.ponder_time = None
+        self.release.set()
+
+    def stop_search(self):
+        #Stop a running search and wait until it has sent its bestmove
+        if self.search_thread is not None:
+            self.ai.stop_event.set()
+            self.release.set()
+            self.search_thread.join()
+            self.search_thread = None
+
+
+def main():
+    engine = UCIEngine()
+    for line in sys.stdin:
+        if not engine.handle(line.strip()):
+            break
+    engine.stop_search()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())